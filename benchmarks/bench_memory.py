@@ -0,0 +1,79 @@
+"""比较dict任务与TodoRecord任务的内存占用，以及整个TodoData（含各索引）的内存占用
+
+用法: python benchmarks/bench_memory.py [任务数量]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_data import TodoData  # noqa: E402
+from todo_record import TodoRecord  # noqa: E402
+
+
+def make_json(count, seed=0):
+    """生成与todos.json格式一致的任务数据"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    categories = ["默认", "💼 工作", "🏠 生活", "📚 学习"]
+    todos = []
+    for i in range(count):
+        created = start + timedelta(seconds=rng.randrange(365 * 86400))
+        due = created.date() + timedelta(days=rng.randrange(60))
+        todos.append({
+            "id": f"{i:032x}",
+            "content": f"任务 {i} 处理一下相关事项",
+            "completed": rng.random() < 0.3,
+            "create_time": created.strftime("%Y-%m-%d %H:%M:%S"),
+            "due_date": due.isoformat() if rng.random() < 0.7 else None,
+            "priority": rng.choice(["high", "normal", "low"]),
+            "category": rng.choice(categories)
+        })
+    return json.dumps(todos, ensure_ascii=False)
+
+
+def measure(build):
+    """返回build()创建的对象占用的内存（字节）"""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def load_data(filename, search):
+    """加载整个TodoData；search为True时再搜索一次，把全文索引也建立起来"""
+    todo_data = TodoData(filename, journal=False)
+    if search:
+        todo_data.search("任务")
+    return todo_data
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    text = make_json(count)
+    as_dicts = measure(lambda: json.loads(text))
+    as_records = measure(lambda: [TodoRecord.from_dict(todo) for todo in json.loads(text)])
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "todos.json")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(text)
+        as_data = measure(lambda: load_data(filename, search=False))
+        as_searchable = measure(lambda: load_data(filename, search=True))
+    print(f"任务数量: {count}")
+    rows = [("dict", as_dicts), ("TodoRecord", as_records),
+            ("TodoData", as_data), ("TodoData+搜索索引", as_searchable)]
+    for name, size in rows:
+        print(f"{size / 1024 / 1024:8.1f} MB  ({size / count:6.0f} B/任务)  {name}")
+    print(f"记录本身节省: {(1 - as_records / as_dicts) * 100:.0f}%")
+    print(f"整个TodoData（含索引）相对dict: {as_searchable / as_dicts * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
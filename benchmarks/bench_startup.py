@@ -0,0 +1,87 @@
+"""测量冷启动时间：首次绘制(first paint)和可交互(interactive)
+
+用法: python benchmarks/bench_startup.py [任务数量]
+
+数据层部分不需要图形界面：比较同步加载与后台加载时第一屏数据和全部数据就绪的时间。
+有显示器且安装了tkcalendar时再测量GUI：从创建TodoGUI到窗口第一次绘制完成，
+以及到全部任务加载完毕、可以操作为止的时间。
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from bench_memory import make_json  # noqa: E402
+
+
+def bench_data(filename):
+    """返回 (同步加载耗时, 后台加载第一屏耗时, 后台加载全部耗时)"""
+    from todo_data import TodoData
+    start = time.perf_counter()
+    TodoData(filename, journal=False)
+    eager = time.perf_counter() - start
+
+    times = {}
+    start = time.perf_counter()
+    todo_data = TodoData(filename, journal=False, lazy=True)
+    todo_data.add_listener(lambda event, todo: times.setdefault(event, time.perf_counter() - start))
+    todo_data.start_loading()
+    todo_data.wait_loaded()
+    while "reset" not in times:
+        time.sleep(0.001)
+    return eager, times.get("loading", times["reset"]), times["reset"]
+
+
+def bench_gui(filename):
+    """返回 (首次绘制耗时, 可交互耗时)，没有图形环境时返回None"""
+    try:
+        import tkcalendar  # noqa: F401
+        from todo_data import TodoData
+        from todo_gui import TodoGUI
+        start = time.perf_counter()
+        app = TodoGUI(TodoData(filename, journal=False, lazy=True))
+    except Exception as e:
+        print(f"跳过GUI测量: {e}")
+        return None
+    app.root.update()
+    first_paint = time.perf_counter() - start
+    total = None
+    while total is None or len(app._row_ids) < total:
+        app.root.update()
+        if app.todo_data.loaded and app._events.empty():
+            total = app.todo_data.get_stats()[0]
+    interactive = time.perf_counter() - start
+    app.todo_data.close()
+    app.root.destroy()
+    return first_paint, interactive
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        from todo_metrics import setup_logging
+        os.chdir(directory)
+        os.makedirs("data")
+        # 慢操作警告写进临时目录的日志，不打断输出
+        setup_logging(os.path.join("data", "todo_app.log"))
+        filename = os.path.join("data", "todos.json")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(make_json(count))
+
+        eager, first_rows, loaded = bench_data(filename)
+        print(f"任务数量: {count}")
+        print(f"同步加载:           {eager * 1000:8.1f} ms")
+        print(f"后台加载 第一屏:    {first_rows * 1000:8.1f} ms")
+        print(f"后台加载 全部:      {loaded * 1000:8.1f} ms")
+
+        result = bench_gui(filename)
+        if result:
+            first_paint, interactive = result
+            print(f"GUI 首次绘制:       {first_paint * 1000:8.1f} ms")
+            print(f"GUI 可交互:         {interactive * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""接口服务压力测试：报告每秒请求数和延迟分位数
+
+用法:
+    python benchmarks/load_test.py                       # 在临时数据上启动服务并测试
+    python benchmarks/load_test.py --port 8765 --no-spawn # 测试已经在运行的服务
+    python benchmarks/load_test.py --clients 50 --duration 10 --write-ratio 0.2
+
+每个客户端保持一个keep-alive连接循环发请求：按write-ratio的比例添加或切换任务，
+其余为分页列表、搜索和统计查询。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app", "main.py")
+
+
+async def request(reader, writer, method, path, body=None):
+    """在已有连接上发一个请求，返回 (状态码, JSON)"""
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1")
+        + data
+    )
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    length = 0
+    for line in lines[1:]:
+        if line.lower().startswith("content-length:"):
+            length = int(line.split(":", 1)[1])
+    payload = await reader.readexactly(length)
+    return status, json.loads(payload.decode("utf-8"))
+
+
+async def client(host, port, deadline, write_ratio, seed, latencies, errors, ids):
+    """一个客户端：循环发送读写混合的请求直到截止时间"""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            roll = rng.random()
+            if roll < write_ratio / 2 or not ids:
+                args = ("POST", "/todos", {"content": f"压测任务 {rng.randrange(10 ** 6)}",
+                                           "priority": rng.choice(["high", "normal", "low"])})
+            elif roll < write_ratio:
+                args = ("POST", f"/todos/{rng.choice(ids)}/toggle")
+            elif roll < 0.5 + write_ratio / 2:
+                args = ("GET", f"/todos?offset={rng.randrange(0, 1000, 50)}&limit=50")
+            elif roll < 0.8:
+                args = ("GET", f"/todos?q={quote(f'任务 {rng.randrange(100)}')}&limit=20")
+            else:
+                args = ("GET", "/stats")
+            start = time.perf_counter()
+            status, payload = await request(reader, writer, *args)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+            elif args[1] == "/todos" and args[0] == "POST":
+                ids.append(payload["id"])
+    finally:
+        writer.close()
+
+
+async def run(host, port, clients, duration, write_ratio):
+    latencies, errors, ids = [], [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, deadline, write_ratio, seed, latencies, errors, ids)
+        for seed in range(clients)
+    ))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, p):
+    index = min(len(values) - 1, int(len(values) * p / 100))
+    return values[index]
+
+
+async def _connect(host, port):
+    _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), 1)
+    writer.close()
+
+
+def wait_for_port(host, port, timeout=10):
+    """等待服务开始监听"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            asyncio.run(_connect(host, port))
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("服务没有启动")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接口服务压力测试")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-spawn", action="store_true", help="不启动服务，测试已运行的服务")
+    parser.add_argument("--tasks", type=int, default=10000, help="启动服务时预先生成的任务数")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    process = None
+    directory = None
+    if not args.no_spawn:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from bench_memory import make_json
+        directory = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(directory.name, "data"))
+        with open(os.path.join(directory.name, "data", "todos.json"), "w", encoding="utf-8") as f:
+            f.write(make_json(args.tasks))
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(MAIN), "serve", "--host", args.host, "--port", str(args.port)],
+            cwd=directory.name, stdout=subprocess.DEVNULL
+        )
+    try:
+        wait_for_port(args.host, args.port)
+        latencies, errors, elapsed = asyncio.run(
+            run(args.host, args.port, args.clients, args.duration, args.write_ratio)
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            directory.cleanup()
+
+    latencies.sort()
+    print(f"客户端: {args.clients}  时长: {elapsed:.1f} s  写请求比例: {args.write_ratio:.0%}")
+    print(f"请求数: {len(latencies)}  错误: {len(errors)}")
+    print(f"吞吐量: {len(latencies) / elapsed:8.0f} 请求/秒")
+    for p in (50, 90, 99):
+        print(f"p{p}:    {percentile(latencies, p) * 1000:8.2f} ms")
+    print(f"最大:   {latencies[-1] * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
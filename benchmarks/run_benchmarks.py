@@ -0,0 +1,342 @@
+"""数据层和界面刷新路径的基准测试
+
+用法:
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000 --output results.json
+    python benchmarks/run_benchmarks.py --sizes 1000000 --no-memory
+    python benchmarks/run_benchmarks.py --output new.json --compare results.json
+
+为每个规模生成一份合成数据（截止日期比例、日期跨度、完成比例和分类分布可配置），
+对每个操作计时（重复多次取最小值），并在单独的一轮中用tracemalloc记录峰值内存。
+界面部分（refresh_list / refresh_calendar / on_search）使用替身控件运行，
+不需要显示器和tkcalendar。结果写成JSON，--compare会与之前的结果逐项比较，
+变慢超过阈值时以非零退出码结束，便于在提交前发现性能回退。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+BASE_DATE = datetime(2024, 1, 1)
+OPS = 1000  # 单条操作（添加、切换）每轮执行的次数
+
+
+def generate_todos(count, seed=0, due_ratio=0.7, due_span=365, completed_ratio=0.3,
+                   categories=("默认", "💼 工作", "🏠 生活", "📚 学习")):
+    """生成与todos.json格式一致的合成任务"""
+    rng = random.Random(seed)
+    priorities = ("high", "normal", "low")
+    words = ["整理", "报告", "会议", "购物", "阅读", "复习", "邮件", "计划", "预算", "健身"]
+    for i in range(count):
+        created = BASE_DATE + timedelta(seconds=rng.randrange(due_span * 86400))
+        due = BASE_DATE.date() + timedelta(days=rng.randrange(due_span))
+        yield {
+            "id": f"{i:032x}",
+            "content": f"{rng.choice(words)}{rng.choice(words)} 任务{i}",
+            "completed": rng.random() < completed_ratio,
+            "create_time": created.strftime("%Y-%m-%d %H:%M:%S"),
+            "due_date": due.isoformat() if rng.random() < due_ratio else None,
+            "priority": rng.choice(priorities),
+            "category": rng.choice(categories)
+        }
+
+
+# ---- 界面替身控件 ----
+
+class StubVar:
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class StubList:
+    """替代VirtualList：set_count时像真实控件一样只取一屏的行文字"""
+
+    VISIBLE_ROWS = 30
+
+    def __init__(self, get_text):
+        self.get_text = get_text
+        self.count = 0
+
+    def set_count(self, count):
+        self.count = count
+        for index in range(min(count, self.VISIBLE_ROWS)):
+            self.get_text(index)
+
+    def row_inserted(self, index):
+        self.count += 1
+
+    def row_deleted(self, index):
+        self.count -= 1
+
+    def row_changed(self, index):
+        pass
+
+    def curselection(self):
+        return ()
+
+
+class StubCalendar:
+    """替代tkcalendar.Calendar，只记录标记"""
+
+    def __init__(self, month, year):
+        self.displayed = (month, year)
+        self.events = {}
+        self._next_id = 0
+
+    def get_displayed_month(self):
+        return self.displayed
+
+    def calevent_create(self, date, text, tags):
+        self._next_id += 1
+        self.events[self._next_id] = (date, text, tags)
+        return self._next_id
+
+    def calevent_remove(self, ev_id):
+        if ev_id == "all":
+            self.events.clear()
+        else:
+            self.events.pop(ev_id, None)
+
+    def calevent_configure(self, ev_id, **options):
+        pass
+
+
+class StubRoot:
+    def after(self, delay, callback=None, *args):
+        return None
+
+    def after_cancel(self, job):
+        pass
+
+
+def make_stub_gui(todo_data):
+    """创建一个使用替身控件的TodoGUI，不创建Tk窗口"""
+    from todo_gui import TodoGUI  # 只需要tkinter模块，不需要显示器
+
+    gui = TodoGUI.__new__(TodoGUI)
+    gui.todo_data = todo_data
+    gui._row_ids = []
+    gui._display_cache = {}
+    gui._filter_date = None
+    gui._search_text = ""
+    gui._cal_events = {}
+    gui._cal_range = (None, None)
+    gui._search_job = None
+    gui._status_text = ""
+    gui.priority_marks = {"high": "⚡", "normal": "○", "low": "▽"}
+    gui.filter_priorities = {"全部优先级": None, "🔴 高": "high", "🟡 中": "normal", "🔵 低": "low"}
+    gui.colors = {name: name for name in ("primary", "secondary", "success", "danger", "warning",
+                                          "text", "text_secondary", "bg", "bg_secondary")}
+    gui.root = StubRoot()
+    gui.status_var = StubVar()
+    gui.search_var = StubVar()
+    gui.search_entry = type("StubEntry", (), {"placeholder": "🔍 搜索任务..."})()
+    gui.filter_category_var = StubVar("全部分类")
+    gui.filter_priority_var = StubVar("全部优先级")
+    gui.todo_list = StubList(gui._row_text)
+    gui.month_calendar = StubCalendar(BASE_DATE.month + 2, BASE_DATE.year)
+    return gui
+
+
+# ---- 计时 ----
+
+def measure(func, setup=None, repeat=3, memory=True, ops=1):
+    """返回 {seconds, per_op, peak_bytes}：seconds取多次中的最小值"""
+    best = None
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    result = {"seconds": best, "per_op": best / ops}
+    if memory:
+        state = setup() if setup else None
+        tracemalloc.start()
+        func(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_bytes"] = peak
+    return result
+
+
+def bench_size(count, args, directory):
+    """对一个规模运行全部基准，返回 {操作名: 结果}"""
+    from todo_data import TodoData
+    from todo_io import write_todo_file
+
+    source = os.path.join(directory, f"source_{count}.json")
+    write_todo_file(source, generate_todos(
+        count, args.seed, args.due_ratio, args.due_span, args.completed_ratio, args.categories
+    ))
+    store = os.path.join(directory, f"store_{count}", "todos.json")
+    os.makedirs(os.path.dirname(store), exist_ok=True)
+
+    def fresh_store():
+        """复制一份干净的数据文件并加载"""
+        shutil.copyfile(source, store)
+        if os.path.exists(store + ".journal"):
+            os.remove(store + ".journal")
+        return TodoData(store)
+
+    results = {}
+
+    def run(name, func, setup=fresh_store, ops=1, repeat=args.repeat):
+        results[name] = measure(func, setup, repeat, args.memory, ops)
+
+    data = fresh_store()
+    ids = list(data.todos)
+    rng = random.Random(args.seed)
+    sample = [rng.choice(ids) for _ in range(OPS)] if ids else []
+
+    run("load_todos", lambda _: TodoData(store), setup=None)
+    run("save_todos", lambda d: d.save_todos())
+    run("add_todo", lambda d: [d.add_todo(f"新任务{i}", due_date="2024-03-01") for i in range(OPS)],
+        ops=OPS)
+    run("toggle_complete", lambda d: [d.toggle_complete(todo_id) for todo_id in sample], ops=len(sample))
+    run("get_stats", lambda d: [d.get_stats() for _ in range(100)], setup=lambda: data, ops=100)
+    run("search", lambda d: [d.search(q) for q in ("报告", "会议 任务1", "整理预算")],
+        setup=lambda: data, ops=3)
+    run("import_todos", lambda d: d.import_todos(source),
+        setup=lambda: TodoData(os.path.join(directory, f"import_{time.perf_counter_ns()}", "todos.json")))
+
+    # 增量维护的统计必须与从头统计的结果一致
+    for name, store_data in (("import", data), ("mutations", fresh_store())):
+        if name == "mutations":
+            for i, todo_id in enumerate(sample[:200]):
+                store_data.toggle_complete(todo_id)
+                store_data.update_todo(todo_id, category="📚 学习", due_date=f"2024-02-{i % 28 + 1:02d}")
+            for todo_id in sample[200:300]:
+                store_data.delete_todo(todo_id)
+        mismatches = store_data.check_stats_consistency()
+        if mismatches:
+            raise AssertionError(f"统计不一致（{name}）: {mismatches}")
+
+    try:
+        gui = make_stub_gui(data)
+    except ImportError as e:
+        print(f"  跳过界面基准: {e}")
+        return results
+    run("gui.refresh_list", lambda g: [g.refresh_list() for _ in range(10)], setup=lambda: gui, ops=10)
+    run("gui.refresh_calendar", lambda g: [g.refresh_calendar() for _ in range(10)],
+        setup=lambda: gui, ops=10)
+
+    def search_once(g):
+        g.search_var.set("报告")
+        g.on_search()
+        g.search_var.set("")
+        g.on_search()
+    run("gui.on_search", lambda g: [search_once(g) for _ in range(5)], setup=lambda: gui, ops=10)
+    return results
+
+
+# ---- 结果 ----
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold, min_time):
+    """逐项比较每次操作的耗时，返回变慢超过阈值的项（总耗时低于min_time的项只显示不判定）"""
+    regressions = []
+    print(f"\n与基准比较（阈值 {threshold:.2f}x）:")
+    for size, ops in results["results"].items():
+        for name, result in ops.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if not old:
+                continue
+            ratio = result["per_op"] / old["per_op"] if old["per_op"] else float("inf")
+            mark = ""
+            if ratio > threshold and result["seconds"] >= min_time:
+                mark = "  ← 变慢"
+                regressions.append((size, name, ratio))
+            print(f"  {size:>8} {name:<22} {old['per_op'] * 1000:10.3f} -> "
+                  f"{result['per_op'] * 1000:10.3f} ms  {ratio:5.2f}x{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据层和界面刷新路径的基准测试")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="逗号分隔的任务数量，例如 1000,10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最小值")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--due-ratio", type=float, default=0.7, help="有截止日期的任务比例")
+    parser.add_argument("--due-span", type=int, default=365, help="截止日期分布的天数")
+    parser.add_argument("--completed-ratio", type=float, default=0.3)
+    parser.add_argument("--categories", default="默认,💼 工作,🏠 生活,📚 学习",
+                        help="逗号分隔的分类，按均匀分布随机分配")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="不测量峰值内存")
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    parser.add_argument("--compare", help="与之前的结果文件比较")
+    parser.add_argument("--threshold", type=float, default=1.25, help="判定为变慢的耗时比例")
+    parser.add_argument("--min-time", type=float, default=0.005,
+                        help="总耗时低于此秒数的项噪声太大，不判定为变慢")
+    args = parser.parse_args()
+    args.categories = tuple(args.categories.split(","))
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {key: value for key, value in vars(args).items()
+                     if key not in ("output", "compare")}
+        },
+        "results": {}
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        from todo_metrics import setup_logging, stop_logging
+        # 慢操作警告写进临时目录的日志，不打断输出
+        setup_logging(os.path.join(directory, "todo_app.log"))
+        try:
+            for size in sizes:
+                print(f"任务数量: {size}")
+                ops = bench_size(size, args, directory)
+                results["results"][str(size)] = ops
+                for name, result in ops.items():
+                    peak = result.get("peak_bytes")
+                    peak = f"{peak / 1024 / 1024:8.1f} MB" if peak is not None else ""
+                    print(f"  {name:<22} {result['seconds'] * 1000:10.2f} ms"
+                          f"  ({result['per_op'] * 1000:.4f} ms/次)  {peak}")
+        finally:
+            stop_logging()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_time)
+        if regressions:
+            print(f"\n{len(regressions)} 项变慢超过 {args.threshold:.2f}x")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
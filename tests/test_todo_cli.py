@@ -0,0 +1,63 @@
+"""命令行子命令测试"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from main import parse_gui_args
+from todo_cli import main
+
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def run_cli(self, *args):
+        """执行一条命令，返回 (退出码, 标准输出)"""
+        out = io.StringIO()
+        with contextlib.redirect_stderr(io.StringIO()):
+            code = main(["--data", "todos.json", "--format", "json", *args], out)
+        return code, out.getvalue()
+
+    def test_bare_filename_uses_current_directory(self):
+        code, output = self.run_cli("add", "买牛奶")
+        self.assertEqual(code, 0)
+        todo_id = json.loads(output)["id"]
+        self.assertTrue(os.path.exists("todos.json.journal"))
+        code, output = self.run_cli("list")
+        self.assertEqual([todo["id"] for todo in json.loads(output)], [todo_id])
+
+    def test_bulk_commands_need_all_without_filters(self):
+        for content in ("a", "b"):
+            self.run_cli("add", content)
+        self.assertEqual(self.run_cli("complete")[0], 2)
+        code, output = self.run_cli("complete", "--all")
+        self.assertEqual(json.loads(output)["changed"], 2)
+        self.assertEqual(self.run_cli("delete")[0], 2)
+        code, output = self.run_cli("delete", "--done", "missing-id")
+        self.assertEqual(code, 1)
+        self.assertEqual(json.loads(output), {"deleted": 0, "missing": ["missing-id"]})
+
+
+class GuiArgsTest(unittest.TestCase):
+    def test_archive_after_option(self):
+        self.assertEqual(parse_gui_args([]).archive_after, 30)
+        options = parse_gui_args(["--sqlite", "--archive-after", "0"])
+        self.assertEqual((options.sqlite, options.archive_after), (True, 0))
+        # 有子命令时交给命令行界面
+        self.assertIsNone(parse_gui_args(["--data", "todos.json", "list"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""JSON后端的存储测试"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_data import TodoData
+
+
+def contents(todo_data):
+    return [todo["content"] for todo in todo_data.get_todos()]
+
+
+class StorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "todos.json")
+        self.opened = []
+
+    def tearDown(self):
+        for todo_data in self.opened:
+            todo_data.close()
+        self.tmp.cleanup()
+
+    def open(self, **kwargs):
+        todo_data = TodoData(self.path, **kwargs)
+        self.opened.append(todo_data)
+        return todo_data
+
+
+class JournalTest(StorageTestCase):
+    def test_changes_replayed_from_journal(self):
+        todo_data = self.open()
+        first = todo_data.add_todo("写周报", due_date=date(2024, 6, 1), priority="high")
+        second = todo_data.add_todo("买菜")
+        todo_data.update_todo(first, content="写月报")
+        todo_data.toggle_complete(second)
+        todo_data.delete_todo(todo_data.add_todo("临时"))
+        self.assertFalse(os.path.exists(self.path))  # 还没有压缩，只有日志
+        reopened = self.open()
+        self.assertEqual([todo.to_dict() for todo in reopened.get_todos()],
+                         [todo.to_dict() for todo in todo_data.get_todos()])
+        self.assertEqual(reopened.get_todo(first)["due_date"], "2024-06-01")
+        self.assertTrue(reopened.get_todo(second)["completed"])
+
+    def test_compaction_writes_snapshot_and_resets_journal(self):
+        todo_data = self.open(compact_threshold=5)
+        for i in range(7):
+            todo_data.add_todo(f"任务{i}")
+        with open(self.path, encoding="utf-8") as f:
+            self.assertGreaterEqual(len(json.load(f)), 5)
+        self.assertLess(todo_data.journal.count, 5)
+        self.assertEqual(contents(self.open()), [f"任务{i}" for i in range(7)])
+
+    def test_torn_last_record_discarded(self):
+        todo_data = self.open()
+        todo_data.add_todo("完整的记录")
+        with open(f"{self.path}.journal", "ab") as f:
+            f.write(b'{"op": "add", "todo": {"content": "\xe5\x86\x99')  # 写到一半崩溃
+        self.assertEqual(contents(self.open()), ["完整的记录"])
+
+    def test_stale_journal_ignored(self):
+        todo_data = self.open(compact_threshold=2)
+        for content in ("a", "b", "c"):
+            todo_data.add_todo(content)
+        # 压缩时先替换快照再重置日志，两步之间崩溃留下的旧日志不会重复回放
+        with open(f"{self.path}.journal", "w", encoding="utf-8") as f:
+            f.write(json.dumps({"base": "旧快照"}) + "\n")
+            f.write(json.dumps({"op": "add", "todo": {"id": "x", "content": "重复"}}) + "\n")
+        self.assertNotIn("重复", contents(self.open()))
+
+
+class MultiProcessMergeTest(StorageTestCase):
+    def test_appends_from_other_instance_merged(self):
+        first = self.open()
+        second = self.open()
+        kept = first.add_todo("第一个进程")
+        second.add_todo("第二个进程")  # 写盘前先合并第一个进程的日志
+        self.assertEqual(sorted(contents(second)), ["第一个进程", "第二个进程"])
+        events = []
+        first.add_listener(lambda event, todo: events.append(event))
+        self.assertTrue(first.check_external_changes())
+        self.assertEqual(events, ["add"])
+        second.update_todo(kept, content="被第二个进程修改")
+        first.check_external_changes()
+        self.assertEqual(first.get_todo(kept)["content"], "被第二个进程修改")
+        self.assertFalse(first.check_external_changes())
+
+    def test_compaction_by_other_instance_reloads(self):
+        first = self.open()
+        second = self.open(compact_threshold=3)
+        first.add_todo("a")
+        for content in ("b", "c", "d"):
+            second.add_todo(content)
+        events = []
+        first.add_listener(lambda event, todo: events.append(event))
+        self.assertTrue(first.check_external_changes())
+        self.assertEqual(events, ["reset"])
+        self.assertEqual(sorted(contents(first)), ["a", "b", "c", "d"])
+
+
+class BackupRestoreTest(StorageTestCase):
+    def test_restore_backup_point(self):
+        todo_data = self.open()
+        todo_data.add_todo("备份前")
+        todo_data.backup_data(wait=True)
+        todo_data.add_todo("备份后")
+        point = todo_data.backups.list_points()[-1]
+        self.assertTrue(todo_data.restore_backup(point["id"]))
+        self.assertEqual(contents(todo_data), ["备份前"])
+        self.assertFalse(todo_data.can_undo)  # 恢复后历史清空
+        self.assertEqual(contents(self.open()), ["备份前"])
+
+
+class LazyLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "todos.json")
+        todo_data = TodoData(self.path)
+        for i in range(10):
+            todo_data.add_todo(f"任务{i}")
+        todo_data.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_export_and_backup_wait_for_loading(self):
+        todo_data = TodoData(self.path, lazy=True)
+        export_path = os.path.join(self.tmp.name, "export.jsonl")
+        exporting = threading.Thread(target=todo_data.export_todos, args=(export_path,))
+        backing_up = threading.Thread(target=todo_data.backup_data, kwargs={"wait": True})
+        exporting.start()
+        backing_up.start()
+        exporting.join(0.1)
+        self.assertTrue(exporting.is_alive())  # 加载完成之前不会导出空列表
+        todo_data.start_loading().join()
+        exporting.join()
+        backing_up.join()
+        with open(export_path, encoding="utf-8") as f:
+            self.assertEqual(len([json.loads(line) for line in f]), 10)
+        points = todo_data.backups.list_points()
+        self.assertEqual(len(todo_data.backups.restore(points[-1]["id"])), 10)
+        todo_data.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""撤销/重做历史的多进程合并、归档跳过和变更通知测试"""
+import os
+import contextlib
+import io
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_data import TodoData
+from todo_history import History
+from todo_sqlite import SqliteTodoData
+
+
+class HistoryMergeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "todos.history.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pop_removes_own_group_when_processes_interleave(self):
+        first = History(self.path)
+        second = History(self.path)
+        first.record([{"op": "delete", "id": "a"}])
+        first.flush()
+        second.record([{"op": "delete", "id": "b"}])
+        second.flush()
+        # first没有读入second的修改，取出的是自己那一组
+        self.assertEqual(first.pop("undo"), [{"op": "delete", "id": "a"}])
+        first.flush()
+        self.assertEqual([ops for _, ops in first.undo_stack], [[{"op": "delete", "id": "b"}]])
+        self.assertEqual([ops for _, ops in History(self.path).undo_stack],
+                         [[{"op": "delete", "id": "b"}]])
+
+    def test_refresh_reads_other_process(self):
+        first = History(self.path)
+        second = History(self.path)
+        second.record([{"op": "delete", "id": "b"}])
+        self.assertFalse(first.refresh())  # 还没写盘
+        second.flush()
+        self.assertTrue(first.refresh())
+        self.assertEqual(first.pop("undo"), [{"op": "delete", "id": "b"}])
+
+
+class ArchivedUndoTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.todo_data = TodoData(os.path.join(self.tmp.name, "todos.json"))
+
+    def tearDown(self):
+        self.todo_data.close()
+        self.tmp.cleanup()
+
+    def test_undo_skips_groups_of_archived_tasks(self):
+        kept = self.todo_data.add_todo("保留")
+        archived = self.todo_data.add_todo("归档")
+        self.todo_data.toggle_complete(archived)
+        self.assertEqual(self.todo_data.archive_completed(0, now=datetime.now() + timedelta(days=1)), 1)
+
+        # 完成和添加这两组都涉及已归档的任务，跳过后撤销添加"保留"
+        self.assertTrue(self.todo_data.undo())
+        self.assertEqual(self.todo_data.replay_skipped, 2)
+        self.assertIsNone(self.todo_data.get_todo(kept))
+        self.assertIsNone(self.todo_data.get_todo(archived))
+
+        self.assertFalse(self.todo_data.undo())
+        self.assertEqual(self.todo_data.replay_skipped, 0)
+
+
+class FreshDirectoryTest(unittest.TestCase):
+    def test_history_in_new_data_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            errors = io.StringIO()
+            with contextlib.redirect_stderr(errors):
+                todo_data = TodoData(os.path.join(directory, "new", "todos.json"))
+                todo_data.add_todo("任务")
+                todo_data.close()
+            self.assertEqual(errors.getvalue(), "")
+            self.assertTrue(TodoData(os.path.join(directory, "new", "todos.json")).can_undo)
+
+
+class BackendHistoryTest(unittest.TestCase):
+    def test_backends_in_one_directory_keep_separate_history(self):
+        with tempfile.TemporaryDirectory() as directory:
+            json_data = TodoData(os.path.join(directory, "todos.json"))
+            json_data.add_todo("JSON后端的任务")
+            sqlite_data = SqliteTodoData(os.path.join(directory, "todos.db"), json_filename="")
+            self.assertFalse(sqlite_data.undo())
+            sqlite_data.close()
+            json_data.close()
+            json_data = TodoData(os.path.join(directory, "todos.json"))
+            self.assertTrue(json_data.undo())
+            self.assertEqual(json_data.get_todos(), [])
+            json_data.close()
+
+    def test_backends_in_one_directory_keep_separate_rules(self):
+        with tempfile.TemporaryDirectory() as directory:
+            json_data = TodoData(os.path.join(directory, "todos.json"))
+            json_data.add_recurring("JSON后端的重复任务", "daily")
+            json_data.close()
+            sqlite_data = SqliteTodoData(os.path.join(directory, "todos.db"), json_filename="")
+            self.assertEqual(sqlite_data.get_recurring(), [])
+            sqlite_data.close()
+
+
+class ReplayNotificationMixin:
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.todo_data = self.open_data(self.tmp.name)
+        self.events = []
+        self.todo_data.add_listener(lambda event, todo: self.events.append(
+            (event, todo["id"] if todo is not None else None)))
+
+    def tearDown(self):
+        self.todo_data.close()
+        self.tmp.cleanup()
+
+    def test_single_change_replayed_with_its_own_event(self):
+        todo_id = self.todo_data.add_todo("写周报")
+        self.todo_data.update_todo(todo_id, content="写月报")
+        self.events.clear()
+        self.assertTrue(self.todo_data.undo())
+        self.assertEqual(self.todo_data.get_todo(todo_id)["content"], "写周报")
+        self.assertTrue(self.todo_data.undo())
+        self.assertTrue(self.todo_data.redo())
+        self.assertEqual(self.events, [("update", todo_id), ("delete", todo_id), ("add", todo_id)])
+
+    def test_group_replayed_with_reset(self):
+        ids = [self.todo_data.add_todo(content) for content in ("a", "b")]
+        self.todo_data.delete_many(ids)
+        self.events.clear()
+        self.assertTrue(self.todo_data.undo())
+        self.assertEqual(self.events, [("reset", None)])
+        self.assertEqual(len(self.todo_data.get_todos()), 2)
+
+
+class JsonReplayNotificationTest(ReplayNotificationMixin, unittest.TestCase):
+    def open_data(self, directory):
+        return TodoData(os.path.join(directory, "todos.json"))
+
+
+class SqliteReplayNotificationTest(ReplayNotificationMixin, unittest.TestCase):
+    def open_data(self, directory):
+        return SqliteTodoData(os.path.join(directory, "todos.db"), json_filename="")
+
+
+if __name__ == "__main__":
+    unittest.main()
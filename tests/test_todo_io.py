@@ -0,0 +1,88 @@
+"""流式导入解析和导入去重测试"""
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_data import TodoData
+from todo_io import iter_json_array, iter_todo_file, validate_todo
+
+
+class JsonArrayParserTest(unittest.TestCase):
+    def test_records_split_across_chunks(self):
+        records = [{"content": f"任务{i}, [含括号] \"引号\"", "n": i} for i in range(50)]
+        text = json.dumps(records, ensure_ascii=False, indent=2)
+        for chunk_size in (1, 7, 64, 1 << 16):
+            self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size)), records)
+
+    def test_empty_and_malformed_arrays(self):
+        self.assertEqual(list(iter_json_array(io.StringIO(" [ ] "))), [])
+        self.assertEqual(list(iter_json_array(io.StringIO(""))), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{"content": "x"}')))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"content": "x"}, '), 4))
+
+    def test_validate_todo(self):
+        todo = validate_todo({"content": "写周报", "due_date": "2024-06-01", "completed": 1})
+        self.assertEqual((todo["completed"], todo["priority"], todo["category"]), (True, "normal", "默认"))
+        for data in ({"content": " "}, {"content": "x", "due_date": "明天"},
+                     {"content": "x", "priority": 1}, ["content"]):
+            with self.assertRaises(ValueError):
+                validate_todo(data)
+
+
+class ImportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.todo_data = TodoData(os.path.join(self.tmp.name, "todos.json"))
+
+    def tearDown(self):
+        self.todo_data.close()
+        self.tmp.cleanup()
+
+    def write(self, name, lines):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(lines)
+        return path
+
+    def test_json_lines_import_skips_invalid_and_duplicates(self):
+        existing = self.todo_data.add_todo("已有的任务")
+        records = [{"content": "新任务", "create_time": "2024-06-01 12:00:00"},
+                   {"content": "新任务", "create_time": "2024-06-01 12:00:00"},
+                   {"id": existing, "content": "同一个ID"},
+                   {"content": ""},
+                   {"content": "另一个新任务"}]
+        path = self.write("import.jsonl", "\n".join(json.dumps(r, ensure_ascii=False) for r in records)
+                          + "\n\n")
+        self.assertEqual(len(list(iter_todo_file(path))), 5)
+        progress = []
+        self.assertTrue(self.todo_data.import_todos(path, batch_size=2, progress=progress.append))
+        self.assertEqual(progress[-1], {"read": 5, "imported": 2, "duplicates": 2, "invalid": 1})
+        self.assertEqual([todo["content"] for todo in self.todo_data.get_todos()],
+                         ["已有的任务", "新任务", "另一个新任务"])
+        # 整个导入作为一组撤销
+        self.assertTrue(self.todo_data.undo())
+        self.assertEqual([todo["content"] for todo in self.todo_data.get_todos()], ["已有的任务"])
+
+    def test_export_import_round_trip(self):
+        for content in ("a", "b"):
+            self.todo_data.add_todo(content, due_date="2024-06-01")
+        path = os.path.join(self.tmp.name, "export.json")
+        self.assertTrue(self.todo_data.export_todos(path))
+        other = TodoData(os.path.join(self.tmp.name, "other.json"))
+        try:
+            self.assertTrue(other.import_todos(path))
+            self.assertEqual([todo.to_dict() for todo in other.get_todos()],
+                             [todo.to_dict() for todo in self.todo_data.get_todos()])
+        finally:
+            other.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+"""紧凑任务记录的读写测试"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_record import TodoRecord
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_create_time_written_back_unchanged(self):
+        for value in ("2024-06-01 12:00:00", "2024-06-01 12:00:00.5", "2024-06-01T12:00:00",
+                      "2024-06-01", "2024-06-01T12:00:00+08:00", "昨天", None):
+            data = {"id": "a", "content": "任务", "completed": False, "create_time": value,
+                    "due_date": None, "priority": "normal", "category": "默认"}
+            record = TodoRecord.from_dict(data)
+            self.assertEqual(record.to_dict(), data, value)
+            self.assertEqual(TodoRecord.snapshot_to_dict(record.snapshot()), data, value)
+
+    def test_canonical_create_time_stored_compactly(self):
+        record = TodoRecord("a", "任务", create_time="2024-06-01 12:00:00")
+        self.assertIsNotNone(record.created)
+        self.assertIsNone(record.extra)
+
+    def test_unknown_fields_and_dates_kept(self):
+        data = {"id": "a", "content": "任务", "completed": True, "create_time": None,
+                "due_date": "下周", "priority": "urgent", "category": "自定义", "note": "备注"}
+        self.assertEqual(TodoRecord.from_dict(data).to_dict(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
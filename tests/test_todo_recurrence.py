@@ -0,0 +1,79 @@
+"""重复任务的规则和单次重复测试"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_data import TodoData
+from todo_recurrence import RecurrenceRule
+
+
+def days(rule, start, end):
+    return [day.isoformat() for day in rule.occurrences(start, end)]
+
+
+class RecurrenceRuleTest(unittest.TestCase):
+    def test_daily_interval_starts_from_rule_start(self):
+        rule = RecurrenceRule("r", "浇花", "daily", "2024-01-01", interval=3)
+        self.assertEqual(days(rule, date(2024, 1, 5), date(2024, 1, 12)),
+                         ["2024-01-07", "2024-01-10"])
+
+    def test_weekly_weekdays_and_until(self):
+        rule = RecurrenceRule("r", "健身", "weekly", "2024-06-03", weekdays=[0, 2], until="2024-06-12")
+        self.assertEqual(days(rule, date(2024, 6, 1), date(2024, 6, 30)),
+                         ["2024-06-03", "2024-06-05", "2024-06-10", "2024-06-12"])
+        every_other = RecurrenceRule("r", "开会", "weekly", "2024-06-03", interval=2)
+        self.assertEqual(days(every_other, date(2024, 6, 10), date(2024, 7, 1)),
+                         ["2024-06-17", "2024-07-01"])
+
+    def test_monthly_clamps_to_month_end(self):
+        rule = RecurrenceRule("r", "交房租", "monthly", "2024-01-31")
+        self.assertEqual(days(rule, date(2024, 2, 1), date(2024, 4, 30)),
+                         ["2024-02-29", "2024-03-31", "2024-04-30"])
+        yearly = RecurrenceRule("r", "纪念日", "yearly", "2020-02-29")
+        self.assertEqual(days(yearly, date(2021, 1, 1), date(2024, 12, 31)),
+                         ["2021-02-28", "2022-02-28", "2023-02-28", "2024-02-29"])
+
+    def test_invalid_rules_rejected(self):
+        for args in (("hourly", "2024-01-01"), ("daily", "明天"), ("daily", "2024-01-01", 0)):
+            with self.assertRaises(ValueError):
+                RecurrenceRule("r", "x", *args)
+
+
+class OccurrenceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "todos.json")
+        self.todo_data = TodoData(self.path)
+
+    def tearDown(self):
+        self.todo_data.close()
+        self.tmp.cleanup()
+
+    def test_complete_and_delete_single_occurrences(self):
+        rule_id = self.todo_data.add_recurring("写日报", "daily", start=date(2024, 6, 1))
+        occurrences = self.todo_data.get_occurrences(date(2024, 6, 1), date(2024, 6, 3))
+        self.assertEqual([todo["due_date"] for todo in occurrences],
+                         ["2024-06-01", "2024-06-02", "2024-06-03"])
+        first, second = occurrences[0]["id"], occurrences[1]["id"]
+        self.todo_data.toggle_complete(first)
+        self.todo_data.delete_todo(second)
+        self.todo_data.close()
+
+        self.todo_data = TodoData(self.path)
+        occurrences = self.todo_data.get_occurrences(date(2024, 6, 1), date(2024, 6, 3))
+        self.assertEqual([(todo["due_date"], todo["completed"]) for todo in occurrences],
+                         [("2024-06-01", True), ("2024-06-03", False)])
+        self.assertIsNone(self.todo_data.get_todo(second))
+        self.assertTrue(self.todo_data.undo())  # 撤销删除这一次
+        self.assertIsNotNone(self.todo_data.get_todo(second))
+
+        self.assertTrue(self.todo_data.delete_recurring(rule_id))
+        self.assertEqual(self.todo_data.get_occurrences(date(2024, 6, 1), date(2024, 6, 3)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""截止日期提醒测试"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime, time, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_data import TodoData
+from todo_reminders import ReminderScheduler
+
+
+class ReminderSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.todo_data = TodoData(os.path.join(self.tmp.name, "todos.json"))
+        self.fired = []
+        self.reminders = ReminderScheduler(self.todo_data, self.fired.extend, remind_time=time(0, 0))
+        self.todo_data.add_listener(self.reminders.on_event)
+
+    def tearDown(self):
+        self.todo_data.close()
+        self.tmp.cleanup()
+
+    def test_fired_reminder_not_repeated_until_due_date_changes(self):
+        today = date.today()
+        todo_id = self.todo_data.add_todo("写周报", due_date=today)
+        self.todo_data.add_todo("昨天的任务", due_date=today - timedelta(days=1))
+        self.reminders.rebuild()
+        self.assertEqual([todo["id"] for todo in self.reminders.fire()], [todo_id])
+
+        self.todo_data.update_todo(todo_id, content="写月报")
+        self.reminders.rebuild()  # 整体替换（reset）也不再提醒
+        self.assertEqual(self.reminders.pending(), 0)
+        self.assertEqual(self.reminders.fire(), [])
+
+        self.todo_data.update_todo(todo_id, due_date=today + timedelta(days=1))
+        self.assertEqual(self.reminders.pending(), 1)
+        self.assertEqual(self.reminders.fire(), [])
+        fired = self.reminders.fire(now=datetime.combine(today + timedelta(days=1), time(0, 1)))
+        self.assertEqual([todo["id"] for todo in fired], [todo_id])
+        self.assertEqual(len(self.fired), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""全文搜索测试"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_data import TodoData
+from todo_search import SearchIndex
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add("a", "写周报")
+        self.index.add("b", "周报模板 Review")
+        self.index.add("c", "买菜")
+
+    def test_ranking_and_terms(self):
+        self.assertEqual(self.index.search("周报"), ["b", "a"])  # 匹配位置靠前的在前
+        self.assertEqual(self.index.search("周报 review"), ["b"])
+        self.assertEqual(self.index.search("菜"), ["c"])  # 单个字符直接扫描
+        self.assertEqual(self.index.search("月报"), [])
+
+    def test_candidates_restrict_results(self):
+        self.assertEqual(self.index.search("周报", candidates={"b", "c"}), ["b"])
+
+    def test_update_and_remove(self):
+        self.index.update("a", "写月报")
+        self.assertEqual(self.index.search("周报"), ["b"])
+        self.assertEqual(self.index.search("月报"), ["a"])
+        self.index.remove("b")
+        self.assertEqual(self.index.search("周报"), [])
+        self.assertFalse(self.index.matches("b", "周报"))
+        self.assertTrue(self.index.matches("a", "月"))
+
+    def test_compaction_after_many_removals(self):
+        for i in range(3000):
+            self.index.add(f"t{i}", f"临时任务{i}")
+        for i in range(3000):
+            if i != 1234:
+                self.index.remove(f"t{i}")
+        self.assertLess(len(self.index._ids), 3000)  # 空槽位已经清理
+        self.assertEqual(self.index.search("临时"), ["t1234"])
+        self.assertEqual(self.index.search("周报"), ["b", "a"])
+
+
+class TodoDataSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.todo_data = TodoData(os.path.join(self.tmp.name, "todos.json"))
+
+    def tearDown(self):
+        self.todo_data.close()
+        self.tmp.cleanup()
+
+    def test_index_built_on_first_search_and_kept_up_to_date(self):
+        report = self.todo_data.add_todo("写周报", category="工作")
+        self.todo_data.add_todo("买菜", category="生活")
+        self.assertIsNone(self.todo_data._search_index)
+        self.assertEqual([todo.id for todo in self.todo_data.search("周报")], [report])
+        # 建立之后随修改增量维护
+        self.todo_data.update_todo(report, content="写月报")
+        self.assertEqual(self.todo_data.search("周报"), [])
+        self.assertTrue(self.todo_data.matches_query(report, "月报"))
+        self.todo_data.delete_todo(report)
+        self.assertEqual(self.todo_data.search("月报"), [])
+        self.assertEqual(len(self.todo_data.search("菜", category="生活")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""接口服务的读写测试，JSON和SQLite两种后端各跑一遍"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_data import TodoData
+from todo_server import EXTERNAL_CHECK_INTERVAL, TodoServer
+from todo_sqlite import SqliteTodoData
+
+
+async def request(port, method, path, payload=None):
+    """发送一个请求，返回 (状态码, JSON对象)"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(data.decode("utf-8"))
+
+
+class ServerTestMixin:
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.todo_data = self.open_data(self.tmp.name)
+
+    def tearDown(self):
+        self.todo_data.close()
+        self.tmp.cleanup()
+
+    def run_server(self, scenario):
+        async def main():
+            server = TodoServer(self.todo_data, port=0)
+            await server.start()
+            try:
+                return await scenario(server.port)
+            finally:
+                await server.stop()
+        return asyncio.run(main())
+
+    def test_writes_and_reads(self):
+        async def scenario(port):
+            status, created = await request(port, "POST", "/todos", {"content": "写周报", "priority": "high"})
+            self.assertEqual(status, 201)
+            todo_id = created["id"]
+            status, todo = await request(port, "POST", f"/todos/{todo_id}/toggle")
+            self.assertEqual((status, todo["completed"]), (200, True))
+            status, todo = await request(port, "PATCH", f"/todos/{todo_id}", {"content": "写月报"})
+            self.assertEqual((status, todo["content"]), (200, "写月报"))
+            status, page = await request(port, "GET", f"/todos?q={quote('月报')}")
+            self.assertEqual([item["id"] for item in page["items"]], [todo_id])
+            status, stats = await request(port, "GET", "/stats")
+            self.assertEqual((stats["total"], stats["completed"]), (1, 1))
+            status, _ = await request(port, "DELETE", f"/todos/{todo_id}")
+            self.assertEqual(status, 200)
+            status, _ = await request(port, "GET", f"/todos/{todo_id}")
+            self.assertEqual(status, 404)
+        self.run_server(scenario)
+
+    def test_concurrent_adds_keep_order(self):
+        async def scenario(port):
+            results = await asyncio.gather(*[request(port, "POST", "/todos", {"content": f"任务{i}"})
+                                             for i in range(20)])
+            self.assertEqual({status for status, _ in results}, {201})
+            # 外部修改检查和写请求走同一个写入线程
+            await asyncio.sleep(EXTERNAL_CHECK_INTERVAL + 0.2)
+            status, page = await request(port, "GET", "/todos?limit=100")
+            self.assertEqual(len(page["items"]), 20)
+        self.run_server(scenario)
+
+    def test_invalid_fields_rejected(self):
+        async def scenario(port):
+            for payload in ({"content": " "}, {"content": "x", "completed": "yes"},
+                            {"content": "x", "due_date": 5}):
+                status, _ = await request(port, "POST", "/todos", payload)
+                self.assertEqual(status, 400)
+        self.run_server(scenario)
+
+
+class JsonServerTest(ServerTestMixin, unittest.TestCase):
+    def open_data(self, directory):
+        return TodoData(os.path.join(directory, "todos.json"), write_behind=True)
+
+
+class SqliteServerTest(ServerTestMixin, unittest.TestCase):
+    def open_data(self, directory):
+        return SqliteTodoData(os.path.join(directory, "todos.db"), json_filename="")
+
+
+if __name__ == "__main__":
+    unittest.main()
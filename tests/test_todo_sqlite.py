@@ -0,0 +1,79 @@
+"""SQLite后端测试"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_sqlite import SqliteTodoData
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_json(self, name, contents):
+        with open(os.path.join(self.tmp.name, name), "w", encoding="utf-8") as f:
+            json.dump([{"content": content} for content in contents], f, ensure_ascii=False)
+
+    def test_migrates_json_next_to_database(self):
+        self.write_json("work.json", ["写周报"])
+        self.write_json("todos.json", ["别的数据"])
+        todo_data = SqliteTodoData(os.path.join(self.tmp.name, "work.db"))
+        try:
+            self.assertEqual([todo["content"] for todo in todo_data.get_todos()], ["写周报"])
+            # 迁移不是一次可撤销的导入
+            self.assertFalse(todo_data.can_undo)
+            self.assertFalse(todo_data.undo())
+            self.assertEqual(len(todo_data.get_todos()), 1)
+        finally:
+            todo_data.close()
+
+    def test_empty_json_filename_skips_migration(self):
+        self.write_json("todos.json", ["写周报"])
+        todo_data = SqliteTodoData(os.path.join(self.tmp.name, "todos.db"), json_filename="")
+        try:
+            self.assertEqual(todo_data.get_todos(), [])
+        finally:
+            todo_data.close()
+
+
+class SqliteStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "todos.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_changes_persist_and_queries_use_columns(self):
+        todo_data = SqliteTodoData(self.path)
+        report = todo_data.add_todo("写周报", due_date=date(2024, 6, 1), priority="high", category="💼 工作")
+        shopping = todo_data.add_todo("买菜", due_date="2024-06-02", category="🏠 生活")
+        todo_data.toggle_complete(shopping)
+        self.assertEqual(todo_data.delete_many([todo_data.add_todo("临时"), "missing"]), 1)
+        todo_data.close()
+
+        todo_data = SqliteTodoData(self.path)
+        try:
+            self.assertEqual([todo["id"] for todo in todo_data.get_todos()], [report, shopping])
+            self.assertEqual(todo_data.get_stats(), (2, 1))
+            self.assertEqual([todo["id"] for todo in todo_data.get_todos_by_date("2024-06-01")], [report])
+            self.assertEqual([todo["id"] for todo in todo_data.search("周报", priority="high")], [report])
+            self.assertEqual([todo["id"] for todo in todo_data.search(category="🏠 生活", completed=True)],
+                             [shopping])
+            # 撤销历史跨重启保存
+            self.assertTrue(todo_data.undo())
+            self.assertEqual(len(todo_data.get_todos()), 3)
+        finally:
+            todo_data.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
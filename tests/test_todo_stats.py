@@ -0,0 +1,42 @@
+"""增量统计的一致性测试"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "todo_app"))
+
+from todo_data import TodoData
+
+
+class TaskStatsConsistencyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.todo_data = TodoData(os.path.join(self.tmp.name, "todos.json"))
+
+    def tearDown(self):
+        self.todo_data.close()
+        self.tmp.cleanup()
+
+    def test_mutations_keep_stats_consistent(self):
+        ids = [self.todo_data.add_todo(f"任务{i}", due_date="2024-06-01", category="工作")
+               for i in range(5)]
+        self.todo_data.toggle_complete(ids[0])
+        self.todo_data.update_todo(ids[1], category="生活", priority="high", due_date=None)
+        self.todo_data.delete_todo(ids[2])
+        self.assertEqual(self.todo_data.get_stats(), (4, 1))
+        self.assertEqual(self.todo_data.check_stats_consistency(), [])
+
+    def test_failed_update_keeps_stats_and_record(self):
+        todo_id = self.todo_data.add_todo("原内容", category="工作")
+        with self.assertRaises(TypeError):
+            self.todo_data.update_todo(todo_id, content="新内容", category=["不能作为分类"])
+        todo = self.todo_data.get_todo(todo_id)
+        self.assertEqual(todo["content"], "原内容")
+        self.assertEqual(todo["category"], "工作")
+        self.assertEqual(self.todo_data.get_stats(), (1, 0))
+        self.assertEqual(self.todo_data.check_stats_consistency(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
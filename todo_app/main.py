@@ -1,13 +1,47 @@
-from todo_data import TodoData
-from todo_gui import TodoGUI
+import argparse
+import sys
+
+ARCHIVE_AFTER = 30  # 默认把完成超过多少天的任务归档
+
+
+def parse_gui_args(args):
+    """解析图形界面的选项，还有其他参数（子命令）时返回None"""
+    parser = argparse.ArgumentParser(prog="main.py", add_help=False, allow_abbrev=False)
+    parser.add_argument("--sqlite", action="store_true", help="使用SQLite后端")
+    parser.add_argument("--archive-after", type=int, default=ARCHIVE_AFTER, metavar="DAYS",
+                        help=f"加载后归档完成超过DAYS天的任务（默认{ARCHIVE_AFTER}，0表示不自动归档）")
+    options, rest = parser.parse_known_args(args)
+    if rest:
+        return None
+    if options.archive_after < 0:
+        parser.error("--archive-after 不能是负数")
+    return options
 
 def main():
-    # 创建数据管理器
-    todo_data = TodoData()
-    
+    args = sys.argv[1:]
+    options = parse_gui_args(args)
+    # 带子命令时走命令行界面，不导入任何GUI相关的模块
+    if options is None:
+        from todo_cli import main as cli_main
+        sys.exit(cli_main(args))
+
+    from todo_metrics import setup_logging
+    setup_logging()
+
+    # 创建数据管理器（--sqlite 使用SQLite后端）
+    if options.sqlite:
+        from todo_sqlite import SqliteTodoData
+        todo_data = SqliteTodoData()
+    else:
+        from todo_data import TodoData
+        # 数据在窗口显示之后由GUI启动后台加载，完成超过archive_after天的任务在加载后归档
+        todo_data = TodoData(write_behind=True, lazy=True,
+                             archive_after=options.archive_after or None)
+
     # 创建并运行GUI
+    from todo_gui import TodoGUI
     app = TodoGUI(todo_data)
     app.run()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,130 @@
+"""已完成任务的归档
+
+完成很久的任务移到单独的JSON Lines文件，不再留在内存、快照和每次保存里。
+归档文件只追加；另有一个很小的摘要文件记录归档的数量（总数、按分类、按优先级），
+统计时只读摘要。归档内容只在打开历史记录或搜索归档时才读取。
+"""
+import json
+import os
+import sys
+
+from todo_io import iter_json_lines, write_todo_file
+from todo_storage import atomic_write, file_signature
+
+
+def _empty_summary():
+    return {"total": 0, "by_category": {}, "by_priority": {}}
+
+
+class Archive:
+    """归档文件 + 摘要文件，调用方负责跨进程的文件锁"""
+
+    def __init__(self, path):
+        self.path = path  # JSON Lines
+        self.summary_path = os.path.splitext(path)[0] + ".json"
+        self._summary = None
+        self._summary_state = None
+        self._cache = None        # 读取过的归档记录
+        self._cache_state = None  # 读取时归档文件的状态，其他进程追加后重新读取
+
+    @property
+    def summary(self):
+        """归档数量的摘要 {total, by_category, by_priority}"""
+        return self._load_summary()
+
+    def _load_summary(self):
+        """摘要文件被其他进程更新过时重新读取"""
+        state = file_signature(self.summary_path)
+        if self._summary is None or state != self._summary_state:
+            self._summary = self._read_summary()
+            self._summary_state = state
+        return self._summary
+
+    def _read_summary(self):
+        try:
+            with open(self.summary_path, 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+        except FileNotFoundError:
+            return _empty_summary()
+        except (OSError, ValueError) as e:
+            print(f"读取归档摘要时出错，重新统计: {e}", file=sys.stderr)
+            return self.rebuild_summary()
+        return summary if summary.get("total") is not None else _empty_summary()
+
+    def _write_summary(self):
+        atomic_write(self.summary_path, json.dumps(self._summary, ensure_ascii=False).encode('utf-8'))
+        self._summary_state = file_signature(self.summary_path)
+
+    def _count(self, todos, n):
+        """按任务增减摘要中的数量，调用前需确保_summary已读取"""
+        for todo in todos:
+            self._summary["total"] += n
+            for key, field in (("by_category", "category"), ("by_priority", "priority")):
+                groups = self._summary[key]
+                value = todo.get(field)
+                groups[value] = groups.get(value, 0) + n
+                if not groups[value]:
+                    del groups[value]
+
+    def rebuild_summary(self):
+        """扫描归档文件重新统计摘要"""
+        self._summary = _empty_summary()
+        self._count(self.load(), 1)
+        self._write_summary()
+        return self._summary
+
+    def append(self, todos):
+        """追加一批任务（一次写入），并更新摘要"""
+        if not todos:
+            return 0
+        data = "".join(json.dumps(todo, ensure_ascii=False) + "\n" for todo in todos).encode('utf-8')
+        self._load_summary()
+        with open(self.path, 'ab') as f:
+            f.write(data)
+        self._count(todos, 1)
+        self._write_summary()
+        self._cache = None
+        return len(todos)
+
+    def load(self):
+        """读取全部归档记录（同一ID出现多次时以最后一条为准）"""
+        state = file_signature(self.path)
+        if self._cache is None or state != self._cache_state:
+            todos = {}
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for todo in iter_json_lines(f):
+                        todos[todo.get("id")] = todo
+            except FileNotFoundError:
+                pass
+            self._cache = list(todos.values())
+            self._cache_state = state
+        return self._cache
+
+    def search(self, query="", limit=None):
+        """按内容关键词搜索归档，最近归档的排在前面"""
+        terms = query.casefold().split()
+        results = []
+        for todo in reversed(self.load()):
+            content = str(todo.get("content", "")).casefold()
+            if all(term in content for term in terms):
+                results.append(todo)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def remove(self, todo_ids):
+        """从归档中取出指定的任务（重写归档文件），返回取出的记录"""
+        todo_ids = set(todo_ids)
+        todos = self.load()
+        removed = [todo for todo in todos if todo.get("id") in todo_ids]
+        if not removed:
+            return []
+        kept = [todo for todo in todos if todo.get("id") not in todo_ids]
+        self._load_summary()
+        write_todo_file(self.path, kept)
+        self._count(removed, -1)
+        self._write_summary()
+        self._cache = kept
+        self._cache_state = file_signature(self.path)
+        return removed
@@ -0,0 +1,239 @@
+import gzip
+import json
+import lzma
+import os
+import threading
+import zlib
+from datetime import datetime
+
+from todo_storage import atomic_write
+
+
+def _fingerprint(todo):
+    """任务内容的指纹，用于找出两次备份之间变化的任务"""
+    return zlib.crc32(json.dumps(todo, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+
+def compose(first, second):
+    """把两个相邻的增量合并成一个"""
+    deletes = set(second["deletes"])
+    upserts = {k: v for k, v in first["upserts"].items() if k not in deletes}
+    upserts.update(second["upserts"])
+    deletes |= set(first["deletes"]) - set(second["upserts"])
+    return {"upserts": upserts, "deletes": sorted(deletes)}
+
+
+def apply_delta(state, delta):
+    """把增量应用到 id -> 任务 的字典上"""
+    for todo_id in delta["deletes"]:
+        state.pop(todo_id, None)
+    state.update(delta["upserts"])
+    return state
+
+
+class BackupManager:
+    """压缩的增量备份
+
+    每条备份链以一个完整快照（base）开头，后面跟着若干增量（delta），
+    增量只记录与上一次备份相比新增/修改的任务和被删除的ID。
+    manifest.json按时间顺序记录所有备份点；state.json.gz保存上次备份时
+    每个任务的指纹，用来计算下一次的增量。
+
+    保留策略：最近一天内每小时保留最新的一个，最近一个月内每天保留最新的一个，
+    更早的删除。删除增量时会把它合并进下一个保留的增量，删除快照时会把下一个
+    保留的备份点改写成新的快照，因此所有保留下来的备份点都可以恢复。
+    """
+
+    def __init__(self, directory, compression="gzip", max_chain=48,
+                 hourly_for=86400, daily_for=30 * 86400):
+        self.directory = directory
+        self.compression = compression
+        self.max_chain = max_chain
+        self.hourly_for = hourly_for
+        self.daily_for = daily_for
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # ---- 文件读写 ----
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write(self, name, data):
+        raw = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if name.endswith(".xz"):
+            raw = lzma.compress(raw)
+        else:
+            raw = gzip.compress(raw)
+        atomic_write(self._path(name), raw)
+
+    def _read(self, name):
+        with open(self._path(name), 'rb') as f:
+            raw = f.read()
+        raw = lzma.decompress(raw) if name.endswith(".xz") else gzip.decompress(raw)
+        return json.loads(raw.decode('utf-8'))
+
+    def _load_manifest(self):
+        try:
+            with open(self._path("manifest.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _save_manifest(self, points):
+        data = json.dumps(points, ensure_ascii=False, indent=2).encode('utf-8')
+        atomic_write(self._path("manifest.json"), data)
+
+    def _file_name(self, point_id, kind):
+        suffix = ".json.xz" if self.compression == "lzma" else ".json.gz"
+        return f"todos_{kind}_{point_id}{suffix}"
+
+    # ---- 备份与恢复 ----
+
+    def list_points(self):
+        """按时间顺序列出所有备份点"""
+        return self._load_manifest()
+
+    def create(self, todos, now=None):
+        """创建一个备份点，todos为任务字典列表；没有变化时返回None"""
+        now = now or datetime.now()
+        with self._lock:
+            points = self._load_manifest()
+            fingerprints = {todo["id"]: _fingerprint(todo) for todo in todos}
+            chain_length = 0
+            for point in reversed(points):
+                chain_length += 1
+                if point["kind"] == "base":
+                    break
+            need_base = not points or chain_length >= self.max_chain
+
+            point_id = now.strftime("%Y%m%d_%H%M%S_%f")
+            if need_base:
+                kind = "base"
+                content = {todo["id"]: todo for todo in todos}
+            else:
+                kind = "delta"
+                previous = {k: int(v) for k, v in self._read("state.json.gz").items()}
+                content = {
+                    "upserts": {todo["id"]: todo for todo in todos
+                                if previous.get(todo["id"]) != fingerprints[todo["id"]]},
+                    "deletes": [todo_id for todo_id in previous if todo_id not in fingerprints]
+                }
+                if not content["upserts"] and not content["deletes"]:
+                    return None
+
+            name = self._file_name(point_id, kind)
+            self._write(name, content)
+            self._write("state.json.gz", fingerprints)
+            points.append({
+                "id": point_id,
+                "time": now.strftime("%Y-%m-%d %H:%M:%S"),
+                "kind": kind,
+                "file": name,
+                "count": len(todos)
+            })
+            points, obsolete = self._apply_retention(points, now)
+            # 先更新清单再删除文件，中途崩溃也不会让清单指向不存在的文件
+            self._save_manifest(points)
+            for name in obsolete:
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+            return point_id
+
+    def restore(self, point_id):
+        """恢复到指定备份点，返回任务字典列表"""
+        with self._lock:
+            points = self._load_manifest()
+            index = next((i for i, p in enumerate(points) if p["id"] == point_id), None)
+            if index is None:
+                raise KeyError(f"备份点不存在: {point_id}")
+            return list(self._materialize(points, index).values())
+
+    def _materialize(self, points, index):
+        """从所在链的快照开始回放增量，得到某个备份点的完整数据"""
+        start = index
+        while points[start]["kind"] != "base":
+            start -= 1
+        state = self._read(points[start]["file"])
+        for point in points[start + 1:index + 1]:
+            apply_delta(state, self._read(point["file"]))
+        return state
+
+    # ---- 保留策略 ----
+
+    def _keep(self, points, now):
+        """计算需要保留的备份点ID"""
+        keep = {points[-1]["id"]}
+        buckets = {}
+        for point in points:
+            age = (now - datetime.strptime(point["time"], "%Y-%m-%d %H:%M:%S")).total_seconds()
+            if age <= self.hourly_for:
+                bucket = ("hour", point["time"][:13])
+            elif age <= self.daily_for:
+                bucket = ("day", point["time"][:10])
+            else:
+                continue
+            buckets[bucket] = point["id"]   # 同一时间段内保留最新的
+        keep.update(buckets.values())
+        return keep
+
+    def _apply_retention(self, points, now):
+        """删除过期的备份点，并改写受影响的后续备份点
+
+        返回 (保留的备份点, 可以删除的文件)。没有需要删除的备份点的链原样保留，
+        不会读取其中的文件。
+        """
+        keep = self._keep(points, now)
+        if len(keep) == len(points):
+            return points, []
+
+        chains = []
+        for point in points:
+            if point["kind"] == "base" or not chains:
+                chains.append([])
+            chains[-1].append(point)
+
+        result = []
+        obsolete = []
+        for chain in chains:
+            if all(point["id"] in keep for point in chain):
+                result.extend(chain)
+            else:
+                self._prune_chain(chain, keep, result, obsolete)
+        return result, obsolete
+
+    def _prune_chain(self, chain, keep, result, obsolete):
+        """处理一条备份链中要删除的备份点"""
+        base = chain[0]
+        base_kept = base["id"] in keep
+        # 快照被删除时需要回放出完整数据，用来把下一个保留的备份点改写成快照
+        state = None if base_kept else self._read(base["file"])
+        carry = None  # 已删除但尚未合并进后续备份点的增量
+        if base_kept:
+            result.append(base)
+        else:
+            obsolete.append(base["file"])
+
+        for point in chain[1:]:
+            delta = self._read(point["file"])
+            if state is not None:
+                apply_delta(state, delta)
+            if point["id"] not in keep:
+                carry = delta if carry is None else compose(carry, delta)
+                obsolete.append(point["file"])
+                continue
+
+            if state is not None:
+                obsolete.append(point["file"])
+                point = dict(point, kind="base", file=self._file_name(point["id"], "base"))
+                self._write(point["file"], state)
+                state = None
+            elif carry is not None:
+                # 合并后的增量写到新文件，旧文件在清单更新后再删除
+                obsolete.append(point["file"])
+                point = dict(point, file=self._file_name(point["id"] + "m", "delta"))
+                self._write(point["file"], compose(carry, delta))
+            carry = None
+            result.append(point)
@@ -0,0 +1,418 @@
+"""命令行界面：不依赖Tkinter，适合脚本和定时任务调用
+
+用法示例:
+    python main.py add "写周报" --due 2024-06-01 --priority high --category "💼 工作"
+    python main.py --format json list --open
+    python main.py search 周报
+    python main.py complete --category "💼 工作" --due-to 2024-05-31
+    python main.py stats
+    python main.py remind --lead-days 1
+    python main.py recur "交周报" --freq weekly --weekdays 4
+    python main.py list --due-from 2024-06-01 --due-to 2024-06-30
+    python main.py undo
+    python main.py archive --days 30
+    python main.py history 周报
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from todo_index import parse_date
+from todo_metrics import metrics, setup_logging
+from todo_record import PRIORITIES
+from todo_recurrence import FREQUENCIES
+from todo_reminders import REMIND_TIME, ReminderScheduler
+
+
+TSV_FIELDS = ("id", "completed", "due_date", "priority", "category", "content")
+
+
+def _tsv_value(value):
+    """TSV中的单元格：布尔值写成0/1，列表用逗号连接，制表符和换行转义"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (list, tuple)):
+        return ",".join(_tsv_value(item) for item in value)
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _write_todos(todos, fmt, out):
+    """按格式输出任务列表"""
+    if fmt == "json":
+        json.dump([todo.to_dict() if hasattr(todo, "to_dict") else todo for todo in todos],
+                  out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        out.write("\t".join(TSV_FIELDS) + "\n")
+        for todo in todos:
+            out.write("\t".join(_tsv_value(todo.get(field)) for field in TSV_FIELDS) + "\n")
+
+
+def _write_result(result, fmt, out):
+    """输出单个结果对象（JSON或 键\\t值 的TSV）"""
+    if fmt == "json":
+        json.dump(result, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        for key, value in result.items():
+            if isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    out.write(f"{key}.{_tsv_value(sub_key)}\t{_tsv_value(sub_value)}\n")
+            else:
+                out.write(f"{key}\t{_tsv_value(value)}\n")
+
+
+def _date_arg(value):
+    """argparse用的日期参数类型"""
+    day = parse_date(value)
+    if day is None:
+        raise argparse.ArgumentTypeError(f"日期格式错误: {value}（应为YYYY-MM-DD）")
+    return day
+
+
+def _add_filter_arguments(parser):
+    """list / filter / search / complete / delete 共用的筛选参数"""
+    parser.add_argument("--category", help="按分类筛选")
+    parser.add_argument("--priority", choices=PRIORITIES.names, help="按优先级筛选")
+    parser.add_argument("--due-from", type=_date_arg, help="截止日期不早于（YYYY-MM-DD）")
+    parser.add_argument("--due-to", type=_date_arg, help="截止日期不晚于（YYYY-MM-DD）")
+    status = parser.add_mutually_exclusive_group()
+    status.add_argument("--open", dest="completed", action="store_const", const=False,
+                        help="只包括未完成的任务")
+    status.add_argument("--done", dest="completed", action="store_const", const=True,
+                        help="只包括已完成的任务")
+
+
+def _has_filter(args):
+    return any(value is not None for value in (
+        args.category, args.priority, args.due_from, args.due_to, args.completed,
+        getattr(args, "query", None)
+    ))
+
+
+def _select(todo_data, args, limit=None):
+    """按命令行的筛选条件查询任务"""
+    return todo_data.search(
+        getattr(args, "query", None) or "",
+        category=args.category,
+        priority=args.priority,
+        start=args.due_from,
+        end=args.due_to,
+        completed=args.completed,
+        limit=limit
+    )
+
+
+def _targets(todo_data, args):
+    """批量操作的目标：命令行给出的ID，或者符合筛选条件的全部任务"""
+    if args.ids:
+        todo_ids = list(dict.fromkeys(args.ids))
+        return todo_ids, [todo_id for todo_id in todo_ids if todo_data.get_todo(todo_id) is None]
+    return [todo["id"] for todo in _select(todo_data, args)], []
+
+
+def cmd_add(todo_data, args, out):
+    todo_id = todo_data.add_todo(
+        args.content,
+        due_date=args.due,
+        priority=args.priority,
+        category=args.category
+    )
+    _write_result({"id": todo_id}, args.format, out)
+    return 0
+
+
+def cmd_list(todo_data, args, out):
+    _write_todos(_select(todo_data, args, args.limit), args.format, out)
+    return 0
+
+
+def cmd_filter(todo_data, args, out):
+    if not _has_filter(args):
+        print("filter至少需要一个筛选条件", file=sys.stderr)
+        return 2
+    return cmd_list(todo_data, args, out)
+
+
+def cmd_complete(todo_data, args, out):
+    if not args.ids and not _has_filter(args) and not args.all:
+        print("修改全部任务需要加 --all", file=sys.stderr)
+        return 2
+    todo_ids, missing = _targets(todo_data, args)
+    changed = todo_data.set_completed_many(todo_ids, not args.reopen)
+    _write_result({"matched": len(todo_ids) - len(missing), "changed": changed,
+                   "missing": missing}, args.format, out)
+    return 1 if missing else 0
+
+
+def cmd_delete(todo_data, args, out):
+    if not args.ids and not _has_filter(args) and not args.all:
+        print("删除全部任务需要加 --all", file=sys.stderr)
+        return 2
+    todo_ids, missing = _targets(todo_data, args)
+    deleted = todo_data.delete_many(todo_ids)
+    _write_result({"deleted": deleted, "missing": missing}, args.format, out)
+    return 1 if missing else 0
+
+
+def cmd_stats(todo_data, args, out):
+    summary = todo_data.get_summary()
+    # 分组只输出数量，与以前的格式保持一致；JSON输出包含完成数
+    if args.format != "json":
+        for key in ("by_category", "by_priority"):
+            summary[key] = {name: counts["total"] for name, counts in summary[key].items()}
+    _write_result(summary, args.format, out)
+    return 0
+
+
+def cmd_import(todo_data, args, out):
+    stats = {}
+    ok = todo_data.import_todos(args.file, progress=stats.update)
+    _write_result(dict(stats, ok=ok), args.format, out)
+    return 0 if ok else 1
+
+
+def cmd_export(todo_data, args, out):
+    ok = todo_data.export_todos(args.file)
+    _write_result({"ok": ok, "file": args.file}, args.format, out)
+    return 0 if ok else 1
+
+
+def cmd_recur(todo_data, args, out):
+    try:
+        rule_id = todo_data.add_recurring(
+            args.content, args.freq,
+            start=args.start,
+            interval=args.interval,
+            weekdays=args.weekdays,
+            until=args.until,
+            priority=args.priority,
+            category=args.category
+        )
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    _write_result({"id": rule_id}, args.format, out)
+    return 0
+
+
+def cmd_recurring(todo_data, args, out):
+    rules = todo_data.get_recurring()
+    if args.format == "json":
+        _write_result(rules, args.format, out)
+        return 0
+    fields = ("id", "freq", "interval", "start", "until", "priority", "category", "content")
+    out.write("\t".join(fields) + "\n")
+    for rule in rules:
+        out.write("\t".join(_tsv_value(rule.get(field)) for field in fields) + "\n")
+    return 0
+
+
+def cmd_unrecur(todo_data, args, out):
+    deleted = todo_data.delete_recurring(args.id)
+    _write_result({"deleted": deleted}, args.format, out)
+    return 0 if deleted else 1
+
+
+def _weekdays_arg(value):
+    """argparse用的星期参数类型：逗号分隔的0-6（0为星期一）"""
+    try:
+        days = [int(day) for day in value.split(",")]
+    except ValueError:
+        days = None
+    if not days or any(not 0 <= day <= 6 for day in days):
+        raise argparse.ArgumentTypeError(f"星期格式错误: {value}（应为0-6，逗号分隔，0为星期一）")
+    return days
+
+
+def cmd_undo(todo_data, args, out):
+    done = todo_data.redo() if args.command == "redo" else todo_data.undo()
+    _write_result({args.command: done, "skipped": todo_data.replay_skipped,
+                   "can_undo": todo_data.can_undo, "can_redo": todo_data.can_redo},
+                  args.format, out)
+    return 0 if done else 1
+
+
+def cmd_archive(todo_data, args, out):
+    _write_result({"archived": todo_data.archive_completed(args.days)}, args.format, out)
+    return 0
+
+
+def cmd_history(todo_data, args, out):
+    _write_todos(todo_data.get_archived(args.query, args.limit), args.format, out)
+    return 0
+
+
+def cmd_unarchive(todo_data, args, out):
+    _write_result({"restored": todo_data.unarchive(args.ids)}, args.format, out)
+    return 0
+
+
+def _time_arg(value):
+    """argparse用的时间参数类型（HH:MM）"""
+    try:
+        return datetime.strptime(value, "%H:%M").time()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"时间格式错误: {value}（应为HH:MM）")
+
+
+def cmd_remind(todo_data, args, out):
+    def show(todos):
+        _write_todos(todos, args.format, out)
+        out.flush()
+
+    scheduler = ReminderScheduler(todo_data, show, args.lead_days, args.at)
+    if args.once:
+        scheduler.rebuild()
+        show(scheduler.pop_due())
+        return 0
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_serve(todo_data, args, out):
+    from todo_server import serve
+    serve(todo_data, args.host, args.port)
+    return 0
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="todo", description="待办事项命令行工具")
+    parser.add_argument("--data", help="数据文件（默认 data/todos.json，--sqlite时为 data/todos.db）")
+    parser.add_argument("--sqlite", action="store_true", help="使用SQLite后端")
+    parser.add_argument("--format", choices=("tsv", "json"), default="tsv", help="输出格式")
+    parser.add_argument("--metrics", action="store_true", help="结束时把各操作的耗时统计输出到stderr")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    add = commands.add_parser("add", help="添加任务")
+    add.add_argument("content")
+    add.add_argument("--due", type=_date_arg, help="截止日期（YYYY-MM-DD）")
+    add.add_argument("--priority", choices=PRIORITIES.names, default="normal")
+    add.add_argument("--category", default="默认")
+    add.set_defaults(handler=cmd_add)
+
+    for name, handler, help_text in (("list", cmd_list, "列出任务"),
+                                     ("filter", cmd_filter, "按条件筛选任务")):
+        sub = commands.add_parser(name, help=help_text)
+        _add_filter_arguments(sub)
+        sub.add_argument("--limit", type=int)
+        sub.set_defaults(handler=handler)
+
+    search = commands.add_parser("search", help="按内容搜索任务（按相关度排序）")
+    search.add_argument("query")
+    _add_filter_arguments(search)
+    search.add_argument("--limit", type=int)
+    search.set_defaults(handler=cmd_list)
+
+    complete = commands.add_parser("complete", help="批量标记完成（一次保存）")
+    complete.add_argument("ids", nargs="*", help="任务ID；不给时作用于符合筛选条件的任务")
+    complete.add_argument("--reopen", action="store_true", help="改为标记为未完成")
+    complete.add_argument("--all", action="store_true", help="没有ID和筛选条件时修改全部任务")
+    _add_filter_arguments(complete)
+    complete.set_defaults(handler=cmd_complete)
+
+    delete = commands.add_parser("delete", help="批量删除（一次保存）")
+    delete.add_argument("ids", nargs="*", help="任务ID；不给时作用于符合筛选条件的任务")
+    delete.add_argument("--all", action="store_true", help="没有ID和筛选条件时删除全部任务")
+    _add_filter_arguments(delete)
+    delete.set_defaults(handler=cmd_delete)
+
+    stats = commands.add_parser("stats", help="统计信息")
+    stats.set_defaults(handler=cmd_stats)
+
+    import_ = commands.add_parser("import", help="导入JSON / JSON Lines文件")
+    import_.add_argument("file")
+    import_.set_defaults(handler=cmd_import)
+
+    export = commands.add_parser("export", help="导出为JSON / JSON Lines文件（按扩展名）")
+    export.add_argument("file")
+    export.set_defaults(handler=cmd_export)
+
+    undo = commands.add_parser("undo", help="撤销最近一组修改（历史保存在数据文件旁边）")
+    undo.set_defaults(handler=cmd_undo)
+
+    redo = commands.add_parser("redo", help="重做最近一次撤销的修改")
+    redo.set_defaults(handler=cmd_undo)
+
+    recur = commands.add_parser("recur", help="添加重复任务（规则只保存一次，按日期范围查看时生成）")
+    recur.add_argument("content")
+    recur.add_argument("--freq", choices=FREQUENCIES, default="daily", help="重复频率")
+    recur.add_argument("--interval", type=int, default=1, help="每几个周期重复一次")
+    recur.add_argument("--weekdays", type=_weekdays_arg, help="weekly时在星期几重复（如 0,2,4）")
+    recur.add_argument("--start", type=_date_arg, help="开始日期（默认今天）")
+    recur.add_argument("--until", type=_date_arg, help="结束日期")
+    recur.add_argument("--priority", choices=PRIORITIES.names, default="normal")
+    recur.add_argument("--category", default="默认")
+    recur.set_defaults(handler=cmd_recur)
+
+    recurring = commands.add_parser("recurring", help="列出重复任务的规则")
+    recurring.set_defaults(handler=cmd_recurring)
+
+    unrecur = commands.add_parser("unrecur", help="删除重复任务")
+    unrecur.add_argument("id", help="规则ID")
+    unrecur.set_defaults(handler=cmd_unrecur)
+
+    archive = commands.add_parser("archive", help="把完成较久的任务移到归档文件")
+    archive.add_argument("--days", type=int, default=30, help="完成超过几天的任务（默认30）")
+    archive.set_defaults(handler=cmd_archive)
+
+    history = commands.add_parser("history", help="查看归档的任务（最近归档的在前）")
+    history.add_argument("query", nargs="?", default="", help="按内容搜索")
+    history.add_argument("--limit", type=int)
+    history.set_defaults(handler=cmd_history)
+
+    unarchive = commands.add_parser("unarchive", help="把归档的任务移回任务列表")
+    unarchive.add_argument("ids", nargs="+", help="任务ID")
+    unarchive.set_defaults(handler=cmd_unarchive)
+
+    remind = commands.add_parser("remind", help="截止日期提醒：到时间时输出任务")
+    remind.add_argument("--once", action="store_true", help="只输出现在已到提醒时间的任务后退出")
+    remind.add_argument("--lead-days", type=int, default=0, help="提前几天提醒")
+    remind.add_argument("--at", type=_time_arg, default=REMIND_TIME, help="提醒时间（HH:MM，默认09:00）")
+    remind.set_defaults(handler=cmd_remind)
+
+    serve = commands.add_parser("serve", help="启动本地HTTP/JSON接口服务")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.set_defaults(handler=cmd_serve, write_behind=True)
+    return parser
+
+
+def open_data(args):
+    """按参数创建数据管理器（同步加载；长时间运行的子命令使用后台保存）"""
+    if args.sqlite:
+        from todo_sqlite import SqliteTodoData
+        return SqliteTodoData(args.data) if args.data else SqliteTodoData()
+    from todo_data import TodoData
+    write_behind = getattr(args, "write_behind", False)
+    if args.data:
+        return TodoData(args.data, write_behind=write_behind)
+    return TodoData(write_behind=write_behind)
+
+
+def main(argv=None, out=None):
+    """运行命令行，返回退出码"""
+    args = build_parser().parse_args(argv)
+    # 日志写在数据文件旁边
+    default = "data/todos.db" if args.sqlite else "data/todos.json"
+    setup_logging(os.path.join(os.path.dirname(args.data or default), "todo_app.log"))
+    todo_data = open_data(args)
+    try:
+        return args.handler(todo_data, args, out or sys.stdout)
+    finally:
+        todo_data.close()
+        if args.metrics:
+            print(metrics.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,114 +1,1180 @@
+import io
+import heapq
 import json
 import os
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import logging
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from todo_archive import Archive
+from todo_storage import FileLock, Journal, WriteBehind, atomic_write, digest, file_signature
+from todo_history import HISTORY_LIMIT, History
+from todo_index import DateIndex, parse_date
+from todo_search import SearchIndex
+from todo_stats import TaskStats
+from todo_recurrence import RecurrenceRule, RecurrenceStore, split_occurrence_id
+from todo_record import TodoRecord
+from todo_backup import BackupManager
+from todo_io import content_key, iter_json_array, iter_todo_file, validate_todo, write_todo_file
+from todo_metrics import metrics
 
-logging.basicConfig(
-    filename='data/todo_app.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+def _date_str(value):
+    """把date对象或字符串统一成YYYY-MM-DD"""
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+def _clean_fields(fields):
+    """update_todo / update_many的字段：去掉id，日期统一成字符串"""
+    fields = dict(fields)
+    fields.pop("id", None)
+    if "due_date" in fields:
+        fields["due_date"] = _date_str(fields["due_date"])
+    return fields
+
+def _new_id():
+    """生成任务的唯一ID"""
+    return uuid.uuid4().hex
 
 class TodoData:
-    def __init__(self, filename="data/todos.json"):
-        """初始化数据管理器"""
+    def __init__(self, filename="data/todos.json", journal=True, compact_threshold=500,
+                 write_behind=False, save_delay=0.5, lazy=False, archive_after=None,
+                 history_limit=HISTORY_LIMIT):
+        """初始化数据管理器
+
+        journal为True时，每次修改只向日志追加一条记录，
+        日志记录数达到compact_threshold后再合并写入快照文件。
+        write_behind为True时，写盘交给后台线程，修改后save_delay秒内的
+        多次修改会合并成一次保存；退出前需要调用flush()或close()。
+        lazy为True时不在这里加载数据，由调用方注册监听后调用start_loading()
+        在后台线程加载，界面可以先显示出来。
+
+        多个进程可以同时打开同一份数据：读写文件时持有跨进程的文件锁，
+        写盘前先把其他进程追加的日志记录合并进来（按任务合并，不整体覆盖），
+        check_external_changes()用文件状态低成本地发现外部修改。
+
+        archive_after不为None时，加载完成后把完成超过archive_after天的任务
+        移到归档文件（见archive_completed()）。
+        撤销/重做历史保存在数据文件旁边，最多history_limit组，重新启动后仍可撤销。
+        """
         self.filename = filename
-        self.todos = []
-        self._ensure_data_dir()
-        self.load_todos()
+        self._ensure_data_dir()              # 历史、归档等文件都在数据目录中，先创建目录
+        self.todos = {}  # id -> 任务，dict保持插入顺序
+        self._date_index = DateIndex()
+        self._search_index = None            # 全文索引，第一次搜索时才建立（见_searchable）
+        self._stats = TaskStats()            # 增量维护的统计数据
+        self.compact_threshold = compact_threshold
+        self.journal = Journal(f"{filename}.journal") if journal else None
+        self._lock = threading.RLock()       # 保护内存数据
+        self._save_lock = threading.Lock()   # 保证同一时间只有一个线程写盘
+        self._file_lock = FileLock(f"{filename}.lock")  # 保证同一时间只有一个进程读写文件
+        self._instance = _new_id()           # 写入日志的记录带上来源，读取时跳过自己的
+        self._base_digest = None             # 当前内存数据所基于的快照摘要
+        self._disk_state = None              # 上次读写后快照和日志的文件状态
+        self._pending = []                   # 尚未写入日志的记录（已序列化）
+        self._snapshot_required = False
+        self._listeners = []                 # 变更通知回调 callback(event, todo)
+        self._batch_depth = 0                # batch()的嵌套层数
+        self._batch_changed = False
+        self._batch_undo = []                # 批次中各修改的逆操作
+        self._batch_source = None            # 批次由撤销/重做产生时为 "undo" / "redo"
+        self._batch_event = None             # 批次只有一条修改时代替reset的通知 (event, todo)
+        self.history = History(os.path.splitext(filename)[0] + ".history.jsonl", history_limit)
+        self.replay_skipped = 0              # 最近一次undo()/redo()因涉及已归档任务跳过的组数
+        self.backups = BackupManager(os.path.join(os.path.dirname(filename), "backups"))
+        self.archive = Archive(os.path.splitext(filename)[0] + ".archive.jsonl")
+        self.archive_after = archive_after
+        self.recurring = RecurrenceStore(os.path.splitext(filename)[0] + ".recurring.json")
+        self._loaded = threading.Event()
+        if not lazy:
+            self.load_todos()
+            self._loaded.set()
+        self._saver = WriteBehind(self._write_pending, save_delay) if write_behind else None
+        if not lazy and archive_after is not None:
+            self.archive_completed()
     
     def _ensure_data_dir(self):
         """确保数据目录存在"""
-        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        directory = os.path.dirname(self.filename)
+        if directory:  # 只给出文件名时数据在当前目录
+            os.makedirs(directory, exist_ok=True)
+    
+    @property
+    def loaded(self):
+        """数据是否已经加载完成"""
+        return self._loaded.is_set()
+    
+    def wait_loaded(self, timeout=None):
+        """等待后台加载完成，返回是否已加载"""
+        return self._loaded.wait(timeout)
+    
+    def start_loading(self, batch_size=5000):
+        """在后台线程加载数据
+
+        先插入并通知最前面的一小批任务（loading事件），界面可以立即显示第一屏，
+        之后每batch_size条通知一次进度，全部完成后发出reset事件。
+        加载完成之前的修改会等待加载结束。
+        """
+        thread = threading.Thread(target=self._load_in_background, args=(batch_size,),
+                                  name="todo-load", daemon=True)
+        thread.start()
+        return thread
+    
+    def _load_in_background(self, batch_size):
+        try:
+            self.load_todos(batch_size)
+        finally:
+            self._loaded.set()
+        logging.info(f"后台加载完成: {len(self.todos)} 项")
+        if self.archive_after is not None:
+            self.archive_completed(notify=False)
+        self._notify("reset")
+    
+    @metrics.timed("data.load_todos")
+    def load_todos(self, batch_size=None):
+        """从文件加载待办事项（快照 + 日志回放）
+
+        batch_size不为None时逐条解析快照，分批插入并发出loading通知。
+        """
+        with self._file_lock:
+            migrated = self._read_disk(batch_size)
+        if migrated:
+            self.save_todos()
     
-    def load_todos(self):
-        """从文件加载待办事项"""
+    def _read_disk(self, batch_size=None):
+        """读取快照并回放日志，调用方需持有文件锁；返回是否需要重写快照"""
+        data = b""
+        with self._lock:
+            self._clear()
+        migrated = False
         try:
             if os.path.exists(self.filename):
-                with open(self.filename, 'r', encoding='utf-8') as f:
-                    self.todos = json.load(f)
+                with open(self.filename, 'rb') as f:
+                    data = f.read()
+                migrated = self._load_snapshot(data, batch_size)
         except Exception as e:
-            print(f"加载数据时出错: {e}")
-            self.todos = []
+            print(f"加载数据时出错: {e}", file=sys.stderr)
+            with self._lock:
+                self._clear()
+        
+        if self.journal is not None:
+            try:
+                records = self.journal.replay(digest(data))
+                if records is None:
+                    self.journal.reset(digest(data))
+                else:
+                    with self._lock:
+                        for record in records:
+                            self._apply(record)
+                    if self.journal.damaged or self.journal.count >= self.compact_threshold:
+                        migrated = True
+            except Exception as e:
+                print(f"回放日志时出错: {e}", file=sys.stderr)
+        self._base_digest = digest(data)
+        self._disk_state = self._file_state()
+        return migrated
+    
+    def _file_state(self):
+        return (file_signature(self.filename),
+                file_signature(self.journal.path) if self.journal is not None else None)
+    
+    @metrics.timed("data.check_external_changes")
+    def check_external_changes(self):
+        """检查其他进程是否修改过数据文件（只看文件状态），有则合并进来
+
+        返回是否合并了外部修改。界面可以定时调用，没有变化时只需要两次stat。
+        """
+        if not self.loaded:
+            return False
+        self.history.refresh()
+        rules_changed = self.recurring.changed()
+        if rules_changed:
+            self.recurring.reload()
+            self._notify("reset")
+        if self._file_state() == self._disk_state:
+            return rules_changed
+        with self._save_lock, self._file_lock:
+            events = self._sync_from_disk()
+        self._notify_all(events)
+        return bool(events) or rules_changed
+    
+    def _notify_all(self, events):
+        for event, todo in events:
+            self._notify(event, todo)
+    
+    def _sync_from_disk(self):
+        """合并其他进程写入的修改，调用方需持有_save_lock和文件锁
+
+        快照没变时只读取日志中新追加的记录并逐条应用；快照被其他进程重写过
+        （日志压缩）时重新加载，再把本进程还没写盘的修改重新应用上去。
+        返回需要发出的通知，由调用方在释放锁之后发出。
+        """
+        state = self._file_state()
+        if state == self._disk_state:
+            return []
+        events = None
+        if self.journal is not None and self._disk_state is not None and state[0] == self._disk_state[0]:
+            try:
+                records = self.journal.read_new()
+            except ValueError:
+                records = None
+            if records is not None:
+                events = []
+                with self._lock:
+                    for record in records:
+                        if record.get("src") != self._instance:
+                            events.extend(self._apply_external(record))
+        if events is None:
+            with self._lock:
+                if self._snapshot_required:
+                    # 本进程的修改是整体替换（导入、恢复备份），以本进程为准
+                    logging.warning("数据文件已被其他进程修改，将被本进程的快照覆盖")
+                    self._disk_state = state
+                    return []
+                pending = [json.loads(line) for line in self._pending]
+                self._read_disk()
+                for record in pending:
+                    self._apply(record)
+            events = [("reset", None)]
+        self._disk_state = self._file_state()
+        metrics.count("data.external_merges")
+        logging.info(f"合并外部修改: {len(events)} 项")
+        return events
+    
+    def _apply_external(self, record):
+        """应用其他进程的一条记录，返回需要发出的通知 [(event, todo)]"""
+        op = record["op"]
+        if op == "add":
+            if record["todo"].get("id") in self.todos:
+                return []
+            self._apply(record)
+            return [("add", self.todos[record["todo"]["id"]])]
+        if op == "delete":
+            todo = self._remove(record["id"])
+            return [("delete", todo)] if todo is not None else []
+        if op in ("toggle", "update"):
+            self._apply(record)
+            todo = self.todos.get(record["id"])
+            return [("update", todo)] if todo is not None else []
+        self._apply(record)
+        return [("reset", None)]
+    
+    def _load_snapshot(self, data, batch_size):
+        """解析快照并插入任务，返回是否需要重写快照（旧数据缺少ID）"""
+        if batch_size is None:
+            todos = json.loads(data.decode('utf-8'))
+            limit = None
+        else:
+            # 边解码边解析，不必先把整个文件解码成字符串
+            todos = iter_json_array(io.TextIOWrapper(io.BytesIO(data), encoding='utf-8'))
+            limit = min(200, batch_size)  # 第一批只够填满一屏，尽快显示
+        migrated = False
+        batch = []
+        for todo in todos:
+            # 旧版本的数据没有ID，加载时补上
+            if not todo.get("id"):
+                migrated = True
+            batch.append(TodoRecord.from_dict(todo))
+            if limit is not None and len(batch) >= limit:
+                migrated = self._insert_loaded(batch) or migrated
+                batch = []
+                limit = batch_size
+                self._notify("loading")
+        return self._insert_loaded(batch) or migrated
+    
+    def _insert_loaded(self, records):
+        """把一批加载的记录插入内存数据，返回是否有ID冲突"""
+        conflict = False
+        with self._lock:
+            for todo in records:
+                if todo.id in self.todos:
+                    conflict = True
+                self._insert(todo)
+        return conflict
     
+    @metrics.timed("data.save_todos")
     def save_todos(self):
-        """保存待办事项到文件"""
+        """保存待办事项到文件（原子写入），日志模式下同时清空日志"""
+        try:
+            with self._save_lock, self._file_lock:
+                events = self._sync_from_disk()
+                self._write_snapshot()
+            self.recurring.flush()
+            self.history.flush()
+            self._notify_all(events)
+        except Exception as e:
+            print(f"保存数据时出错: {e}", file=sys.stderr)
+    
+    def _write_snapshot(self):
+        """序列化全部任务并原子替换快照，调用方需持有_save_lock和文件锁
+
+        持有数据锁时只复制各记录的字段，编码和写盘都在锁外进行，
+        其他线程的修改不必等整个快照序列化完；复制之后的修改留在积压记录里，
+        写在新快照之后的日志中。
+        """
+        with self._lock:
+            states = [todo.snapshot() for todo in self.todos.values()]
+            self._pending = []
+            self._snapshot_required = False
+        try:
+            data = json.dumps([TodoRecord.snapshot_to_dict(state) for state in states],
+                              ensure_ascii=False, indent=2).encode('utf-8')
+            atomic_write(self.filename, data)
+            metrics.record("data.snapshot_bytes", len(data))
+            if self.journal is not None:
+                self.journal.reset(digest(data))
+        except Exception:
+            # 积压记录已经清空，下次保存必须重写完整快照
+            self._snapshot_required = True
+            raise
+        self._base_digest = digest(data)
+        self._disk_state = self._file_state()
+    
+    @metrics.timed("data.write")
+    def _write_pending(self):
+        """把积压的修改写盘：日志模式追加记录，必要时合并成快照
+
+        写之前先合并其他进程的修改，整个过程持有文件锁。
+        """
+        events = []
         try:
-            with open(self.filename, 'w', encoding='utf-8') as f:
-                json.dump(self.todos, f, ensure_ascii=False, indent=2)
+            with self._save_lock, self._file_lock:
+                events = self._sync_from_disk()
+                self._write_lines()
+            self.recurring.flush()
+            self.history.flush()
+        finally:
+            self._notify_all(events)
+    
+    def _write_lines(self):
+        """写出积压的记录，调用方需持有_save_lock和文件锁"""
+        with self._lock:
+            lines, self._pending = self._pending, []
+        if self._snapshot_required:
+            self._write_snapshot()
+            return
+        if not lines:
+            return
+        if self.journal is None or self.journal.count + len(lines) >= self.compact_threshold:
+            self._write_snapshot()
+            return
+        try:
+            metrics.record("data.journal_bytes", self.journal.append(lines))
+            self._disk_state = self._file_state()
+        except Exception as e:
+            print(f"写入日志时出错: {e}", file=sys.stderr)
+            self._write_snapshot()
+    
+    def compact(self):
+        """把日志合并进快照"""
+        self.flush()
+        if self.journal is not None and self.journal.count:
+            self.save_todos()
+    
+    def flush(self):
+        """立即保存所有未保存的修改"""
+        if self._saver is not None:
+            self._saver.flush()
+        else:
+            self._request_save()
+    
+    def close(self):
+        """保存剩余修改并停止后台保存线程"""
+        if self._saver is not None:
+            self._saver.close()
+            self._saver = None
+        else:
+            self._request_save()
+        self.recurring.flush()
+        self.history.flush()
+    
+    @property
+    def save_state(self):
+        """保存状态：pending / saving / saved / error"""
+        if self._saver is not None:
+            return self._saver.state
+        return "pending" if self._pending else "saved"
+    
+    def _apply(self, record):
+        """把一条变更记录应用到内存数据"""
+        op = record["op"]
+        if op == "add":
+            self._insert(TodoRecord.from_dict(record["todo"]))
+        elif op == "delete":
+            self._remove(record["id"])
+        elif op == "toggle":
+            todo = self.todos.get(record["id"])
+            if todo is not None:
+                self._stats.remove(todo)
+                todo.completed = not todo.completed
+                self._stats.add(todo)
+        elif op == "update":
+            todo = self.todos.get(record["id"])
+            if todo is not None:
+                self._update_fields(todo, record["fields"])
+        elif op == "extend":
+            for todo in record["todos"]:
+                self._insert(TodoRecord.from_dict(todo))
+    
+    def _clear(self):
+        """清空内存数据和所有索引"""
+        self.todos = {}
+        self._date_index.clear()
+        if self._search_index is not None:
+            self._search_index.clear()
+        self._stats.clear()
+    
+    def _insert(self, todo):
+        """把任务记录放入ID映射，缺少ID或ID冲突时重新分配"""
+        if not todo.id or todo.id in self.todos:
+            todo.id = _new_id()
+        self.todos[todo.id] = todo
+        self._index_due(todo)
+        if self._search_index is not None:
+            self._search_index.add(todo.id, todo.content)
+        self._stats.add(todo)
+    
+    def _remove(self, todo_id):
+        """从ID映射和日期索引中移除任务"""
+        todo = self.todos.pop(todo_id, None)
+        if todo is not None:
+            if todo.due is not None:
+                self._date_index.remove(todo.due_day, todo_id)
+            if self._search_index is not None:
+                self._search_index.remove(todo_id)
+            self._stats.remove(todo)
+        return todo
+    
+    def _update_fields(self, todo, fields):
+        """修改任务字段，截止日期变化时同步更新索引"""
+        old_due = todo.due_day
+        old = {key: todo.get(key) for key in fields}
+        self._stats.remove(todo)
+        try:
+            todo.update(fields)
+        except Exception:
+            # 取值无法编码时恢复原值，统计和索引保持与记录一致
+            todo.update(old)
+            raise
+        finally:
+            self._stats.add(todo)
+        if "due_date" in fields:
+            if old_due is not None:
+                self._date_index.remove(old_due, todo.id)
+            self._index_due(todo)
+        if "content" in fields and self._search_index is not None:
+            self._search_index.update(todo.id, todo.content)
+    
+    def _index_due(self, todo):
+        """把截止日期加入日期索引（记录里已是解析好的日期）"""
+        if todo.due is not None:
+            self._date_index.add(todo.due_day, todo.id)
+    
+    def add_listener(self, callback):
+        """注册变更通知
+
+        callback(event, todo)，event为 add / delete / update / reset / loading，
+        reset表示数据被整体替换（如导入、后台加载完成），todo为None，需要全量刷新；
+        loading表示后台加载又插入了一批任务。reset和loading可能来自后台线程。
+        """
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """取消变更通知"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def _notify(self, event, todo=None):
+        """通知所有监听者（批次中的单条通知由批次结束时的reset代替）"""
+        if self._batch_depth:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(event, todo)
+            except Exception as e:
+                logging.error(f"变更通知处理出错: {e}")
+    
+    def _persist(self, record):
+        """登记一次变更：记录立即序列化，需与内存修改在同一次加锁内完成"""
+        record["src"] = self._instance
+        with self._lock:
+            self._pending.append(json.dumps(record, ensure_ascii=False))
+    
+    def _request_save(self):
+        """安排写盘：交给后台线程，或者当场完成；批次中推迟到批次结束"""
+        if self._batch_depth:
+            self._batch_changed = True
+            return
+        if self._saver is not None:
+            self._saver.mark_dirty()
+            return
+        try:
+            self._write_pending()
         except Exception as e:
-            print(f"保存数据时出错: {e}")
+            print(f"保存数据时出错: {e}", file=sys.stderr)
+    
+    @contextmanager
+    def batch(self):
+        """把多次修改合并成一个批次
+
+        批次期间持有锁，其他线程看不到中间状态；所有修改在结束时一起写盘
+        （日志模式下是一次追加），并只发出一次reset通知（只有一条修改并且登记了
+        _batch_event时发出对应的单条通知），undo()把整个批次一起撤销。
+        批次中途出错时，已经完成的修改仍会保存。
+        """
+        self._loaded.wait()
+        event = ("reset", None)
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                changed = not self._batch_depth and self._batch_changed
+                if changed:
+                    self._batch_changed = False
+                if not self._batch_depth:
+                    if self._batch_event is not None and len(self._batch_undo) == 1:
+                        event = self._batch_event
+                    # 整个批次作为一组撤销
+                    self._set_undo(self._batch_undo, self._batch_source)
+                    self._batch_undo = []
+                    self._batch_source = None
+                    self._batch_event = None
+        if changed:
+            self._request_save()
+            self._notify(*event)
     
+    @metrics.timed("data.add_todo")
     def add_todo(self, content, due_date=None, priority="normal", category="默认"):
         """添加新待办事项"""
+        self._loaded.wait()
         try:
-            todo = {
-                "content": content,
-                "completed": False,
-                "create_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "due_date": due_date,  # 新增截止日期字段
-                "priority": priority,
-                "category": category  # 新增分类字段
-            }
-            self.todos.append(todo)
-            self.save_todos()
+            todo = TodoRecord(
+                id=_new_id(),
+                content=content,
+                completed=False,
+                create_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                due_date=_date_str(due_date),  # 新增截止日期字段
+                priority=priority,
+                category=category  # 新增分类字段
+            )
+            self._commit_add(todo)
+            self._request_save()
+            self._notify("add", todo)
             logging.info(f"添加新待办事项: {content}")
+            return todo.id
         except Exception as e:
             logging.error(f"添加待办事项时出错: {e}")
             raise
     
-    def delete_todo(self, index):
-        """删除指定待办事项"""
-        if 0 <= index < len(self.todos):
-            self.todos.pop(index)
-            self.save_todos()
+    @metrics.timed("data.delete_todo")
+    def delete_todo(self, todo_id):
+        """删除指定ID的待办事项"""
+        self._loaded.wait()
+        todo = self._commit_delete(todo_id)
+        if todo is None:
+            return
+        self._request_save()
+        self._notify("delete", todo)
     
-    def toggle_complete(self, index):
-        """切换完成状态"""
-        if 0 <= index < len(self.todos):
-            self.todos[index]["completed"] = not self.todos[index]["completed"]
-            self.save_todos()
+    @metrics.timed("data.toggle_complete")
+    def toggle_complete(self, todo_id):
+        """切换指定ID任务的完成状态"""
+        self._loaded.wait()
+        with self._lock:
+            todo = self.get_todo(todo_id)
+            if todo is None:
+                return
+            # 记录切换后的结果而不是"切换"动作，多个进程同时修改时合并结果确定
+            todo = self._commit_update(todo_id, {"completed": not todo["completed"]})
+        if todo is None:
+            return
+        self._request_save()
+        self._notify("update", todo)
+    
+    @metrics.timed("data.update_todo")
+    def update_todo(self, todo_id, **fields):
+        """修改指定ID任务的字段"""
+        self._loaded.wait()
+        todo = self._commit_update(todo_id, _clean_fields(fields))
+        if todo is None:
+            return False
+        self._request_save()
+        self._notify("update", todo)
+        return True
+    
+    # ---- 批量操作：一个批次，一次写盘，一次界面刷新，整体撤销 ----
+    
+    @metrics.timed("data.delete_many")
+    def delete_many(self, todo_ids):
+        """删除多个任务，返回删除的数量"""
+        with self.batch():
+            deleted = sum(1 for todo_id in todo_ids if self._commit_delete(todo_id) is not None)
+            if deleted:
+                self._request_save()
+        return deleted
+    
+    @metrics.timed("data.set_completed_many")
+    def set_completed_many(self, todo_ids, completed=True):
+        """把多个任务标记为完成或未完成，返回状态发生变化的数量"""
+        with self.batch():
+            changed = 0
+            for todo_id in todo_ids:
+                todo = self.get_todo(todo_id)
+                if todo is not None and todo["completed"] != completed:
+                    self._commit_update(todo_id, {"completed": completed})
+                    changed += 1
+            if changed:
+                self._request_save()
+        return changed
+    
+    @metrics.timed("data.update_many")
+    def update_many(self, todo_ids, **fields):
+        """把多个任务的字段改成相同的值，返回修改的数量"""
+        fields = _clean_fields(fields)
+        with self.batch():
+            updated = sum(1 for todo_id in todo_ids
+                          if self._commit_update(todo_id, dict(fields)) is not None)
+            if updated:
+                self._request_save()
+        return updated
+    
+    # ---- 撤销/重做 ----
+    
+    @property
+    def can_undo(self):
+        """是否有可以撤销的修改"""
+        return self.history.can_undo
+    
+    @property
+    def can_redo(self):
+        """是否有可以重做的修改"""
+        return self.history.can_redo
+    
+    def undo(self):
+        """撤销最近一组修改（批量操作、导入整体撤销），返回是否撤销了修改"""
+        return self._replay("undo")
+    
+    def redo(self):
+        """重做最近一次撤销的修改，返回是否重做了修改"""
+        return self._replay("redo")
+    
+    def _replay(self, source):
+        """取出撤销栈或重做栈的一组逆操作并执行，执行时产生的逆操作进入另一个栈
+
+        涉及已归档任务的组无法执行（重新加入会与归档重复，修改会落空），
+        跳过并计入replay_skipped，继续取下一组。
+        """
+        self._loaded.wait()
+        with self.batch():
+            self.replay_skipped = 0
+            while True:
+                ops = self.history.pop(source)
+                if not ops:
+                    if self.replay_skipped:
+                        self._request_save()
+                    return False
+                if not self._touches_archive(ops):
+                    break
+                self.replay_skipped += 1
+            self.apply_changes(ops, source)
+        return True
+
+    def _touches_archive(self, ops):
+        """一组变更记录是否涉及已归档的任务，只有涉及的任务不在内存中时才读取归档"""
+        ids = {op["todo"]["id"] if op["op"] == "add" else op["id"]
+               for op in ops if op["op"] in ("add", "delete", "update")}
+        missing = {todo_id for todo_id in ids - self.todos.keys()
+                   if not split_occurrence_id(todo_id)}
+        return bool(missing) and any(todo.get("id") in missing for todo in self.archive.load())
+    
+    def apply_changes(self, ops, source=None):
+        """在一个批次中执行一组变更记录，跳过已不存在的任务
+
+        除了任务的add / delete / update，还有重复任务的add_rule / delete_rule
+        和单次重复的occurrence（完成/删除状态）。
+        source为 "undo" / "redo" 时，产生的逆操作进入重做栈 / 撤销栈。
+        """
+        with self.batch():
+            if source is not None:
+                self._batch_source = source
+            todo = None
+            for op in ops:
+                if op["op"] == "add":
+                    if op["todo"]["id"] not in self.todos:
+                        todo = self._commit_add(TodoRecord.from_dict(op["todo"]))
+                elif op["op"] == "delete":
+                    todo = self._commit_delete(op["id"])
+                elif op["op"] == "update":
+                    todo = self._commit_update(op["id"], dict(op["fields"]))
+                elif op["op"] == "occurrence":
+                    self._commit_occurrence(op["id"], completed=op.get("completed"),
+                                            skipped=op.get("skipped"))
+                elif op["op"] == "add_rule":
+                    if self.recurring.get(op["rule"]["id"]) is None:
+                        self._commit_rule_add(RecurrenceRule.from_dict(op["rule"]))
+                elif op["op"] == "delete_rule":
+                    self._commit_rule_delete(op["id"])
+            if len(ops) == 1 and todo is not None:
+                # 撤销单条修改时只通知这一个任务，不必整体刷新
+                self._batch_event = (ops[0]["op"], todo)
+            self._request_save()
+    
+    def _commit_add(self, todo):
+        """插入任务、写入日志并记录逆操作"""
+        with self._lock:
+            self._insert(todo)
+            self._persist({"op": "add", "todo": todo.to_dict()})
+            self._record_undo({"op": "delete", "id": todo.id})
+        return todo
+    
+    def _commit_delete(self, todo_id):
+        """删除任务、写入日志并记录逆操作，任务不存在时返回None"""
+        if split_occurrence_id(todo_id):
+            if self.recurring.get_occurrence(todo_id) is None:
+                return None
+            return self._commit_occurrence(todo_id, skipped=True)
+        with self._lock:
+            todo = self._remove(todo_id)
+            if todo is None:
+                return None
+            self._persist({"op": "delete", "id": todo_id})
+            self._record_undo({"op": "add", "todo": todo.to_dict()})
+        return todo
+    
+    def _commit_update(self, todo_id, fields):
+        """修改任务字段、写入日志并记录逆操作，任务不存在时返回None"""
+        if split_occurrence_id(todo_id):
+            if set(fields) != {"completed"}:
+                print("重复任务的单次重复只能修改完成状态", file=sys.stderr)
+                return None
+            return self._commit_occurrence(todo_id, completed=bool(fields["completed"]))
+        with self._lock:
+            todo = self.todos.get(todo_id)
+            if todo is None:
+                return None
+            if "completed" in fields and bool(fields["completed"]) != todo.completed:
+                # 记录完成时间，归档按完成了多久来判断
+                fields["completed_time"] = (datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                                            if fields["completed"] else None)
+            old = {key: todo.get(key) for key in fields}
+            self._update_fields(todo, fields)
+            self._persist({"op": "update", "id": todo_id, "fields": fields})
+            self._record_undo({"op": "update", "id": todo_id, "fields": old})
+        return todo
+    
+    def _commit_occurrence(self, todo_id, completed=None, skipped=None):
+        """修改单次重复的完成/删除状态并记录逆操作
+
+        返回修改后的单次重复（删除时为删除前的），不存在时返回None。
+        """
+        before = self.recurring.get_occurrence(todo_id)
+        old = self.recurring.set_exception(todo_id, completed=completed, skipped=skipped)
+        if old is None:
+            return None
+        with self._lock:
+            self._record_undo(dict({"op": "occurrence", "id": todo_id}, **old))
+        return self.recurring.get_occurrence(todo_id) or before
+    
+    def _commit_rule_add(self, rule):
+        """保存重复规则并记录逆操作"""
+        self.recurring.add(rule)
+        with self._lock:
+            self._record_undo({"op": "delete_rule", "id": rule.id})
+        return rule
+    
+    def _commit_rule_delete(self, rule_id):
+        """删除重复规则并记录逆操作，规则不存在时返回None"""
+        rule = self.recurring.remove(rule_id)
+        if rule is not None:
+            with self._lock:
+                self._record_undo({"op": "add_rule", "rule": rule.to_dict()})
+        return rule
+    
+    def _record_undo(self, op):
+        """记录一次修改的逆操作，调用方需持有锁；批次中的逆操作在批次结束时合成一组"""
+        if self._batch_depth:
+            self._batch_undo.append(op)
+        else:
+            self._set_undo([op])
+    
+    def _set_undo(self, ops, source=None):
+        """把一组逆操作记入历史，按与修改相反的顺序执行"""
+        self.history.record(ops[::-1], source)
+    
+    def get_todo(self, todo_id):
+        """按ID获取待办事项（包括 "规则ID@日期" 形式的单次重复）"""
+        todo = self.todos.get(todo_id)
+        if todo is None and split_occurrence_id(todo_id):
+            return self.recurring.get_occurrence(todo_id)
+        return todo
     
     def get_todos(self):
         """获取所有待办事项"""
-        return self.todos
+        with self._lock:
+            return list(self.todos.values())
+    
+    def get_due_date(self, todo_id):
+        """获取任务解析好的截止日期(date)，没有或无效时返回None"""
+        todo = self.todos.get(todo_id)
+        if todo is None and split_occurrence_id(todo_id):
+            todo = self.recurring.get_occurrence(todo_id)
+            return parse_date(todo["due_date"]) if todo is not None else None
+        return todo.due_day if todo is not None else None
+    
+    def get_todos_by_date(self, due_date):
+        """获取某一天截止的待办事项"""
+        day = parse_date(due_date)
+        with self._lock:
+            todos = [self.todos[todo_id] for todo_id in self._date_index.get(day)]
+        return todos + self.get_occurrences(day, day) if day is not None else todos
     
+    def get_todos_in_range(self, start, end):
+        """获取截止日期在[start, end]之间的待办事项，按日期排序"""
+        return [todo for _, todo in self.iter_dated_todos(start, end)]
+    
+    def iter_dated_todos(self, start=None, end=None):
+        """按日期顺序遍历有截止日期的任务，返回 (date, 任务)
+
+        start和end都给出时，范围内的重复任务也按需生成并按日期合并进来。
+        """
+        with self._lock:
+            items = [(day, self.todos[todo_id])
+                     for day, ids in self._date_index.range(parse_date(start), parse_date(end))
+                     for todo_id in ids]
+        if start is None or end is None:
+            return iter(items)
+        return heapq.merge(items, self.recurring.occurrences(start, end), key=lambda item: item[0])
+    
+    @metrics.timed("data.search")
+    def search(self, query="", category=None, priority=None, start=None, end=None,
+               completed=None, limit=None):
+        """搜索并筛选待办事项
+
+        关键词走倒排索引并按相关度排序；start/end按截止日期范围筛选（走日期索引），
+        category、priority、completed为None时不筛选。
+        start和end都给出时，范围内的重复任务排在普通任务之后。
+        """
+        with self._lock:
+            results = self._search(query, category, priority, start, end, completed, limit)
+        if start is not None and end is not None and (limit is None or len(results) < limit):
+            occurrences = self.get_occurrences(start, end, query, category, priority, completed)
+            results += occurrences[:None if limit is None else limit - len(results)]
+        return results
+    
+    def _search(self, query, category, priority, start, end, completed, limit):
+        candidates = None
+        if start is not None or end is not None:
+            candidates = {}
+            for _, ids in self._date_index.range(parse_date(start), parse_date(end)):
+                candidates.update(dict.fromkeys(ids))
+        
+        if query.strip():
+            ids = self._searchable().search(query, candidates)
+        else:
+            ids = self.todos if candidates is None else candidates
+        
+        results = []
+        for todo_id in ids:
+            todo = self.todos[todo_id]
+            if category is not None and todo.category != category:
+                continue
+            if priority is not None and todo.priority != priority:
+                continue
+            if completed is not None and todo.completed != completed:
+                continue
+            results.append(todo)
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+    
+    def matches_query(self, todo_id, query):
+        """任务内容是否匹配搜索关键词"""
+        if todo_id not in self.todos and split_occurrence_id(todo_id):
+            return self.recurring.matches_query(todo_id, query)
+        with self._lock:
+            return self._searchable().matches(todo_id, query)
+    
+    def _searchable(self):
+        """全文索引，第一次搜索时才建立，调用方需持有锁
+
+        只执行一条命令的命令行进程用不到搜索，不必在加载时为全部任务建索引；
+        建立之后随增删改增量维护。
+        """
+        if self._search_index is None:
+            index = SearchIndex()
+            for todo in self.todos.values():
+                index.add(todo.id, todo.content)
+            self._search_index = index
+        return self._search_index
+    
+    def get_todos_by_category(self, category):
+        """获取指定分类的待办事项"""
+        with self._lock:
+            return [todo for todo in self.todos.values() if todo.category == category]
+    
+    def get_status_counts(self, category=None):
+        """获取未完成和已完成的数量"""
+        with self._lock:
+            if category is None:
+                total, completed = self._stats.total, self._stats.completed
+            else:
+                total, completed = self._stats.by_category.get(category, (0, 0))
+        return total - completed, completed
+    
+    @metrics.timed("data.get_stats")
     def get_stats(self):
-        """获取统计信息"""
-        total = len(self.todos)
-        completed = sum(1 for todo in self.todos if todo["completed"])
-        return total, completed
-    
-    def backup_data(self):
-        """备份数据"""
-        backup_file = f"data/todos_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        """获取统计信息 (总数, 已完成数)，读取增量维护的计数"""
+        with self._lock:
+            return self._stats.total, self._stats.completed
+    
+    def get_summary(self, today=None):
+        """完整的统计数据：总数、完成数、逾期/今天/本周到期数，以及按分类和优先级的数量
+
+        archived系列字段来自归档的摘要文件，不读取归档内容。
+        """
+        with self._lock:
+            summary = self._stats.summary(today)
+        archived = self.archive.summary
+        summary["archived"] = archived["total"]
+        summary["archived_by_category"] = dict(archived["by_category"])
+        summary["archived_by_priority"] = dict(archived["by_priority"])
+        summary["recurring"] = len(self.recurring.rules)
+        return summary
+    
+    def check_stats_consistency(self):
+        """从头重新统计并与增量维护的结果比较，返回不一致的项（一致时为空列表）"""
+        with self._lock:
+            expected = TaskStats.build(self.todos.values()).summary()
+            actual = self._stats.summary()
+        return [(key, actual[key], expected[key]) for key in expected if actual[key] != expected[key]]
+    
+    # ---- 重复任务 ----
+    
+    def add_recurring(self, content, freq, start=None, interval=1, weekdays=None, until=None,
+                      priority="normal", category="默认"):
+        """添加重复任务，返回规则ID
+
+        freq为 daily / weekly / monthly / yearly，start默认为今天；规则无效时抛出ValueError。
+        规则只保存一次，各次重复在查看某个日期范围时才生成。
+        """
+        self._loaded.wait()
+        rule = RecurrenceRule(None, content, freq, start or date.today(), interval, weekdays, until,
+                              priority, category)
+        self._commit_rule_add(rule)
+        self._request_save()
+        self._notify("reset")
+        logging.info(f"添加重复任务: {content} ({freq})")
+        return rule.id
+    
+    def delete_recurring(self, rule_id):
+        """删除重复任务（包括已完成和已删除的记录），返回是否删除"""
+        self._loaded.wait()
+        if self._commit_rule_delete(rule_id) is None:
+            return False
+        self._request_save()
+        self._notify("reset")
+        return True
+    
+    def get_recurring(self):
+        """全部重复规则"""
+        return [rule.to_dict() for rule in list(self.recurring.rules.values())]
+    
+    @metrics.timed("data.get_occurrences")
+    def get_occurrences(self, start, end, query="", category=None, priority=None, completed=None):
+        """生成[start, end]内符合条件的各次重复，按日期排序"""
+        return [todo for _, todo in self.recurring.occurrences(start, end, query, category,
+                                                                  priority, completed)]
+    
+    # ---- 归档 ----
+    
+    @metrics.timed("data.archive_completed")
+    def archive_completed(self, days=None, now=None, notify=True):
+        """把完成超过days天（默认archive_after）的任务移到归档文件，返回移动的数量
+
+        没有完成时间的旧数据按创建时间计算。先追加归档再重写快照；
+        两步之间中断时任务会同时出现在两边，读取归档时以当前数据为准。
+        """
+        days = self.archive_after if days is None else days
+        if days is None:
+            return 0
+        cutoff = ((now or datetime.now()) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        self._loaded.wait()
         try:
-            with open(self.filename, 'r', encoding='utf-8') as source:
-                with open(backup_file, 'w', encoding='utf-8') as target:
-                    target.write(source.read())
-            return True
+            with self._save_lock, self._file_lock:
+                events = self._sync_from_disk()
+                with self._lock:
+                    # 完成时间正好在截止时间上的也归档；没有任何时间的无法判断，不归档
+                    old = [todo for todo in self.todos.values() if todo.completed
+                           and (todo.get("completed_time") or todo.create_time
+                                or "9999-12-31 23:59:59") <= cutoff]
+                    if old:
+                        self.archive.append([todo.to_dict() for todo in old])
+                        for todo in old:
+                            self._remove(todo.id)
+                if old:
+                    # 整体重写一次快照，不把成批的删除写进日志
+                    self._write_snapshot()
+        except Exception as e:
+            print(f"归档任务时出错: {e}", file=sys.stderr)
+            return 0
+        self._notify_all(events)
+        if old:
+            logging.info(f"归档 {len(old)} 项已完成的任务")
+            if notify:
+                self._notify("reset")
+        return len(old)
+    
+    def archived_count(self):
+        """归档的任务数（只读摘要文件，没有变化时只需一次stat）"""
+        return self.archive.summary["total"]
+    
+    @metrics.timed("data.get_archived")
+    def get_archived(self, query="", limit=None):
+        """读取归档中的任务（第一次调用时才读取归档文件），最近归档的排在前面"""
+        todos = self.archive.search(query)
+        with self._lock:
+            todos = [todo for todo in todos if todo.get("id") not in self.todos]
+        return todos[:limit] if limit is not None else todos
+    
+    def unarchive(self, todo_ids):
+        """把归档中的任务移回当前任务列表，返回移回的数量"""
+        self._loaded.wait()
+        todo_ids = set(todo_ids)
+        with self._file_lock:
+            todos = [todo for todo in self.archive.load() if todo.get("id") in todo_ids]
+        if not todos:
+            return 0
+        with self._lock:
+            for data in todos:
+                if data.get("id") in self.todos:
+                    continue
+                todo = TodoRecord.from_dict(data)
+                self._insert(todo)
+                self._persist({"op": "add", "todo": todo.to_dict()})
+        # 先写入当前数据再从归档删除，中途中断时任务不会丢失
+        self.flush()
+        with self._file_lock:
+            self.archive.remove(todo_ids)
+        self._notify("reset")
+        logging.info(f"从归档恢复 {len(todos)} 项")
+        return len(todos)
+    
+    def backup_data(self, wait=False):
+        """在后台线程创建压缩的增量备份，wait为True时等待完成"""
+        thread = threading.Thread(target=self._run_backup, name="todo-backup")
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+    
+    def _run_backup(self):
+        self._loaded.wait()  # 在备份线程里等待加载完成，不阻塞调用方
+        try:
+            with self._lock:
+                todos = [todo.to_dict() for todo in self.todos.values()]
+            point_id = self.backups.create(todos)
+            if point_id:
+                logging.info(f"创建备份: {point_id}")
         except Exception as e:
-            print(f"备份数据时出错: {e}")
+            print(f"备份数据时出错: {e}", file=sys.stderr)
+    
+    def list_backups(self):
+        """列出所有保留的备份点"""
+        return self.backups.list_points()
+    
+    @metrics.timed("data.restore_backup")
+    def restore_backup(self, point_id):
+        """恢复到指定备份点"""
+        self._loaded.wait()
+        try:
+            todos = self.backups.restore(point_id)
+        except Exception as e:
+            print(f"恢复备份时出错: {e}", file=sys.stderr)
             return False
+        with self._lock:
+            self._clear()
+            for todo in todos:
+                self._insert(TodoRecord.from_dict(todo))
+            self._snapshot_required = True
+            self.history.clear()
+        self._request_save()
+        self._notify("reset")
+        logging.info(f"恢复到备份: {point_id}")
+        return True
 
-    def export_todos(self, filename):
-        """导出待办事项"""
+    @metrics.timed("data.export_todos")
+    def export_todos(self, filename, progress=None):
+        """导出待办事项（.jsonl为JSON Lines，其他为JSON数组），逐条写出"""
+        self._loaded.wait()
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.todos, f, ensure_ascii=False, indent=2)
+            todos = (todo.to_dict() for todo in self.get_todos())
+            count = write_todo_file(filename, todos, progress)
+            logging.info(f"导出 {count} 条待办事项到 {filename}")
             return True
         except Exception as e:
-            print(f"导出数据时出错: {e}")
+            print(f"导出数据时出错: {e}", file=sys.stderr)
             return False
 
-    def import_todos(self, filename):
-        """导入待办事项"""
+    @metrics.timed("data.import_todos")
+    def import_todos(self, filename, batch_size=1000, progress=None):
+        """流式导入待办事项
+
+        逐条解析（JSON数组或JSON Lines），校验字段，按ID和内容哈希跳过重复，
+        每batch_size条加锁写入一次内存，全部完成后只保存一次快照；
+        整个导入作为一组撤销（逆操作只记录导入的ID）。
+        progress(stats)会在每批之后和结束时被调用，stats包含
+        read / imported / duplicates / invalid。
+        """
+        self._loaded.wait()
+        stats = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+        imported = []
+        with self._lock:
+            seen_keys = {content_key(todo) for todo in self.todos.values()}
+        batch = []
+        ok = True
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                imported_todos = json.load(f)
-                self.todos.extend(imported_todos)
-                self.save_todos()
-            return True
+            for data in iter_todo_file(filename):
+                stats["read"] += 1
+                try:
+                    todo = validate_todo(data)
+                except ValueError as e:
+                    stats["invalid"] += 1
+                    logging.warning(f"跳过无效记录 #{stats['read']}: {e}")
+                    continue
+                key = content_key(todo)
+                if key in seen_keys or (todo.get("id") and todo["id"] in self.todos):
+                    stats["duplicates"] += 1
+                    continue
+                seen_keys.add(key)
+                batch.append(TodoRecord.from_dict(todo))
+                if len(batch) >= batch_size:
+                    self._import_batch(batch, stats, progress, imported)
+                    batch = []
         except Exception as e:
-            print(f"导入数据时出错: {e}")
-            return False 
\ No newline at end of file
+            print(f"导入数据时出错: {e}", file=sys.stderr)
+            ok = False
+        self._import_batch(batch, stats, progress, imported)
+        
+        if stats["imported"]:
+            # 整批导入只写一次完整快照，不把所有记录塞进日志
+            with self._lock:
+                self._snapshot_required = True
+                self._set_undo([{"op": "delete", "id": todo_id} for todo_id in imported])
+            self._request_save()
+            self._notify("reset")
+        logging.info(f"导入 {filename}: {stats}")
+        return ok
+    
+    def _import_batch(self, batch, stats, progress, imported):
+        """把一批导入记录写入内存，ID追加到imported"""
+        with self._lock:
+            for todo in batch:
+                self._insert(todo)
+                imported.append(todo.id)
+        stats["imported"] += len(batch)
+        if progress:
+            progress(dict(stats))
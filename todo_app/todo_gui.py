@@ -1,9 +1,17 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
-from tkcalendar import DateEntry, Calendar
 from datetime import datetime, timedelta
 import calendar
+import logging
+import queue
+import threading
+from virtual_list import VirtualList
+from todo_metrics import metrics
+from todo_reminders import ReminderScheduler
+
+BACKUP_INTERVAL = 60 * 60 * 1000  # 自动备份间隔（毫秒）
+EXTERNAL_CHECK_INTERVAL = 1000     # 检查其他进程修改的间隔（毫秒）
 
 class PlaceholderEntry(ttk.Entry):
     def __init__(self, container, placeholder, *args, **kwargs):
@@ -31,6 +39,23 @@ class TodoGUI:
     def __init__(self, todo_data):
         """初始化GUI"""
         self.todo_data = todo_data
+        self._row_ids = []  # 列表中每一行对应的任务ID，已删除的行在压缩之前为None
+        self._row_index = {}  # 任务ID -> 行位置，与_row_ids一起更新
+        self._compact_job = None  # 等待执行的_compact_rows
+        self._display_cache = {}  # 任务ID -> 显示文本
+        self._filter_date = None
+        self._search_text = ""
+        self._cal_events = {}  # 任务ID -> 日历标记ID，只包含当前显示范围
+        self._cal_range = (None, None)
+        self.priority_marks = {"high": "⚡", "normal": "○", "low": "▽"}
+        self.filter_priorities = {"全部优先级": None, "🔴 高": "high", "🟡 中": "normal", "🔵 低": "low"}
+        self._search_job = None
+        self._diagnostics = None  # 诊断面板窗口
+        self._history = None      # 历史记录（归档）窗口
+        self.reminders = ReminderScheduler(todo_data, self._show_reminders)
+        self._events = queue.Queue()  # 后台线程发来的变更通知，由主线程取出处理
+        self._sync_thread = None      # 正在检查外部修改的后台线程
+        self.month_calendar = None    # 日历控件在第一次绘制之后再创建
         self.root = tk.Tk()
         self.root.title("Todo")  # 更简约的标题
         self.root.geometry("1200x800")  # 更大的窗口
@@ -95,7 +120,19 @@ class TodoGUI:
 
         self.create_widgets()
         self.bind_events()
-        self.refresh_list()
+        self.todo_data.add_listener(self._queue_event)
+        self.reminders.attach_tk(self.root)
+        if self.todo_data.loaded:
+            self.refresh_list()
+        else:
+            # 先显示窗口，数据在后台加载，第一批解析出来就显示
+            self.todo_data.start_loading()
+        self._poll_save_state()
+        self._drain_events()
+        self.root.after(EXTERNAL_CHECK_INTERVAL, self._poll_external_changes)
+        # tkcalendar导入和日历控件创建较慢，等窗口显示出来之后再做
+        self.root.after(10, self._create_calendar_widgets)
+        self.root.after(BACKUP_INTERVAL, self._auto_backup)
     
     def create_widgets(self):
         """创建界面元素"""
@@ -116,13 +153,38 @@ class TodoGUI:
         search_frame.pack(fill=tk.X)
         
         self.search_var = tk.StringVar()
-        search_entry = PlaceholderEntry(
+        self.search_entry = PlaceholderEntry(
             search_frame,
             placeholder="🔍 搜索任务...",
             font=('微软雅黑', 11),
-            style="Modern.TEntry"
+            style="Modern.TEntry",
+            textvariable=self.search_var
         )
-        search_entry.pack(fill=tk.X, ipady=8)
+        self.search_entry.pack(fill=tk.X, ipady=8)
+        
+        # 分类和优先级筛选，与搜索关键词、日历日期组合使用
+        filter_frame = ttk.Frame(search_container)
+        filter_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        self.filter_category_var = tk.StringVar(value="全部分类")
+        ttk.Combobox(
+            filter_frame,
+            textvariable=self.filter_category_var,
+            values=["全部分类", "📁 默认", "💼 工作", "🏠 生活", "📚 学习"],
+            state="readonly",
+            font=('微软雅黑', 10),
+            width=12
+        ).pack(side=tk.LEFT)
+        
+        self.filter_priority_var = tk.StringVar(value="全部优先级")
+        ttk.Combobox(
+            filter_frame,
+            textvariable=self.filter_priority_var,
+            values=list(self.filter_priorities),
+            state="readonly",
+            font=('微软雅黑', 10),
+            width=12
+        ).pack(side=tk.LEFT, padx=10)
         
         # 添加任务区域
         add_task_frame = ttk.LabelFrame(
@@ -180,27 +242,14 @@ class TodoGUI:
         )
         calendar_frame.pack(fill=tk.X, pady=(0, 20))
         
-        self.month_calendar = Calendar(
+        self.calendar_frame = calendar_frame
+        self.calendar_placeholder = ttk.Label(
             calendar_frame,
-            locale='zh_CN',
-            selectmode='day',
-            cursor="hand1",
-            background=self.colors['bg'],
-            foreground=self.colors['text'],
-            selectbackground=self.colors['primary'],
-            selectforeground='white',
-            normalbackground=self.colors['bg'],
-            normalforeground=self.colors['text'],
-            weekendbackground=self.colors['bg_secondary'],
-            weekendforeground=self.colors['primary'],
-            othermonthforeground=self.colors['text_secondary'],
-            othermonthbackground=self.colors['bg'],
+            text="日历加载中...",
             font=('微软雅黑', 10),
-            borderwidth=0,
-            headersbackground=self.colors['bg'],
-            headersforeground=self.colors['text']
+            foreground=self.colors['text_secondary']
         )
-        self.month_calendar.pack(fill=tk.X, padx=15, pady=15)
+        self.calendar_placeholder.pack(padx=15, pady=15)
         
         # 任务列表
         list_frame = ttk.LabelFrame(
@@ -213,11 +262,12 @@ class TodoGUI:
         list_container = ttk.Frame(list_frame)
         list_container.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
         
-        self.todo_list = tk.Listbox(
+        # 虚拟列表只绘制可见的行，行内容按位置从数据层取；支持Ctrl/Shift多选和Ctrl+A全选
+        self.todo_list = VirtualList(
             list_container,
+            get_text=self._row_text,
+            selectmode='extended',
             font=('微软雅黑', 11),
-            selectmode=tk.SINGLE,
-            activestyle='none',
             relief='flat',
             bg=self.colors['bg'],
             fg=self.colors['text'],
@@ -252,11 +302,43 @@ class TodoGUI:
         )
         delete_btn.pack(side=tk.LEFT, padx=5)
         
+        undo_btn = ttk.Button(
+            button_frame,
+            text="↶ 撤销",
+            command=self.undo,
+            style="Modern.TButton"
+        )
+        undo_btn.pack(side=tk.LEFT, padx=5)
+        
+        redo_btn = ttk.Button(
+            button_frame,
+            text="↷ 重做",
+            command=self.redo,
+            style="Modern.TButton"
+        )
+        redo_btn.pack(side=tk.LEFT, padx=5)
+        
+        history_btn = ttk.Button(
+            button_frame,
+            text="📦 历史",
+            command=self.show_history,
+            style="Modern.TButton"
+        )
+        history_btn.pack(side=tk.RIGHT, padx=5)
+        
+        # 任务列表的右键菜单
+        self.list_menu = tk.Menu(self.root, tearoff=0)
+        self.list_menu.add_command(label="完成/取消完成", command=self.toggle_complete)
+        self.list_menu.add_command(label="删除", command=self.delete_todo)
+        self.list_menu.add_separator()
+        self.list_menu.add_command(label="停止重复", command=self.stop_recurring)
+        
         # 添加状态栏
         status_frame = ttk.Frame(right_panel)
         status_frame.pack(fill=tk.X, pady=(10, 0))
         
         self.status_var = tk.StringVar(value="加载中...")
+        self._status_text = "加载中..."
         status_label = ttk.Label(
             status_frame,
             textvariable=self.status_var,
@@ -278,14 +360,11 @@ class TodoGUI:
         ).pack(side=tk.LEFT)
         
         self.due_date_var = tk.StringVar()
-        self.calendar = DateEntry(
+        self.due_frame = due_frame
+        # 日期选择器在日历控件创建时替换掉这个输入框
+        self.calendar = ttk.Entry(
             due_frame,
             width=12,
-            background=self.colors['primary'],
-            foreground='white',
-            borderwidth=0,
-            locale='zh_CN',
-            date_pattern='yyyy-mm-dd',
             textvariable=self.due_date_var,
             font=('微软雅黑', 10)
         )
@@ -313,6 +392,29 @@ class TodoGUI:
         )
         self.category_combobox.pack(side=tk.LEFT, padx=10)
         
+        # 重复：规则只保存一次，日历和按日期筛选时才生成各次重复
+        repeat_frame = ttk.Frame(add_task_frame)
+        repeat_frame.pack(fill=tk.X, padx=15, pady=5)
+        
+        ttk.Label(
+            repeat_frame,
+            text="重复",
+            font=('微软雅黑', 10),
+            foreground=self.colors['text_secondary']
+        ).pack(side=tk.LEFT)
+        
+        self.repeat_options = {"不重复": None, "每天": "daily", "每周": "weekly",
+                               "每月": "monthly", "每年": "yearly"}
+        self.repeat_var = tk.StringVar(value="不重复")
+        ttk.Combobox(
+            repeat_frame,
+            textvariable=self.repeat_var,
+            values=list(self.repeat_options),
+            state="readonly",
+            font=('微软雅黑', 10),
+            width=15
+        ).pack(side=tk.LEFT, padx=10)
+        
         # 添加任务按钮
         add_btn = ttk.Button(
             add_task_frame,
@@ -325,45 +427,392 @@ class TodoGUI:
     def bind_events(self):
         """绑定事件"""
         self.todo_input.bind('<Return>', lambda e: self.add_todo())
+        self.search_var.trace_add('write', self._schedule_search)
+        self.filter_category_var.trace_add('write', lambda *args: self.refresh_list(self._filter_date))
+        self.filter_priority_var.trace_add('write', lambda *args: self.refresh_list(self._filter_date))
         self.todo_list.bind('<Double-Button-1>', lambda e: self.toggle_complete())
+        self.todo_list.bind('<Button-3>', self._show_list_menu)
+        self.root.bind('<Control-Shift-D>', lambda e: self.show_diagnostics())
+        self.root.bind('<Control-z>', self._on_undo_key)
+        self.root.bind('<Control-y>', self._on_redo_key)
+        self.root.bind('<Control-Shift-Z>', self._on_redo_key)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
     
+    def _create_calendar_widgets(self):
+        """创建日历和日期选择器（需要导入tkcalendar）"""
+        from tkcalendar import Calendar, DateEntry
+        
+        self.calendar_placeholder.destroy()
+        self.month_calendar = Calendar(
+            self.calendar_frame,
+            locale='zh_CN',
+            selectmode='day',
+            cursor="hand1",
+            background=self.colors['bg'],
+            foreground=self.colors['text'],
+            selectbackground=self.colors['primary'],
+            selectforeground='white',
+            normalbackground=self.colors['bg'],
+            normalforeground=self.colors['text'],
+            weekendbackground=self.colors['bg_secondary'],
+            weekendforeground=self.colors['primary'],
+            othermonthforeground=self.colors['text_secondary'],
+            othermonthbackground=self.colors['bg'],
+            font=('微软雅黑', 10),
+            borderwidth=0,
+            headersbackground=self.colors['bg'],
+            headersforeground=self.colors['text']
+        )
+        self.month_calendar.pack(fill=tk.X, padx=15, pady=15)
+        # 标记用颜色作为tag，这里为每种颜色配置显示样式
+        for color in ('success', 'danger', 'warning', 'secondary'):
+            self.month_calendar.tag_config(
+                self.colors[color], background=self.colors[color], foreground='white'
+            )
+        self.month_calendar.bind('<<CalendarSelected>>', self.on_date_selected)
+        # 翻月时重建标记
+        self.month_calendar.bind('<<CalendarMonthChanged>>', lambda e: self.refresh_calendar())
+        
+        self.calendar.destroy()
+        self.calendar = DateEntry(
+            self.due_frame,
+            width=12,
+            background=self.colors['primary'],
+            foreground='white',
+            borderwidth=0,
+            locale='zh_CN',
+            date_pattern='yyyy-mm-dd',
+            textvariable=self.due_date_var,
+            font=('微软雅黑', 10)
+        )
+        self.calendar.pack(side=tk.LEFT, padx=10)
+        self.refresh_calendar()
+    
+    @metrics.timed("gui.refresh_list")
     def refresh_list(self, filter_date=None):
-        """刷新待办事项列表"""
-        self.todo_list.delete(0, tk.END)
-        
-        for todo in self.todo_data.get_todos():
-            # 如果指定了日期筛选，检查任务是否属于该日期
-            if filter_date:
-                todo_date = todo.get('due_date')
-                if not todo_date:
-                    continue
-                try:
-                    task_date = datetime.strptime(todo_date, "%Y-%m-%d").date()
-                    if task_date != filter_date:
-                        continue
-                except ValueError:
-                    continue
-            
-            # 构建显示文本
+        """刷新待办事项列表（全量重建，只在切换筛选条件时使用）"""
+        self._filter_date = filter_date
+        
+        # 有筛选条件时交给数据层的索引查询，有关键词时按相关度排序
+        if filter_date or self._search_text or self._filter_category() or self._filter_priority():
+            todos = self.todo_data.search(
+                self._search_text,
+                category=self._filter_category(),
+                priority=self._filter_priority(),
+                start=filter_date,
+                end=filter_date
+            )
+        else:
+            todos = self.todo_data.get_todos()
+        
+        self._set_rows([todo["id"] for todo in todos])
+        metrics.record("gui.list_rows", len(self._row_ids))
+        self.todo_list.set_count(len(self._row_ids))
+        self._update_status()
+    
+    def _set_rows(self, row_ids):
+        """整体替换列表的行"""
+        self._row_ids = row_ids
+        self._row_index = {todo_id: row for row, todo_id in enumerate(row_ids)}
+    
+    def _append_row(self, todo_id):
+        self._row_index[todo_id] = len(self._row_ids)
+        self._row_ids.append(todo_id)
+        self.todo_list.row_inserted(len(self._row_ids) - 1)
+    
+    def _remove_row(self, row):
+        """删除一行：先留下空位，后面各行的位置不变；空闲时一起压缩
+
+        连续删除很多行（例如合并其他进程的批量删除）时每次只是O(1)，
+        压缩和重绘只做一次。
+        """
+        del self._row_index[self._row_ids[row]]
+        self._row_ids[row] = None
+        if self._compact_job is None:
+            self._compact_job = self.root.after_idle(self._compact_rows)
+    
+    def _compact_rows(self):
+        """去掉删除留下的空位，重建行位置映射"""
+        self._compact_job = None
+        removed = [row for row, todo_id in enumerate(self._row_ids) if todo_id is None]
+        if not removed:
+            return
+        self._set_rows([todo_id for todo_id in self._row_ids if todo_id is not None])
+        self.todo_list.rows_deleted(removed)
+    
+    def _row_text(self, index):
+        """虚拟列表按位置取行文字，任务已不存在（等待压缩或刷新）时为空"""
+        todo_id = self._row_ids[index]
+        todo = self.todo_data.get_todo(todo_id) if todo_id is not None else None
+        if todo is None:
+            return ""
+        return self._display_text(todo)
+    
+    def _display_text(self, todo):
+        """构建显示文本，结果按任务ID缓存，任务变化时失效"""
+        text = self._display_cache.get(todo["id"])
+        if text is None:
             status = "✓" if todo.get("completed", False) else "☐"
-            priority_marks = {"high": "⚡", "normal": "○", "low": "▽"}
-            priority_mark = priority_marks.get(todo.get("priority", "normal"), "○")
+            priority_mark = self.priority_marks.get(todo.get("priority", "normal"), "○")
             
-            display_text = f"{status} {priority_mark} [{todo.get('category', '默认')}] {todo['content']}"
+            text = f"{status} {priority_mark} [{todo.get('category', '默认')}] {todo['content']}"
             if todo.get("due_date"):
-                display_text += f" (截止: {todo['due_date']})"
-            
-            self.todo_list.insert(tk.END, display_text)
+                text += f" (截止: {todo['due_date']})"
+            self._display_cache[todo["id"]] = text
+        return text
+    
+    def _matches_view(self, todo):
+        """任务是否符合当前列表的筛选条件"""
+        if self._filter_date and self.todo_data.get_due_date(todo["id"]) != self._filter_date:
+            return False
+        if self._filter_category() and todo.get("category") != self._filter_category():
+            return False
+        if self._filter_priority() and todo.get("priority") != self._filter_priority():
+            return False
+        if self._search_text and not self.todo_data.matches_query(todo["id"], self._search_text):
+            return False
+        return True
+    
+    def _filter_category(self):
+        """当前的分类筛选，None表示全部"""
+        category = self.filter_category_var.get()
+        return None if category == "全部分类" else category
+    
+    def _filter_priority(self):
+        """当前的优先级筛选，None表示全部"""
+        return self.filter_priorities.get(self.filter_priority_var.get())
+    
+    def _queue_event(self, event, todo):
+        """变更通知可能来自后台线程，Tk只能在主线程操作，先放进队列"""
+        if threading.current_thread() is threading.main_thread():
+            self._on_data_changed(event, todo)
+        else:
+            self._events.put((event, todo))
+    
+    def _drain_events(self):
+        """定时处理后台线程发来的变更通知"""
+        try:
+            while True:
+                self._on_data_changed(*self._events.get_nowait())
+        except queue.Empty:
+            pass
+        self.root.after(50, self._drain_events)
+    
+    @metrics.timed("gui.data_changed")
+    def _on_data_changed(self, event, todo):
+        """根据数据层的变更通知只更新受影响的行和日历标记"""
+        if event == "loading":
+            self._on_loading()
+            return
+        self.reminders.on_event(event, todo)
+        self._update_calendar_event(event, todo)
+        if event == "reset":
+            self._display_cache.clear()
+            self.refresh_list(self._filter_date)
+            return
         
-        # 更新状态栏
+        todo_id = todo["id"]
+        self._display_cache.pop(todo_id, None)
+        row = self._row_index.get(todo_id)
+        
+        if event == "add":
+            if self._matches_view(todo):
+                self._append_row(todo_id)
+        elif event == "delete":
+            if row is not None:
+                self._remove_row(row)
+        elif event == "update":
+            if row is not None and self._matches_view(todo):
+                self.todo_list.row_changed(row)
+            elif row is not None:
+                self._remove_row(row)
+            elif self._matches_view(todo):
+                # 修改后才进入当前视图，需要按原有顺序重新排列
+                self.refresh_list(self._filter_date)
+                return
+        self._update_status()
+    
+    def _on_loading(self):
+        """后台加载中：第一批任务到达时先显示第一屏，之后只更新进度"""
+        if not self._row_ids:
+            self.refresh_list(self._filter_date)
+        self._set_status(f"正在加载... 已读取 {self.todo_data.get_stats()[0]} 项")
+    
+    def _check_loaded(self):
+        """数据加载完成前不允许修改"""
+        if not self.todo_data.loaded:
+            messagebox.showinfo("提示", "数据正在加载，请稍候")
+            return False
+        return True
+    
+    def _update_status(self):
+        """根据当前视图更新状态栏"""
         total, completed = self.todo_data.get_stats()
-        if filter_date:
-            self.status_var.set(f"{filter_date.strftime('%Y-%m-%d')} 的任务：共 {self.todo_list.size()} 项")
+        if self._search_text or self._filter_category() or self._filter_priority():
+            self._set_status(f"找到 {len(self._row_index)} 项（共 {total} 项）")
+        elif self._filter_date:
+            self._set_status(f"{self._filter_date.strftime('%Y-%m-%d')} 的任务：共 {len(self._row_index)} 项")
         else:
-            self.status_var.set(f"共 {total} 项，已完成 {completed} 项")
+            archived = self.todo_data.archived_count()
+            self._set_status(f"共 {total} 项，已完成 {completed} 项"
+                             + (f"，已归档 {archived} 项" if archived else ""))
+    
+    def _set_status(self, text):
+        """更新状态栏文字，并附带保存状态"""
+        self._status_text = text
+        save_marks = {
+            "pending": "● 待保存",
+            "saving": "● 保存中...",
+            "saved": "✓ 已保存",
+            "error": "✗ 保存失败"
+        }
+        mark = save_marks.get(self.todo_data.save_state, "")
+        status = f"{text}    {mark}"
+        if self.status_var.get() != status:
+            self.status_var.set(status)
+    
+    def _poll_save_state(self):
+        """定时刷新状态栏中的保存状态（后台线程不能直接操作Tk）"""
+        self._set_status(self._status_text)
+        self.root.after(300, self._poll_save_state)
+    
+    def _poll_external_changes(self):
+        """定时检查其他进程（另一个窗口、命令行、接口服务）对数据文件的修改
+
+        数据层只比较文件状态，有变化时才读取新增的日志记录，
+        合并后通过变更通知增量更新列表和日历。检查在后台线程进行：日志被其他进程
+        压缩后要整体重新加载，还可能要等写盘线程释放锁，不能阻塞界面；
+        通知经_queue_event回到主线程。上一次检查还没结束时本次跳过。
+        """
+        if self._sync_thread is None or not self._sync_thread.is_alive():
+            self._sync_thread = threading.Thread(target=self._check_external_changes,
+                                                 name="todo-sync", daemon=True)
+            self._sync_thread.start()
+        self.root.after(EXTERNAL_CHECK_INTERVAL, self._poll_external_changes)
+    
+    def _check_external_changes(self):
+        try:
+            self.todo_data.check_external_changes()
+        except Exception as e:
+            logging.error(f"检查外部修改时出错: {e}")
+    
+    def _auto_backup(self):
+        """定时创建增量备份，备份本身在后台线程进行"""
+        self.todo_data.backup_data()
+        self.root.after(BACKUP_INTERVAL, self._auto_backup)
+    
+    def _show_reminders(self, todos):
+        """到达提醒时间的任务：响铃并弹出一个不阻塞主窗口的提醒窗口"""
+        self.root.bell()
+        window = tk.Toplevel(self.root)
+        window.title("截止日期提醒")
+        window.attributes('-topmost', True)
+        ttk.Label(window, text=f"{len(todos)} 项任务即将到期：",
+                  font=('微软雅黑', 11, 'bold')).pack(anchor=tk.W, padx=20, pady=(15, 5))
+        for todo in todos[:20]:
+            ttk.Label(window, text=self._display_text(todo)).pack(anchor=tk.W, padx=20)
+        if len(todos) > 20:
+            ttk.Label(window, text=f"…… 还有 {len(todos) - 20} 项").pack(anchor=tk.W, padx=20)
+        ttk.Button(window, text="知道了", command=window.destroy).pack(pady=15)
+
+    def show_diagnostics(self):
+        """诊断面板（Ctrl+Shift+D）：各操作的耗时分布、保存字节数和计数器，每秒刷新"""
+        if self._diagnostics is not None and self._diagnostics.winfo_exists():
+            self._diagnostics.lift()
+            return
+        window = self._diagnostics = tk.Toplevel(self.root)
+        window.title("诊断")
+        window.geometry("860x520")
+        text = tk.Text(window, font=('Consolas', 10), wrap=tk.NONE)
+        buttons = ttk.Frame(window)
+        buttons.pack(side=tk.BOTTOM, fill=tk.X)
+        ttk.Button(buttons, text="重置", command=metrics.reset).pack(side=tk.RIGHT, padx=10, pady=5)
+        text.pack(fill=tk.BOTH, expand=True)
+
+        def update():
+            if not window.winfo_exists():
+                return
+            text.configure(state=tk.NORMAL)
+            text.delete("1.0", tk.END)
+            text.insert("1.0", metrics.report())
+            text.configure(state=tk.DISABLED)
+            window.after(1000, update)
+        update()
+
+    def show_history(self):
+        """历史记录窗口：在后台线程读取归档，可以搜索，并把选中的任务恢复到列表"""
+        if self._history is not None and self._history.winfo_exists():
+            self._history.lift()
+            return
+        window = self._history = tk.Toplevel(self.root)
+        window.title("历史记录")
+        window.geometry("800x500")
+        rows = []
+        result = queue.Queue()
+        search_var = tk.StringVar()
+        status_var = tk.StringVar(value="读取归档中...")
+
+        def row_text(index):
+            todo = rows[index]
+            text = f"✓ [{todo.get('category', '默认')}] {todo.get('content', '')}"
+            if todo.get("completed_time"):
+                text += f" (完成: {todo['completed_time']})"
+            return text
+
+        top = ttk.Frame(window)
+        top.pack(fill=tk.X, padx=10, pady=5)
+        search_entry = ttk.Entry(top, textvariable=search_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        history_list = VirtualList(window, row_text, font=('微软雅黑', 11), selectmode='extended')
+        bottom = ttk.Frame(window)
+        bottom.pack(side=tk.BOTTOM, fill=tk.X)
+        ttk.Label(bottom, textvariable=status_var).pack(side=tk.LEFT, padx=10)
+        history_list.pack(fill=tk.BOTH, expand=True, padx=10)
+
+        def load():
+            status_var.set("读取归档中...")
+            query = search_var.get()
+            threading.Thread(target=lambda: result.put(self.todo_data.get_archived(query)),
+                             name="todo-history", daemon=True).start()
+            window.after(50, poll)
+
+        def poll():
+            if not window.winfo_exists():
+                return
+            try:
+                rows[:] = result.get_nowait()
+            except queue.Empty:
+                window.after(50, poll)
+                return
+            history_list.set_count(len(rows))
+            status_var.set(f"共 {len(rows)} 项")
+
+        def restore():
+            todo_ids = [rows[index]["id"] for index in history_list.curselection()]
+            if not todo_ids:
+                messagebox.showwarning("提示", "请先选择要恢复的任务", parent=window)
+                return
+            self.todo_data.unarchive(todo_ids)
+            load()
+
+        ttk.Button(bottom, text="恢复到列表", command=restore).pack(side=tk.RIGHT, padx=10, pady=5)
+        ttk.Button(top, text="搜索", command=load).pack(side=tk.LEFT, padx=5)
+        search_entry.bind('<Return>', lambda e: load())
+        load()
+
+    def on_close(self):
+        """关闭窗口前把未保存的修改写盘"""
+        self.todo_data.flush()
+        if self.todo_data.save_state == "error":
+            if not messagebox.askyesno("错误", "保存数据失败，仍然要退出吗？"):
+                return
+        self.todo_data.close()
+        self.root.destroy()
     
     def add_todo(self):
         """添加待办事项"""
+        if not self._check_loaded():
+            return
         content = self.todo_input.get().strip()
         if content and content != self.todo_input.placeholder:
             try:
@@ -373,13 +822,23 @@ class TodoGUI:
                     messagebox.showwarning("警告", "请输入正确的日期格式：YYYY-MM-DD")
                     return
                 
-                # 添加待办事项
-                self.todo_data.add_todo(
-                    content=content,
-                    due_date=due_date if due_date else None,
-                    priority=self.priority_var.get(),
-                    category=self.category_var.get()
-                )
+                # 添加待办事项；重复任务从截止日期（默认今天）开始
+                freq = self.repeat_options.get(self.repeat_var.get())
+                if freq:
+                    self.todo_data.add_recurring(
+                        content,
+                        freq,
+                        start=due_date or None,
+                        priority=self.priority_var.get(),
+                        category=self.category_var.get()
+                    )
+                else:
+                    self.todo_data.add_todo(
+                        content=content,
+                        due_date=due_date if due_date else None,
+                        priority=self.priority_var.get(),
+                        category=self.category_var.get()
+                    )
                 
                 # 清空输入
                 self.todo_input.delete(0, tk.END)
@@ -387,47 +846,139 @@ class TodoGUI:
                 self.due_date_var.set("")
                 self.priority_var.set("normal")
                 self.category_var.set("默认")
-                
-                # 在添加成功后刷新日历
-                self.refresh_calendar()
-                self.refresh_list()
+                self.repeat_var.set("不重复")
             except Exception as e:
                 messagebox.showerror("错误", f"添加待办事项时出错：{str(e)}")
         else:
             messagebox.showwarning("警告", "请输入待办事项内容！")
     
+    def _selected_ids(self):
+        """选中行对应的任务ID"""
+        row_ids = (self._row_ids[index] for index in self.todo_list.curselection())
+        return [todo_id for todo_id in row_ids if todo_id is not None]
+    
     def delete_todo(self):
-        """删除待办事项"""
-        selection = self.todo_list.curselection()
-        if selection:
-            index = selection[0]
-            self.todo_data.delete_todo(index)
-            # 在删除成功后刷新日历
-            self.refresh_calendar()
-            self.refresh_list()
+        """删除选中的待办事项（多选时一次批量删除）"""
+        if not self._check_loaded():
+            return
+        todo_ids = self._selected_ids()
+        if len(todo_ids) == 1:
+            # 列表和日历由变更通知增量更新
+            self.todo_data.delete_todo(todo_ids[0])
+        elif todo_ids:
+            if not messagebox.askyesno("确认", f"删除选中的 {len(todo_ids)} 项任务？"):
+                return
+            # 一次写盘，结束时一次reset通知刷新列表和日历
+            deleted = self.todo_data.delete_many(todo_ids)
+            self._set_status(f"已删除 {deleted} 项（Ctrl+Z 撤销）")
         else:
             messagebox.showinfo("提示", "请选择要删除的待办事项！")
     
+    def _selected_rules(self):
+        """选中的单次重复所属的重复规则ID（去重，保持顺序）"""
+        rule_ids = []
+        for todo_id in self._selected_ids():
+            todo = self.todo_data.get_todo(todo_id)
+            rule_id = todo.get("rule") if todo is not None else None
+            if rule_id and rule_id not in rule_ids:
+                rule_ids.append(rule_id)
+        return rule_ids
+    
+    def _show_list_menu(self, event):
+        """右键菜单：右键点在未选中的行上时先选中这一行"""
+        index = self.todo_list.nearest(event.y)
+        if index is not None and index not in self.todo_list.curselection():
+            self.todo_list.selection_clear()
+            self.todo_list.selection_set(index)
+        self.list_menu.entryconfigure("停止重复", state=tk.NORMAL if self._selected_rules() else tk.DISABLED)
+        try:
+            self.list_menu.tk_popup(event.x_root, event.y_root)
+        finally:
+            self.list_menu.grab_release()
+    
+    def stop_recurring(self):
+        """删除选中的单次重复所属的重复规则，以后不再生成（Ctrl+Z 撤销）"""
+        if not self._check_loaded():
+            return
+        rule_ids = self._selected_rules()
+        if not rule_ids:
+            messagebox.showinfo("提示", "请选择重复任务！")
+            return
+        if not messagebox.askyesno("确认", f"停止选中的 {len(rule_ids)} 个重复任务？以后不再生成，"
+                                           "已完成的记录一并删除"):
+            return
+        # 一个批次：整体撤销，结束时一次reset通知刷新列表和日历
+        with self.todo_data.batch():
+            stopped = sum(1 for rule_id in rule_ids if self.todo_data.delete_recurring(rule_id))
+        self._set_status(f"已停止 {stopped} 个重复任务（Ctrl+Z 撤销）")
+    
     def toggle_complete(self):
-        """切换完成状态"""
-        selection = self.todo_list.curselection()
-        if selection:
-            index = selection[0]
-            self.todo_data.toggle_complete(index)
-            # 在切换状态后刷新日历
-            self.refresh_calendar()
-            self.refresh_list()
+        """切换完成状态；多选时全部已完成则全部标记为未完成，否则全部标记为完成"""
+        if not self._check_loaded():
+            return
+        todo_ids = self._selected_ids()
+        if len(todo_ids) == 1:
+            # 列表和日历由变更通知增量更新
+            self.todo_data.toggle_complete(todo_ids[0])
+        elif todo_ids:
+            completed = not all(self.todo_data.get_todo(todo_id)["completed"] for todo_id in todo_ids)
+            changed = self.todo_data.set_completed_many(todo_ids, completed)
+            self._set_status(f"已{'完成' if completed else '重新打开'} {changed} 项（Ctrl+Z 撤销）")
         else:
             messagebox.showinfo("提示", "请选择要切换状态的待办事项！")
     
+    def undo(self):
+        """撤销最近一次修改，批量操作和导入整体撤销"""
+        if not self._check_loaded():
+            return
+        self._report_replay(self.todo_data.undo(), "撤销")
+    
+    def redo(self):
+        """重做最近一次撤销的修改"""
+        if not self._check_loaded():
+            return
+        self._report_replay(self.todo_data.redo(), "重做")
+    
+    def _report_replay(self, done, action):
+        """显示撤销/重做的结果，包括因任务已归档而跳过的组"""
+        skipped = self.todo_data.replay_skipped
+        if skipped:
+            rest = "" if done else f"，没有其他可以{action}的操作"
+            self._set_status(f"跳过了 {skipped} 组涉及已归档任务的修改{rest}")
+        elif not done:
+            self._set_status(f"没有可以{action}的操作")
+    
+    def _on_undo_key(self, event):
+        """输入框里的Ctrl+Z留给输入框自己"""
+        if isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            return None
+        self.undo()
+        return 'break'
+    
+    def _on_redo_key(self, event):
+        """输入框里的Ctrl+Y留给输入框自己"""
+        if isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            return None
+        self.redo()
+        return 'break'
+    
+    def _schedule_search(self, *args):
+        """输入时防抖：停止输入一小段时间后再搜索"""
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(250, self.on_search)
+    
+    @metrics.timed("gui.on_search")
     def on_search(self, *args):
         """搜索功能实现"""
-        search_text = self.search_var.get().lower()
-        self.todo_list.delete(0, tk.END)
-        for todo in self.todo_data.get_todos():
-            if search_text in todo["content"].lower():
-                prefix = "✓ " if todo["completed"] else "☐ "
-                self.todo_list.insert(tk.END, prefix + todo["content"])
+        self._search_job = None
+        text = self.search_var.get().strip()
+        if text == self.search_entry.placeholder:
+            text = ""
+        if text == self._search_text:
+            return
+        self._search_text = text
+        self.refresh_list(self._filter_date)
     
     def _is_valid_date(self, date_str):
         """验证日期格式"""
@@ -438,44 +989,77 @@ class TodoGUI:
         except ValueError:
             return False
     
+    @metrics.timed("gui.refresh_calendar")
     def refresh_calendar(self):
-        """更新日历上的任务标记"""
+        """重建日历上的任务标记，只生成当前显示月份（前后各多一周）的标记"""
+        if self.month_calendar is None:
+            return
         # 清除所有标记
         self.month_calendar.calevent_remove('all')
+        self._cal_events = {}
+        self._cal_range = self._calendar_range()
         
-        # 添加所有任务到日历
-        for todo in self.todo_data.get_todos():
-            due_date = todo.get('due_date')
-            if due_date:
-                try:
-                    date = datetime.strptime(due_date, "%Y-%m-%d").date()
-                    # 根据优先级和完成状态设置不同的标记颜色
-                    if todo.get('completed'):
-                        color = self.colors['success']
-                    else:
-                        priority_colors = {
-                            'high': self.colors['danger'],
-                            'normal': self.colors['warning'],
-                            'low': self.colors['secondary']
-                        }
-                        color = priority_colors.get(todo.get('priority', 'normal'))
-                    
-                    # 修改这里的调用，移除category参数
-                    self.month_calendar.calevent_create(
-                        date,          # 日期
-                        todo['content'],  # 事件文本
-                        color         # 颜色
-                    )
-                except ValueError:
-                    continue
+        # 日期已由数据层解析并按日期索引，这里只取可见范围
+        for date, todo in self.todo_data.iter_dated_todos(*self._cal_range):
+            self._cal_events[todo['id']] = self.month_calendar.calevent_create(
+                date,                        # 日期
+                todo['content'],             # 事件文本
+                self._calendar_color(todo)   # 颜色
+            )
+        metrics.record("gui.calendar_marks", len(self._cal_events))
+    
+    def _calendar_range(self):
+        """当前显示月份前后各多一周的日期范围"""
+        month, year = self.month_calendar.get_displayed_month()
+        first = datetime(year, month, 1).date()
+        last = first.replace(day=calendar.monthrange(year, month)[1])
+        return first - timedelta(days=7), last + timedelta(days=7)
+    
+    def _calendar_color(self, todo):
+        """根据优先级和完成状态设置不同的标记颜色"""
+        if todo.get('completed'):
+            return self.colors['success']
+        priority_colors = {
+            'high': self.colors['danger'],
+            'normal': self.colors['warning'],
+            'low': self.colors['secondary']
+        }
+        return priority_colors.get(todo.get('priority', 'normal'), self.colors['warning'])
+    
+    def _update_calendar_event(self, event, todo):
+        """只增删或重新着色发生变化的那一个任务的日历标记"""
+        if self.month_calendar is None:
+            return
+        if event == "reset":
+            self.refresh_calendar()
+            return
+        
+        todo_id = todo['id']
+        ev_id = self._cal_events.pop(todo_id, None)
+        date = self.todo_data.get_due_date(todo_id) if event != "delete" else None
+        start, end = self._cal_range
+        if date is None or not start <= date <= end:
+            if ev_id is not None:
+                self.month_calendar.calevent_remove(ev_id)
+            return
+        
+        if ev_id is None:
+            ev_id = self.month_calendar.calevent_create(
+                date, todo['content'], self._calendar_color(todo)
+            )
+        else:
+            self.month_calendar.calevent_configure(
+                ev_id, date=date, text=todo['content'], tags=[self._calendar_color(todo)]
+            )
+        self._cal_events[todo_id] = ev_id
     
     def on_date_selected(self, event=None):
         """当选择日期时更新任务列表"""
-        selected_date = self.month_calendar.get_date()
-        try:
-            date = datetime.strptime(selected_date, "%Y-%m-%d").date()
+        # selection_get直接返回date，不受日历locale的日期格式影响
+        date = self.month_calendar.selection_get()
+        if date:
             self.refresh_list(filter_date=date)
-        except ValueError:
+        else:
             self.refresh_list()
     
     def run(self):
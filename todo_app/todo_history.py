@@ -0,0 +1,209 @@
+"""撤销/重做历史
+
+每组修改只记录它的逆操作（与日志相同的 add / delete / update 等变更记录），
+大小与这次修改的内容成正比，与任务总数无关；撤销栈和重做栈都是有上限的
+双端队列，超出时最旧的一组自动丢弃。
+历史以追加式的JSON Lines保存在数据文件旁边（入栈、出栈、清空各一行），
+重新启动后回放即可恢复，仍然可以撤销；行数超过上限的几倍时按当前内容重写一次。
+修改先在内存中完成，写文件由flush()在后台保存线程中进行，不占用界面线程。
+"""
+import json
+import sys
+import threading
+import uuid
+from collections import deque
+
+from todo_storage import FileLock, atomic_write, file_signature
+
+
+HISTORY_LIMIT = 100  # 最多保留的撤销组数
+
+
+class History:
+    """撤销栈和重做栈
+
+    record(ops, source)登记一组逆操作：source为None表示一次新的修改（清空重做栈），
+    "undo"表示撤销时产生的逆操作（进入重做栈），"redo"表示重做时产生的逆操作（回到撤销栈）。
+
+    record() / pop() / clear()只修改内存并积压记录，flush()持有跨进程的文件锁写入：
+    其他进程写过文件时先读入它们的记录，再把本进程积压的记录接在后面。
+    每组带唯一ID，出栈按ID删除，多个进程的记录交错写入时回放结果仍然一致。
+    """
+
+    def __init__(self, path=None, limit=HISTORY_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.undo_stack = deque(maxlen=limit)  # [(组ID, 逆操作)]
+        self.redo_stack = deque(maxlen=limit)
+        self._lines = 0       # 历史文件中的行数
+        self._pending = []    # 尚未写入文件的记录
+        self._state = None    # 上次读写后历史文件的状态
+        self._lock = threading.RLock()  # 保护两个栈和积压记录，flush()在保存线程中调用
+        self._file_lock = FileLock(f"{path}.lock") if path is not None else None
+        if path is not None:
+            self._load()
+
+    @property
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    @property
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def _stack(self, name):
+        return self.undo_stack if name == "undo" else self.redo_stack
+
+    def _apply(self, entry):
+        action = entry["action"]
+        if action == "push":
+            self._stack(entry["stack"]).append((entry.get("id"), entry["ops"]))
+        elif action == "pop":
+            # 按组ID删除；没有ID的旧记录删除最上面一组
+            stack = self._stack(entry["stack"])
+            group_id = entry.get("id")
+            for i in range(len(stack) - 1, -1, -1):
+                if group_id is None or stack[i][0] == group_id:
+                    del stack[i]
+                    break
+        elif action == "clear":
+            for name in entry["stacks"]:
+                self._stack(name).clear()
+
+    def _read(self):
+        """读取历史文件，返回 (记录列表, 是否有无效记录)；写到一半的行（进程中断）被跳过"""
+        entries = []
+        damaged = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        if entry["action"] not in ("push", "pop", "clear"):
+                            raise ValueError(f"未知的操作: {entry['action']}")
+                    except (ValueError, KeyError, TypeError) as e:
+                        print(f"撤销历史中有无效记录，已跳过: {e}", file=sys.stderr)
+                        damaged = True
+                        continue
+                    entries.append(entry)
+        except FileNotFoundError:
+            pass
+        return entries, damaged
+
+    def _rebuild(self, entries):
+        """按文件中的记录和本进程积压的记录重建两个栈，调用方需持有_lock"""
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        for entry in entries + self._pending:
+            try:
+                self._apply(entry)
+            except (KeyError, TypeError) as e:
+                print(f"撤销历史中有无效记录，已跳过: {e}", file=sys.stderr)
+
+    def _load(self):
+        """回放历史文件，有无效记录时按当前内容重写文件"""
+        try:
+            with self._file_lock:
+                self._sync()
+        except OSError as e:
+            print(f"读取撤销历史时出错: {e}", file=sys.stderr)
+
+    def _reload(self):
+        """重新回放历史文件，返回是否有无效记录，调用方需持有文件锁"""
+        state = file_signature(self.path)
+        entries, damaged = self._read()
+        with self._lock:
+            self._rebuild(entries)
+            self._lines = len(entries)
+            self._state = state
+        return damaged
+
+    def _sync(self):
+        """读入其他进程的修改并写出积压的记录，调用方需持有文件锁"""
+        rewrite = file_signature(self.path) != self._state and self._reload()
+        with self._lock:
+            entries, self._pending = self._pending, []
+            rewrite = rewrite or self._lines + len(entries) > 4 * self.limit
+            if rewrite:
+                lines = [{"action": "push", "stack": name, "id": group_id, "ops": ops}
+                         for name in ("undo", "redo") for group_id, ops in self._stack(name)]
+        try:
+            if rewrite:
+                atomic_write(self.path, "".join(json.dumps(entry, ensure_ascii=False) + "\n"
+                                                for entry in lines).encode('utf-8'))
+                self._lines = len(lines)
+            elif entries:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+                self._lines += len(entries)
+        except OSError:
+            # 没写进去的记录留到下次
+            with self._lock:
+                self._pending[:0] = entries
+            raise
+        self._state = file_signature(self.path)
+
+    def flush(self):
+        """把积压的记录写入历史文件（其他进程写过时先合并），没有变化时只需一次stat"""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._pending and file_signature(self.path) == self._state:
+                return
+        try:
+            with self._file_lock:
+                self._sync()
+        except OSError as e:
+            print(f"保存撤销历史时出错: {e}", file=sys.stderr)
+
+    def refresh(self):
+        """其他进程写过历史文件时读入（只比较文件状态，不写文件），返回是否有变化"""
+        if self.path is None or file_signature(self.path) == self._state:
+            return False
+        try:
+            with self._file_lock:
+                self._reload()
+        except OSError as e:
+            print(f"读取撤销历史时出错: {e}", file=sys.stderr)
+            return False
+        return True
+
+    def _log(self, *entries):
+        """修改内存中的栈并积压记录，由flush()写入文件"""
+        with self._lock:
+            for entry in entries:
+                self._apply(entry)
+            if self.path is not None:
+                self._pending.extend(entries)
+
+    def record(self, ops, source=None):
+        """登记一组逆操作（按执行顺序排列）"""
+        if not ops:
+            return
+        push = {"action": "push", "id": uuid.uuid4().hex, "ops": ops}
+        if source == "undo":
+            self._log(dict(push, stack="redo"))
+        elif source == "redo":
+            self._log(dict(push, stack="undo"))
+        elif self.redo_stack:
+            self._log({"action": "clear", "stacks": ["redo"]}, dict(push, stack="undo"))
+        else:
+            self._log(dict(push, stack="undo"))
+
+    def pop(self, name):
+        """取出撤销栈（"undo"）或重做栈（"redo"）最上面的一组，栈为空时返回None"""
+        with self._lock:
+            stack = self._stack(name)
+            if not stack:
+                return None
+            group_id, ops = stack[-1]
+            self._log({"action": "pop", "stack": name, "id": group_id})
+            return ops
+
+    def clear(self):
+        """清空全部历史（数据被整体替换时）"""
+        with self._lock:
+            if self.undo_stack or self.redo_stack:
+                self._log({"action": "clear", "stacks": ["undo", "redo"]})
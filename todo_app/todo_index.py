@@ -0,0 +1,62 @@
+import bisect
+from datetime import date, datetime
+
+
+def parse_date(value):
+    """把YYYY-MM-DD字符串解析成date，无效值返回None"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value or len(value) != 10:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class DateIndex:
+    """截止日期索引：日期 -> 任务ID
+
+    每个日期下的任务ID用dict保存以保留插入顺序；另外维护一个有序的日期列表，
+    用二分查找回答"本月"、"未来7天"这类范围查询。
+    """
+
+    def __init__(self):
+        self._by_date = {}
+        self._dates = []
+
+    def clear(self):
+        """清空索引"""
+        self._by_date.clear()
+        self._dates.clear()
+
+    def add(self, day, todo_id):
+        """登记任务的截止日期"""
+        ids = self._by_date.get(day)
+        if ids is None:
+            ids = self._by_date[day] = {}
+            bisect.insort(self._dates, day)
+        ids[todo_id] = None
+
+    def remove(self, day, todo_id):
+        """移除任务的截止日期"""
+        ids = self._by_date.get(day)
+        if ids is None:
+            return
+        ids.pop(todo_id, None)
+        if not ids:
+            del self._by_date[day]
+            del self._dates[bisect.bisect_left(self._dates, day)]
+
+    def get(self, day):
+        """某一天截止的任务ID"""
+        return list(self._by_date.get(day, ()))
+
+    def range(self, start=None, end=None):
+        """按日期顺序返回[start, end]内的 (日期, 任务ID列表)"""
+        lo = 0 if start is None else bisect.bisect_left(self._dates, start)
+        hi = len(self._dates) if end is None else bisect.bisect_right(self._dates, end)
+        for day in self._dates[lo:hi]:
+            yield day, list(self._by_date[day])
@@ -0,0 +1,129 @@
+import json
+import os
+
+from todo_index import parse_date
+
+
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+
+
+def is_json_lines(filename):
+    """按扩展名判断是否为JSON Lines格式"""
+    return filename.lower().endswith(JSON_LINES_SUFFIXES)
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """逐条解析JSON数组文件，内存中只保留当前记录和一个读缓冲块"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+    while True:
+        # 跳过空白和分隔符，直到遇到下一条记录
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError("JSON文件不是数组格式")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == ",":
+                    pos += 1
+                    continue
+                if buffer[pos] == "]":
+                    return
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                if started:
+                    raise ValueError("JSON数组不完整")
+                return
+            buffer = buffer[pos:] + chunk
+            pos = 0
+        # 解析一条记录，缓冲区不够时继续读取
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer = buffer[pos:] + chunk
+                pos = 0
+        yield value
+        pos = end
+
+
+def iter_json_lines(f):
+    """逐行解析JSON Lines文件，跳过空行"""
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_todo_file(filename):
+    """按格式逐条读取导入文件中的记录"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        if is_json_lines(filename):
+            yield from iter_json_lines(f)
+        else:
+            yield from iter_json_array(f)
+
+
+def validate_todo(data):
+    """校验并规范化一条导入记录，不合法时抛出ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("记录不是对象")
+    content = data.get("content")
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("缺少任务内容")
+    due_date = data.get("due_date")
+    if due_date and parse_date(due_date) is None:
+        raise ValueError(f"截止日期格式错误: {due_date}")
+    for field in ("priority", "category", "create_time", "id"):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValueError(f"字段类型错误: {field}")
+    todo = dict(data)
+    todo["completed"] = bool(data.get("completed", False))
+    todo["due_date"] = due_date or None
+    todo.setdefault("priority", "normal")
+    todo.setdefault("category", "默认")
+    return todo
+
+
+def content_key(todo):
+    """用于判断重复任务的内容哈希"""
+    return hash((todo.get("content"), todo.get("create_time"), todo.get("due_date")))
+
+
+def write_todo_file(filename, todos, progress=None, every=10000):
+    """逐条写出任务（JSON数组或JSON Lines），先写临时文件再替换"""
+    tmp_path = f"{filename}.tmp"
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if is_json_lines(filename):
+            for todo in todos:
+                f.write(json.dumps(todo, ensure_ascii=False))
+                f.write("\n")
+                count += 1
+                if progress and count % every == 0:
+                    progress(count)
+        else:
+            f.write("[")
+            for todo in todos:
+                text = json.dumps(todo, ensure_ascii=False, indent=2)
+                f.write(",\n  " if count else "\n  ")
+                f.write(text.replace("\n", "\n  "))
+                count += 1
+                if progress and count % every == 0:
+                    progress(count)
+            f.write("\n]" if count else "]")
+    os.replace(tmp_path, filename)
+    if progress:
+        progress(count)
+    return count
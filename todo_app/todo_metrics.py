@@ -0,0 +1,211 @@
+"""性能统计和日志
+
+metrics收集各操作的耗时直方图、计数器和数值分布（每次保存写出的字节数、
+每次刷新的行数等）。每次记录只是几次加法和一次二分查找，可以一直开着；
+超过慢操作阈值的调用会写一条警告日志。
+setup_logging()把日志交给后台线程写文件，调用logging的线程不会被磁盘IO阻塞。
+"""
+import atexit
+import bisect
+import functools
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+SLOW_THRESHOLD = 0.1  # 默认慢操作阈值（秒）
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# 直方图分桶上界：耗时从0.05毫秒到约26秒按2倍递增，数值按4倍递增
+TIME_BOUNDS = tuple(0.00005 * 2 ** i for i in range(20))
+VALUE_BOUNDS = tuple(4 ** i for i in range(16))
+
+
+class Histogram:
+    """固定分桶的直方图，分位数取所在桶的上界"""
+
+    __slots__ = ("bounds", "buckets", "count", "total", "max")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # 最后一个桶放超出上界的值
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        rank = self.count * p / 100
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max
+        }
+
+
+class Metrics:
+    """耗时、数值和计数器的汇总，线程安全"""
+
+    def __init__(self, slow_threshold=SLOW_THRESHOLD):
+        self.slow_threshold = slow_threshold
+        self.thresholds = {}  # 操作名 -> 单独设置的慢操作阈值
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._values = {}
+        self._counters = {}
+        self.started = time.time()
+
+    def observe(self, name, seconds):
+        """记录一次操作耗时，超过阈值时写警告日志"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._timings.get(name)
+            if histogram is None:
+                histogram = self._timings[name] = Histogram(TIME_BOUNDS)
+            histogram.add(seconds)
+        threshold = self.thresholds.get(name, self.slow_threshold)
+        if seconds >= threshold:
+            self.count(f"{name}.slow")
+            logging.warning(f"慢操作: {name} 耗时 {seconds * 1000:.1f} ms")
+
+    def record(self, name, value):
+        """记录一个数值（字节数、行数等）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._values.get(name)
+            if histogram is None:
+                histogram = self._values[name] = Histogram(VALUE_BOUNDS)
+            histogram.add(value)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, name):
+        """计时一段代码"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """计时函数的装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._values.clear()
+            self._counters.clear()
+        self.started = time.time()
+
+    def snapshot(self):
+        """当前汇总数据（可以直接转成JSON）"""
+        with self._lock:
+            return {
+                "uptime": time.time() - self.started,
+                "timings": {name: h.summary() for name, h in sorted(self._timings.items())},
+                "values": {name: h.summary() for name, h in sorted(self._values.items())},
+                "counters": dict(sorted(self._counters.items()))
+            }
+
+    def report(self):
+        """汇总数据的文本表格，供诊断面板和命令行输出"""
+        data = self.snapshot()
+        lines = [f"运行时间: {data['uptime']:.0f} s", "",
+                 f"{'操作':<28}{'次数':>6}{'平均ms':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'最大':>8}"]
+        for name, s in data["timings"].items():
+            lines.append(f"{name:<30}{s['count']:>8}{s['mean'] * 1000:>10.2f}{s['p50'] * 1000:>9.2f}"
+                         f"{s['p90'] * 1000:>9.2f}{s['p99'] * 1000:>9.2f}{s['max'] * 1000:>10.2f}")
+        if data["values"]:
+            lines += ["", f"{'数值':<28}{'次数':>6}{'平均':>10}{'p50':>10}{'p99':>10}{'最大':>10}"]
+            for name, s in data["values"].items():
+                lines.append(f"{name:<30}{s['count']:>8}{s['mean']:>12.0f}{s['p50']:>10}"
+                             f"{s['p99']:>10}{s['max']:>12}")
+        if data["counters"]:
+            lines += ["", "计数器"]
+            for name, value in data["counters"].items():
+                lines.append(f"{name:<30}{value:>8}")
+        return "\n".join(lines)
+
+
+metrics = Metrics()
+
+_listener = None
+_handler = None
+
+
+def setup_logging(filename="data/todo_app.log", level=logging.INFO):
+    """把根日志器接到队列上，由后台线程写文件；重复调用无效果"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+    try:
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = logging.FileHandler(filename, encoding="utf-8")
+    except OSError as e:
+        print(f"无法打开日志文件: {e}", file=sys.stderr)
+        return
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    _handler = logging.handlers.QueueHandler(log_queue)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, file_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """写完队列中剩余的日志并停止后台线程"""
+    global _listener, _handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = _handler = None
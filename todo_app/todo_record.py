@@ -0,0 +1,206 @@
+from datetime import date, datetime, timedelta
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class CodeTable:
+    """字符串与小整数编号的双向映射，重复出现的取值只保存一份"""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.codes = {}
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        """取得（必要时登记）name的编号"""
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def name(self, code):
+        """按编号取回字符串"""
+        return self.names[code]
+
+
+PRIORITIES = CodeTable(("high", "normal", "low"))
+CATEGORIES = CodeTable(("默认", "📁 默认", "💼 工作", "🏠 生活", "📚 学习"))
+
+
+class TodoRecord:
+    """紧凑的任务记录
+
+    用__slots__代替dict保存字段：优先级和分类存为CodeTable中的编号，
+    创建时间存为整数秒，截止日期存为date的序数。对外仍然可以像dict一样
+    用todo["content"]、todo.get("due_date")读写，与JSON中的字段名一致；
+    JSON中无法识别的字段和无法解析的取值原样保存在extra里，保存时写回。
+    """
+
+    __slots__ = ("id", "content", "completed", "created", "due",
+                 "_priority", "_category", "extra")
+
+    FIELDS = ("id", "content", "completed", "create_time", "due_date", "priority", "category")
+
+    def __init__(self, id, content, completed=False, create_time=None, due_date=None,
+                 priority="normal", category="默认"):
+        self.id = id
+        self.content = content
+        self.completed = completed
+        self.extra = None
+        self.create_time = create_time
+        self.due_date = due_date
+        self.priority = priority
+        self.category = category
+
+    @classmethod
+    def from_dict(cls, data):
+        """从JSON字典创建记录"""
+        record = cls(
+            data.get("id"),
+            data.get("content", ""),
+            bool(data.get("completed", False)),
+            data.get("create_time"),
+            data.get("due_date"),
+            data.get("priority", "normal"),
+            data.get("category", "默认")
+        )
+        for key, value in data.items():
+            if key not in cls.FIELDS:
+                record[key] = value
+        return record
+
+    def to_dict(self):
+        """转换成与原JSON格式一致的字典"""
+        data = {key: getattr(self, key) for key in self.FIELDS}
+        if self.extra:
+            for key, value in self.extra.items():
+                data.setdefault(key, value)
+        return data
+
+    def snapshot(self):
+        """字段的副本（元组，复制很快），用于在锁外序列化"""
+        return (self.id, self.content, self.completed, self.created, self.due,
+                self._priority, self._category, dict(self.extra) if self.extra else None)
+
+    @classmethod
+    def snapshot_to_dict(cls, state):
+        """把snapshot()的结果转换成与to_dict()相同的字典"""
+        record = cls.__new__(cls)
+        (record.id, record.content, record.completed, record.created, record.due,
+         record._priority, record._category, record.extra) = state
+        return record.to_dict()
+
+    # ---- 以字符串形式读写的字段 ----
+
+    @property
+    def priority(self):
+        return PRIORITIES.name(self._priority)
+
+    @priority.setter
+    def priority(self, value):
+        self._priority = PRIORITIES.code(value)
+
+    @property
+    def category(self):
+        return CATEGORIES.name(self._category)
+
+    @category.setter
+    def category(self, value):
+        self._category = CATEGORIES.code(value)
+
+    @property
+    def create_time(self):
+        if self.created is None:
+            return self._raw("create_time")
+        return (_EPOCH + timedelta(seconds=self.created)).isoformat(" ")
+
+    @create_time.setter
+    def create_time(self, value):
+        self._drop_raw("create_time")
+        try:
+            self.created = int((datetime.fromisoformat(value) - _EPOCH).total_seconds())
+        except (TypeError, ValueError):
+            self.created = None
+        # 只有能原样写回的"YYYY-MM-DD HH:MM:SS"才存成整数，其他写法（带T、小数秒、只有日期）保留原文
+        if self.created is not None and self.create_time != value:
+            self.created = None
+        if self.created is None and value is not None:
+            self._set_raw("create_time", value)
+
+    @property
+    def due_date(self):
+        if self.due is None:
+            return self._raw("due_date")
+        return date.fromordinal(self.due).isoformat()
+
+    @due_date.setter
+    def due_date(self, value):
+        self._drop_raw("due_date")
+        if isinstance(value, date):
+            self.due = value.toordinal()
+            return
+        try:
+            self.due = date.fromisoformat(value).toordinal() if len(value) == 10 else None
+        except (TypeError, ValueError):
+            self.due = None
+        if self.due is None and value is not None:
+            self._set_raw("due_date", value)
+
+    @property
+    def due_day(self):
+        """截止日期(date)，没有或无效时为None"""
+        return None if self.due is None else date.fromordinal(self.due)
+
+    # ---- 兼容dict的访问方式 ----
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        elif value is None:
+            self._drop_raw(key)
+        else:
+            self._set_raw(key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS or bool(self.extra and key in self.extra)
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return self.extra.get(key, default) if self.extra else default
+
+    def update(self, fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def __repr__(self):
+        return f"TodoRecord({self.to_dict()!r})"
+
+    # ---- extra ----
+
+    def _raw(self, key):
+        return self.extra.get(key) if self.extra else None
+
+    def _set_raw(self, key, value):
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def _drop_raw(self, key):
+        if self.extra:
+            self.extra.pop(key, None)
+            if not self.extra:
+                self.extra = None
@@ -0,0 +1,305 @@
+"""重复任务
+
+重复规则只保存一次（与数据文件同目录的 *.recurring.json），不按每次重复生成任务记录：
+某个日期范围内的各次重复由生成器按需算出（日历的可见月份、列表的日期筛选、
+提醒的预读范围），只有被标记完成或删除的那几次作为例外记录在规则里。
+单次重复的ID是 "规则ID@YYYY-MM-DD"，可以像普通任务一样完成、删除。
+"""
+import calendar
+import json
+import sys
+import threading
+import uuid
+from datetime import date, timedelta
+
+from todo_index import parse_date
+from todo_search import normalize
+from todo_storage import FileLock, atomic_write, file_signature
+
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+SEPARATOR = "@"
+
+
+def occurrence_id(rule_id, day):
+    """单次重复的ID"""
+    return f"{rule_id}{SEPARATOR}{day.isoformat()}"
+
+
+def split_occurrence_id(todo_id):
+    """拆分单次重复的ID，返回 (规则ID, date)；不是单次重复的ID时返回None"""
+    if not isinstance(todo_id, str) or SEPARATOR not in todo_id:
+        return None
+    rule_id, _, day = todo_id.rpartition(SEPARATOR)
+    day = parse_date(day)
+    return (rule_id, day) if day is not None else None
+
+
+def _add_months(start, months):
+    """start之后第months个月的同一天，当月没有这一天时取月末"""
+    year, month = divmod(start.year * 12 + start.month - 1 + months, 12)
+    month += 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+class RecurrenceRule:
+    """一条重复规则
+
+    freq为 daily / weekly / monthly / yearly，每interval个周期重复一次；
+    weekly可以用weekdays指定星期几（0为星期一），默认与开始日期相同；
+    monthly / yearly按开始日期的日数重复，当月没有这一天时取月末。
+    done和skipped是已完成和已删除的那几次的日期（稀疏的例外）。
+    """
+
+    __slots__ = ("id", "content", "freq", "interval", "start", "until", "weekdays",
+                 "priority", "category", "done", "skipped")
+
+    def __init__(self, id, content, freq, start, interval=1, weekdays=None, until=None,
+                 priority="normal", category="默认", done=(), skipped=()):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"不支持的重复频率: {freq}")
+        self.start = parse_date(start)
+        if self.start is None:
+            raise ValueError(f"开始日期无效: {start}")
+        if int(interval) < 1:
+            raise ValueError(f"重复间隔必须大于0: {interval}")
+        self.id = id
+        self.content = content
+        self.freq = freq
+        self.interval = int(interval)
+        self.until = parse_date(until)
+        weekdays = sorted({int(day) for day in weekdays}) if weekdays else []
+        if any(not 0 <= day <= 6 for day in weekdays):
+            raise ValueError(f"星期几应为0到6: {weekdays}")
+        self.weekdays = weekdays or [self.start.weekday()]
+        self.priority = priority
+        self.category = category
+        self.done = {parse_date(day) for day in done} - {None}
+        self.skipped = {parse_date(day) for day in skipped} - {None}
+
+    def occurrences(self, start, end):
+        """按日期顺序生成[start, end]内各次重复的日期（不含已删除的）
+
+        直接算出start附近的第一次重复，与规则已经持续了多久无关。
+        """
+        start = max(start, self.start)
+        if self.until is not None:
+            end = min(end, self.until)
+        if start > end:
+            return
+        if self.freq == "daily":
+            n = -(-(start - self.start).days // self.interval)
+            day = self.start + timedelta(days=n * self.interval)
+            while day <= end:
+                if day not in self.skipped:
+                    yield day
+                day += timedelta(days=self.interval)
+        elif self.freq == "weekly":
+            first_monday = self.start - timedelta(days=self.start.weekday())
+            weeks = (start - first_monday).days // 7
+            monday = first_monday + timedelta(weeks=weeks - weeks % self.interval)
+            while monday <= end:
+                for weekday in self.weekdays:
+                    day = monday + timedelta(days=weekday)
+                    if start <= day <= end and day not in self.skipped:
+                        yield day
+                monday += timedelta(weeks=self.interval)
+        else:
+            step = self.interval * (12 if self.freq == "yearly" else 1)
+            n = ((start.year - self.start.year) * 12 + start.month - self.start.month) // step
+            day = _add_months(self.start, n * step)
+            while day <= end:
+                if day >= start and day not in self.skipped:
+                    yield day
+                n += 1
+                day = _add_months(self.start, n * step)
+
+    def occurs_on(self, day):
+        """day是否有一次（未删除的）重复"""
+        return next(self.occurrences(day, day), None) == day
+
+    def occurrence(self, day):
+        """单次重复，字段与普通任务一致，另有rule字段指向规则"""
+        return {
+            "id": occurrence_id(self.id, day),
+            "content": self.content,
+            "completed": day in self.done,
+            "create_time": None,
+            "due_date": day.isoformat(),
+            "priority": self.priority,
+            "category": self.category,
+            "rule": self.id
+        }
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "content": self.content,
+            "freq": self.freq,
+            "interval": self.interval,
+            "start": self.start.isoformat(),
+            "until": self.until.isoformat() if self.until else None,
+            "weekdays": self.weekdays,
+            "priority": self.priority,
+            "category": self.category,
+            "done": sorted(day.isoformat() for day in self.done),
+            "skipped": sorted(day.isoformat() for day in self.skipped)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: data[key] for key in cls.__slots__ if key in data})
+
+
+class RecurrenceStore:
+    """全部重复规则，保存在一个很小的JSON文件中
+
+    修改只在内存中进行并记下改过的规则，由flush()（在后台保存线程中）整体原子写入，
+    连续勾选多次重复只写一次文件。写入时持有自己的文件锁，先读入其他进程的修改，
+    再按规则覆盖本进程改过的部分，因此不需要和任务数据共用锁。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rules = {}  # 规则ID -> RecurrenceRule
+        self._dirty = {}  # 尚未写入文件的修改：规则ID -> 规则（已删除时为None）
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(f"{path}.lock")
+        self._state = None
+        self.reload()
+
+    def changed(self):
+        """文件是否被其他进程修改过（只比较文件状态）"""
+        return file_signature(self.path) != self._state
+
+    def reload(self):
+        """重新读取规则文件，本进程尚未写入的修改保留在上面"""
+        with self._lock:
+            state = file_signature(self.path)
+            rules = {}
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for data in json.load(f):
+                        rule = RecurrenceRule.from_dict(data)
+                        rules[rule.id] = rule
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, TypeError) as e:
+                print(f"读取重复任务时出错: {e}", file=sys.stderr)
+                return
+            for rule_id, rule in self._dirty.items():
+                if rule is None:
+                    rules.pop(rule_id, None)
+                else:
+                    rules[rule_id] = rule
+            self.rules = rules
+            self._state = state
+
+    def _modify(self, rule_id, change):
+        """先读入其他进程的修改，再执行change并记下改过的规则，返回change的结果"""
+        with self._lock:
+            if self.changed():
+                self.reload()
+            result = change()
+            if result is not None:
+                self._dirty[rule_id] = self.rules.get(rule_id)
+            return result
+
+    def flush(self):
+        """把积压的修改写入规则文件，没有修改时直接返回"""
+        with self._lock:
+            if not self._dirty:
+                return
+        try:
+            with self._file_lock:
+                with self._lock:
+                    if self.changed():
+                        self.reload()
+                    dirty, self._dirty = self._dirty, {}
+                    data = json.dumps([rule.to_dict() for rule in self.rules.values()],
+                                      ensure_ascii=False, indent=2).encode('utf-8')
+                try:
+                    atomic_write(self.path, data)
+                except OSError:
+                    # 没写进去的修改留到下次，期间又改过的规则以新的为准
+                    with self._lock:
+                        self._dirty = dict(dirty, **self._dirty)
+                    raise
+                self._state = file_signature(self.path)
+        except OSError as e:
+            print(f"保存重复任务时出错: {e}", file=sys.stderr)
+
+    def add(self, rule):
+        """加入一条规则，没有ID时分配一个"""
+        rule.id = rule.id or uuid.uuid4().hex
+
+        def change():
+            self.rules[rule.id] = rule
+            return rule
+        return self._modify(rule.id, change)
+
+    def remove(self, rule_id):
+        """删除规则，返回被删除的规则，不存在时返回None"""
+        return self._modify(rule_id, lambda: self.rules.pop(rule_id, None))
+
+    def get(self, rule_id):
+        return self.rules.get(rule_id)
+
+    def occurrences(self, start, end, query="", category=None, priority=None, completed=None):
+        """[start, end]内符合条件的各次重复，返回按日期排序的 [(date, 单次重复)]"""
+        start, end = parse_date(start), parse_date(end)
+        terms = normalize(query).split()
+        items = []
+        with self._lock:
+            for rule in self.rules.values():
+                if category is not None and rule.category != category:
+                    continue
+                if priority is not None and rule.priority != priority:
+                    continue
+                if terms and not all(term in normalize(rule.content) for term in terms):
+                    continue
+                for day in rule.occurrences(start, end):
+                    if completed is None or (day in rule.done) == completed:
+                        items.append((day, rule.occurrence(day)))
+        items.sort(key=lambda item: item[0])
+        return items
+
+    def get_occurrence(self, todo_id):
+        """按ID取单次重复，ID无效、该日没有重复或已删除时返回None"""
+        parts = split_occurrence_id(todo_id)
+        if parts is None:
+            return None
+        rule = self.rules.get(parts[0])
+        if rule is None or not rule.occurs_on(parts[1]):
+            return None
+        return rule.occurrence(parts[1])
+
+    def set_exception(self, todo_id, completed=None, skipped=None):
+        """修改单次重复的完成/删除状态，返回修改前的 {字段: 取值}，不存在时返回None"""
+        parts = split_occurrence_id(todo_id)
+        if parts is None:
+            return None
+        rule_id, day = parts
+
+        def change():
+            rule = self.rules.get(rule_id)
+            if rule is None or (day not in rule.skipped and not rule.occurs_on(day)):
+                return None
+            old = {}
+            for field, value, days in (("completed", completed, rule.done),
+                                       ("skipped", skipped, rule.skipped)):
+                if value is None:
+                    continue
+                old[field] = day in days
+                if value:
+                    days.add(day)
+                else:
+                    days.discard(day)
+            return old
+        return self._modify(rule_id, change)
+
+    def matches_query(self, todo_id, query):
+        """单次重复的内容是否匹配搜索关键词"""
+        todo = self.get_occurrence(todo_id)
+        content = normalize(todo["content"]) if todo else ""
+        return todo is not None and all(term in content for term in normalize(query).split())
@@ -0,0 +1,221 @@
+"""截止日期提醒
+
+未完成且有截止日期的任务按提醒时间放在最小堆里，只需要等到堆顶的时间：
+任务增删改时按变更通知增量调整（O(log n)），不定时扫描全部任务。
+修改提醒时间时不从堆里删除旧条目，只更新 ID -> 提醒时间 的映射，
+旧条目弹出时发现和映射不一致就丢掉（延迟删除）。
+已经提醒过的 (任务ID, 提醒时间) 记录下来，之后修改内容等不改截止日期的变更不会再次提醒。
+重复任务只生成今后LOOKAHEAD_DAYS天内的各次重复，每天第一次检查时重建一次。
+"""
+import heapq
+import itertools
+import threading
+from datetime import date, datetime, time, timedelta
+
+from todo_index import parse_date
+
+
+REMIND_TIME = time(9, 0)  # 截止当天的提醒时间
+MAX_SLEEP = 600           # 最长一次等待（秒），系统休眠、调整时钟后也能及时醒来
+LOOKAHEAD_DAYS = 7        # 重复任务预先生成的天数（不含提前提醒的天数）
+
+
+class ReminderScheduler:
+    """提醒调度器
+
+    callback(todos)在提醒时间到达时被调用，同一时刻到期的任务一起传入。
+    两种驱动方式：
+        attach_tk(root)  图形界面用一个after()定时器，变更通知需由界面在主线程转给on_event()
+        run(...)         命令行在当前线程阻塞运行，自己注册数据变更通知
+    启动时已经过了提醒时间、但截止日期是今天或以后的任务立即提醒，更早的逾期任务不再提醒。
+    """
+
+    def __init__(self, todo_data, callback, lead_days=0, remind_time=REMIND_TIME):
+        self.todo_data = todo_data
+        self.callback = callback
+        self.lead = timedelta(days=lead_days)
+        self.remind_time = remind_time
+        self._heap = []        # (提醒时间, 序号, 任务ID)
+        self._when = {}        # 任务ID -> 当前有效的提醒时间
+        self._fired = {}       # 任务ID -> 已经提醒过的提醒时间
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._cutoff = None    # 早于这个时间的提醒不再补发
+        self._built_on = None  # 上次重建的日期，跨天后重建以生成新的重复任务
+        self._root = None
+        self._job = None
+        self._job_time = None
+
+    # ---- 堆维护 ----
+
+    def remind_at(self, todo):
+        """任务的提醒时间，不需要提醒时为None"""
+        day = todo.due_day if hasattr(todo, "due_day") else parse_date(todo.get("due_date"))
+        if todo["completed"] or day is None:
+            return None
+        when = datetime.combine(day, self.remind_time) - self.lead
+        if when < self._cutoff:
+            return None
+        return when
+
+    def rebuild(self):
+        """从今天及以后到期的任务和预读范围内的重复任务重建堆（只在加载完成、整体替换和跨天时调用）
+
+        截止日期早于今天的任务不会再提醒，按日期索引只取今天以后的，不遍历全部任务。
+        """
+        today = date.today()
+        self._built_on = today
+        self._cutoff = datetime.combine(today, time(0)) - self.lead
+        todos = [todo for _, todo in self.todo_data.iter_dated_todos(today, None)]
+        todos += self.todo_data.get_occurrences(
+            today, today + self.lead + timedelta(days=LOOKAHEAD_DAYS))
+        with self._lock:
+            self._when = {}
+            self._fired = {todo_id: when for todo_id, when in self._fired.items()
+                           if when >= self._cutoff}
+            for todo in todos:
+                when = self.remind_at(todo)
+                if when is not None and self._fired.get(todo["id"]) != when:
+                    self._when[todo["id"]] = when
+            self._heap = [(when, next(self._seq), todo_id) for todo_id, when in self._when.items()]
+            heapq.heapify(self._heap)
+            self._wakeup.notify()
+        self._arm()
+
+    def schedule(self, todo):
+        """任务新增或修改后调整它的提醒"""
+        if self._cutoff is None:
+            return
+        when = self.remind_at(todo)
+        with self._lock:
+            todo_id = todo["id"]
+            if self._fired.get(todo_id) == when:
+                when = None  # 这个提醒时间已经提醒过
+            if self._when.get(todo_id) == when:
+                return
+            if when is None:
+                self._when.pop(todo_id, None)
+                return
+            self._when[todo_id] = when
+            heapq.heappush(self._heap, (when, next(self._seq), todo_id))
+            # 失效条目太多时压缩一次，堆的大小保持在有效条目数的常数倍
+            if len(self._heap) > 2 * len(self._when) + 64:
+                self._heap = [entry for entry in self._heap if self._when.get(entry[2]) == entry[0]]
+                heapq.heapify(self._heap)
+            if self._heap[0][2] == todo_id:
+                self._wakeup.notify()
+        self._arm()
+
+    def cancel(self, todo_id):
+        """任务删除后取消提醒（堆中的条目延迟删除）"""
+        with self._lock:
+            self._when.pop(todo_id, None)
+
+    def on_event(self, event, todo):
+        """数据变更通知：增量调整堆"""
+        if event == "reset":
+            self.rebuild()
+        elif event == "delete":
+            self.cancel(todo["id"])
+        elif event in ("add", "update"):
+            self.schedule(todo)
+
+    def _top(self):
+        """丢掉失效的堆顶条目，返回最早的有效条目，调用方需持有锁"""
+        while self._heap:
+            when, _, todo_id = self._heap[0]
+            if self._when.get(todo_id) == when:
+                return self._heap[0]
+            heapq.heappop(self._heap)
+        return None
+
+    def next_time(self):
+        """下一次提醒的时间，没有时为None"""
+        with self._lock:
+            top = self._top()
+        return top[0] if top else None
+
+    def pop_due(self, now=None):
+        """弹出所有已到时间的提醒，返回对应的任务"""
+        now = now or datetime.now()
+        due = []
+        with self._lock:
+            while True:
+                top = self._top()
+                if top is None or top[0] > now:
+                    break
+                heapq.heappop(self._heap)
+                del self._when[top[2]]
+                self._fired[top[2]] = top[0]
+                due.append(top[2])
+        todos = [self.todo_data.get_todo(todo_id) for todo_id in due]
+        return [todo for todo in todos if todo is not None]
+
+    def fire(self, now=None):
+        """提醒所有已到时间的任务"""
+        if self._built_on is not None and self._built_on != date.today():
+            self.rebuild()
+        todos = self.pop_due(now)
+        if todos:
+            self.callback(todos)
+        return todos
+
+    def pending(self):
+        """等待提醒的任务数"""
+        with self._lock:
+            return len(self._when)
+
+    # ---- 图形界面驱动 ----
+
+    def attach_tk(self, root):
+        """用Tk的after()等待下一次提醒"""
+        self._root = root
+        if self.todo_data.loaded:
+            self.rebuild()
+
+    def _arm(self):
+        """堆顶变化后重新设置after()定时器（始终只有一个）"""
+        if self._root is None:
+            return
+        when = self.next_time()
+        if when == self._job_time and self._job is not None:
+            return
+        if self._job is not None:
+            self._root.after_cancel(self._job)
+            self._job = None
+        self._job_time = when
+        if when is None:
+            return
+        delay = min(max(0, (when - datetime.now()).total_seconds()), MAX_SLEEP)
+        self._job = self._root.after(int(delay * 1000), self._on_timer)
+
+    def _on_timer(self):
+        self._job = None
+        self._job_time = None
+        self.fire()
+        self._arm()
+
+    # ---- 命令行驱动 ----
+
+    def run(self, check_interval=1.0, stop=None):
+        """在当前线程等待并发出提醒，直到stop事件被设置
+
+        每check_interval秒检查一次其他进程对数据文件的修改（只比较文件状态），
+        变更通过数据层的通知增量进入堆。
+        """
+        stop = stop or threading.Event()
+        self.todo_data.add_listener(self.on_event)
+        try:
+            self.rebuild()
+            while not stop.is_set():
+                self.fire()
+                with self._lock:
+                    top = self._top()
+                    delay = check_interval
+                    if top is not None:
+                        delay = min(delay, max(0, (top[0] - datetime.now()).total_seconds()))
+                    self._wakeup.wait(delay)
+                self.todo_data.check_external_changes()
+        finally:
+            self.todo_data.remove_listener(self.on_event)
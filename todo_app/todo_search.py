@@ -0,0 +1,137 @@
+from array import array
+
+
+def normalize(text):
+    """统一大小写，用于建索引和查询"""
+    return (text or "").casefold()
+
+
+def bigrams(text):
+    """把文本切成相邻两个字符的片段
+
+    按字符而不是按词切分，中文不需要分词也能检索，英文同样适用。
+    """
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class SearchIndex:
+    """任务内容的倒排索引：二元字符片段 -> 槽位号列表
+
+    每个任务占一个整数槽位，倒排表是按槽位递增的array('I')，每项只占4字节，
+    比保存任务ID字符串的集合小得多。查询时取各关键词片段中最短的倒排表作为候选，
+    再用子串匹配确认，最后按匹配位置和内容长度排序。单个字符的查询没有二元片段可用，
+    直接扫描已规范化的文本。
+    删除和修改只把旧槽位标记为空（倒排表中的旧项在查询时跳过），
+    空槽位多于有效槽位时整体重建一次。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """清空索引"""
+        self._postings = {}  # 片段 -> array('I')，槽位递增
+        self._slots = {}     # 任务ID -> 槽位
+        self._ids = []       # 槽位 -> 任务ID，空槽位为None
+        self._texts = []     # 槽位 -> 规范化后的内容，空槽位为None
+        self._free = 0       # 空槽位数
+
+    def add(self, todo_id, text):
+        """为任务建立索引（已有索引时先移除）"""
+        if todo_id in self._slots:
+            self.remove(todo_id)
+        normalized = normalize(text)
+        # 规范化没有改变内容时直接引用原字符串，不另存一份
+        text = text if normalized == text else normalized
+        slot = len(self._ids)
+        self._slots[todo_id] = slot
+        self._ids.append(todo_id)
+        self._texts.append(text)
+        for gram in bigrams(text):
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array('I')
+            posting.append(slot)
+
+    def remove(self, todo_id):
+        """移除任务的索引"""
+        slot = self._slots.pop(todo_id, None)
+        if slot is None:
+            return
+        self._ids[slot] = None
+        self._texts[slot] = None
+        self._free += 1
+        if self._free > max(1024, len(self._slots)):
+            self._compact()
+
+    def update(self, todo_id, text):
+        """内容变化后重建该任务的索引"""
+        slot = self._slots.get(todo_id)
+        if slot is not None and self._texts[slot] == normalize(text):
+            return
+        self.add(todo_id, text)
+
+    def _compact(self):
+        """按有效槽位的顺序重建索引，去掉空槽位和倒排表中的旧项"""
+        items = [(todo_id, text) for todo_id, text in zip(self._ids, self._texts) if todo_id is not None]
+        self.clear()
+        for todo_id, text in items:
+            self.add(todo_id, text)
+
+    def matches(self, todo_id, query):
+        """任务是否匹配查询中的全部关键词"""
+        slot = self._slots.get(todo_id)
+        if slot is None:
+            return False
+        text = self._texts[slot]
+        return all(term in text for term in normalize(query).split())
+
+    def _candidates(self, terms):
+        """各关键词片段中最短的倒排表；没有二元片段（都是单个字符）时返回None"""
+        best = None
+        for term in terms:
+            for gram in bigrams(term):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    return ()
+                if best is None or len(posting) < len(best):
+                    best = posting
+        return best
+
+    def search(self, query, candidates=None):
+        """返回按相关度排序的任务ID列表
+
+        query按空白拆成多个关键词，全部命中才算匹配；
+        candidates不为None时只在这些ID中查找（用于和其他筛选条件组合）。
+        """
+        terms = normalize(query).split()
+        if not terms:
+            return []
+
+        slots = self._candidates(terms)
+        if candidates is not None and (slots is None or len(candidates) < len(slots)):
+            # 其他筛选条件剩下的更少时，直接逐个确认
+            slots = [self._slots[todo_id] for todo_id in candidates if todo_id in self._slots]
+            candidates = None
+        elif slots is None:
+            slots = range(len(self._ids))
+        elif candidates is not None and not isinstance(candidates, (set, dict)):
+            candidates = set(candidates)
+
+        results = []
+        joined = " ".join(terms)
+        for slot in slots:
+            text = self._texts[slot]
+            if text is None:
+                continue
+            positions = [text.find(term) for term in terms]
+            if min(positions) < 0:
+                continue
+            todo_id = self._ids[slot]
+            if candidates is not None and todo_id not in candidates:
+                continue
+            # 完全相同的排最前，其次是匹配位置越靠前、内容越短的
+            exact = 0 if text == joined else 1
+            results.append(((exact, sum(positions), len(text)), todo_id))
+        results.sort(key=lambda item: item[0])
+        return [todo_id for _, todo_id in results]
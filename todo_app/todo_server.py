@@ -0,0 +1,337 @@
+"""本地HTTP/JSON接口服务（asyncio + 标准库）
+
+多个工具可以同时读写同一份任务数据：
+    GET    /todos?offset=0&limit=50&q=&category=&priority=&completed=&due_from=&due_to=
+    GET    /todos/<id>
+    POST   /todos                {"content": ..., "due_date": ..., "priority": ..., "category": ...}
+    PATCH  /todos/<id>           {"content": ..., "completed": ..., ...}
+    POST   /todos/<id>/toggle
+    DELETE /todos/<id>
+    GET    /stats                数量、逾期/到期数，按分类和优先级的数量
+    GET    /metrics              各操作的耗时分布和计数器
+
+读请求直接在事件循环里查询内存索引；写请求交给唯一的写入线程按到达顺序执行，
+事件循环只等待结果，不执行修改本身；写盘交给TodoData的后台保存线程。
+其他进程对数据文件的修改每秒检查一次，同样在写入线程中合并进来。
+"""
+import asyncio
+import functools
+import json
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from todo_index import parse_date
+from todo_metrics import metrics
+
+
+UPDATABLE = ("content", "completed", "due_date", "priority", "category")
+MAX_PAGE_SIZE = 500
+MAX_BODY_SIZE = 1 << 20
+EXTERNAL_CHECK_INTERVAL = 1.0  # 检查其他进程修改的间隔（秒）
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    """返回给客户端的错误"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _todo_json(todo):
+    return todo.to_dict() if hasattr(todo, "to_dict") else todo
+
+
+def _int_param(params, name, default, minimum=0, maximum=None):
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"参数 {name} 必须是整数")
+    if value < minimum:
+        raise HttpError(400, f"参数 {name} 不能小于 {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+
+FIELD_TYPES = {"content": str, "completed": bool, "priority": str, "category": str}
+
+
+def _check_fields(data):
+    """校验请求体中各字段的类型，不合法时抛出400"""
+    for name, value in data.items():
+        if name == "due_date":
+            if value is not None and not isinstance(value, str):
+                raise HttpError(400, "截止日期必须是字符串或null")
+            if value and parse_date(value) is None:
+                raise HttpError(400, "截止日期格式错误")
+        elif name in FIELD_TYPES and not isinstance(value, FIELD_TYPES[name]):
+            raise HttpError(400, f"字段 {name} 类型错误")
+    if "content" in data and not data["content"].strip():
+        raise HttpError(400, "缺少任务内容")
+
+
+def _date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise HttpError(400, f"参数 {name} 日期格式错误")
+    return day
+
+
+class TodoServer:
+    """把TodoData的增删改查暴露为JSON接口"""
+
+    def __init__(self, todo_data, host="127.0.0.1", port=8765):
+        self.todo_data = todo_data
+        self.host = host
+        self.port = port
+        self._writer = None   # 只有一个线程的执行器，修改按提交顺序逐个执行
+        self._server = None
+        self._watch_task = None
+
+    async def start(self):
+        """启动监听和写入线程"""
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="todo-writer")
+        self._watch_task = asyncio.create_task(self._watch_loop())
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info(f"接口服务启动: http://{self.host}:{self.port}")
+
+    async def serve_forever(self):
+        """运行到收到SIGINT/SIGTERM为止，退出前保存数据"""
+        await self.start()
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows不支持，Ctrl+C由serve()处理
+        try:
+            await stopping.wait()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """停止接收请求，处理完队列中的写请求后保存数据"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+        if self._writer is not None:
+            # 排在已提交的修改之后保存，再关闭写入线程
+            await self._write(self.todo_data.flush)
+            self._writer.shutdown()
+            self._writer = None
+        else:
+            self.todo_data.flush()
+
+    # ---- 写入 ----
+
+    async def _write(self, func, *args, **kwargs):
+        """把一次修改交给写入线程，等待执行结果"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._writer, functools.partial(func, *args, **kwargs))
+
+    async def _watch_loop(self):
+        """定时合并其他进程（GUI、命令行）写入的修改，和写请求一样在写入线程中执行"""
+        while True:
+            await asyncio.sleep(EXTERNAL_CHECK_INTERVAL)
+            try:
+                await self._write(self.todo_data.check_external_changes)
+            except Exception as e:
+                logging.error(f"检查外部修改时出错: {e}")
+
+    # ---- HTTP ----
+
+    async def _handle_client(self, reader, writer):
+        """处理一个连接上的请求（支持keep-alive）"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "Content-Length无效"}, close=True)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {"error": "请求体过大"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                start = time.perf_counter()
+                status, payload = await self._dispatch(method, target, body)
+                metrics.observe(f"http.{method}", time.perf_counter() - start)
+                if status >= 400:
+                    metrics.count(f"http.{status}")
+                connection = headers.get("connection", "").lower()
+                close = connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive")
+                await self._respond(writer, status, payload, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, close=False):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+
+    async def _dispatch(self, method, target, body):
+        """按路径分发请求，返回 (状态码, JSON对象)"""
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            data = json.loads(body.decode("utf-8")) if body else {}
+            if not isinstance(data, dict):
+                raise HttpError(400, "请求体必须是JSON对象")
+
+            if parts == ["stats"]:
+                if method == "GET":
+                    return 200, self._stats()
+            elif parts == ["metrics"]:
+                if method == "GET":
+                    return 200, metrics.snapshot()
+            elif parts == ["todos"]:
+                if method == "GET":
+                    return 200, self._list(params)
+                if method == "POST":
+                    return 201, await self._add(data)
+            elif len(parts) == 2 and parts[0] == "todos":
+                todo_id = parts[1]
+                if method == "GET":
+                    return 200, self._get(todo_id)
+                if method == "DELETE":
+                    return 200, await self._write(self._delete, todo_id)
+                if method == "PATCH":
+                    return 200, await self._write(self._update, todo_id, data)
+            elif len(parts) == 3 and parts[0] == "todos" and parts[2] == "toggle":
+                if method == "POST":
+                    return 200, await self._write(self._toggle, parts[1])
+            else:
+                raise HttpError(404, "接口不存在")
+            raise HttpError(405, "不支持的请求方法")
+        except HttpError as e:
+            return e.status, {"error": e.message}
+        except ValueError as e:
+            return 400, {"error": f"请求格式错误: {e}"}
+        except Exception as e:
+            logging.error(f"处理请求 {method} {target} 时出错: {e}")
+            return 500, {"error": "服务器内部错误"}
+
+    # ---- 接口实现 ----
+
+    def _stats(self):
+        return self.todo_data.get_summary()
+
+    def _list(self, params):
+        """分页查询：多取一条判断是否还有下一页，不必数出全部匹配数量"""
+        offset = _int_param(params, "offset", 0)
+        limit = _int_param(params, "limit", 50, minimum=1, maximum=MAX_PAGE_SIZE)
+        completed = params.get("completed")
+        if completed is not None:
+            completed = completed.lower() in ("1", "true", "yes")
+        todos = self.todo_data.search(
+            params.get("q", ""),
+            category=params.get("category") or None,
+            priority=params.get("priority") or None,
+            start=_date_param(params, "due_from"),
+            end=_date_param(params, "due_to"),
+            completed=completed,
+            limit=offset + limit + 1
+        )
+        items = todos[offset:offset + limit]
+        has_more = len(todos) > offset + limit
+        return {
+            "offset": offset,
+            "limit": limit,
+            "items": [_todo_json(todo) for todo in items],
+            "next_offset": offset + limit if has_more else None
+        }
+
+    def _get(self, todo_id):
+        todo = self.todo_data.get_todo(todo_id)
+        if todo is None:
+            raise HttpError(404, "任务不存在")
+        return _todo_json(todo)
+
+    async def _add(self, data):
+        if not isinstance(data.get("content"), str):
+            raise HttpError(400, "缺少任务内容")
+        _check_fields(data)
+        content = data["content"]
+        due_date = data.get("due_date")
+        todo_id = await self._write(
+            self.todo_data.add_todo,
+            content.strip(),
+            due_date=due_date or None,
+            priority=data.get("priority", "normal"),
+            category=data.get("category", "默认")
+        )
+        return {"id": todo_id}
+
+    def _delete(self, todo_id):
+        if self.todo_data.get_todo(todo_id) is None:
+            raise HttpError(404, "任务不存在")
+        self.todo_data.delete_todo(todo_id)
+        return {"id": todo_id, "deleted": True}
+
+    def _toggle(self, todo_id):
+        if self.todo_data.get_todo(todo_id) is None:
+            raise HttpError(404, "任务不存在")
+        self.todo_data.toggle_complete(todo_id)
+        return self._get(todo_id)
+
+    def _update(self, todo_id, data):
+        unknown = set(data) - set(UPDATABLE)
+        if unknown:
+            raise HttpError(400, f"不能修改的字段: {', '.join(sorted(unknown))}")
+        _check_fields(data)
+        if not self.todo_data.update_todo(todo_id, **data):
+            raise HttpError(404, "任务不存在")
+        return self._get(todo_id)
+
+
+def serve(todo_data, host="127.0.0.1", port=8765):
+    """运行接口服务直到被中断"""
+    server = TodoServer(todo_data, host, port)
+    print(f"接口服务: http://{host}:{port}  (Ctrl+C 退出)", flush=True)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
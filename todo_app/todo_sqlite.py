@@ -0,0 +1,785 @@
+import functools
+import heapq
+import os
+import sqlite3
+from datetime import datetime, date, timedelta
+import logging
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from todo_backup import BackupManager
+from todo_history import HISTORY_LIMIT, History
+from todo_index import parse_date
+from todo_io import content_key, iter_todo_file, validate_todo, write_todo_file
+from todo_metrics import metrics
+from todo_recurrence import RecurrenceRule, RecurrenceStore, split_occurrence_id
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS todos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT,
+    content TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    create_time TEXT,
+    due_date TEXT,
+    priority TEXT NOT NULL DEFAULT 'normal',
+    category TEXT NOT NULL DEFAULT '默认'
+);
+CREATE INDEX IF NOT EXISTS idx_todos_due_date ON todos(due_date);
+CREATE INDEX IF NOT EXISTS idx_todos_category ON todos(category);
+CREATE INDEX IF NOT EXISTS idx_todos_priority ON todos(priority);
+CREATE INDEX IF NOT EXISTS idx_todos_completed ON todos(completed);
+"""
+
+UPDATABLE = ("content", "completed", "due_date", "priority", "category")
+
+COLUMNS = "uid, content, completed, create_time, due_date, priority, category"
+
+
+def _date_str(value):
+    """把date对象或字符串统一成YYYY-MM-DD"""
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+def _row_to_todo(row):
+    """把数据库行转换成与JSON格式一致的字典"""
+    return {
+        "id": row[0],
+        "content": row[1],
+        "completed": bool(row[2]),
+        "create_time": row[3],
+        "due_date": row[4],
+        "priority": row[5],
+        "category": row[6]
+    }
+
+
+def _locked(method):
+    """在存储锁内执行；连接由多个线程共用（如接口服务的写入线程和事件循环）"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SqliteTodoData:
+    """基于sqlite3的数据管理器，公开方法与TodoData保持一致
+
+    due_date、category、priority和completed列都建有索引，
+    按日期、分类筛选和统计都交给数据库完成；JSON文件只用于导入导出。
+    """
+
+    def __init__(self, filename="data/todos.db", json_filename=None,
+                 history_limit=HISTORY_LIMIT):
+        """初始化数据管理器（撤销/重做历史保存在数据库旁边）
+
+        json_filename是首次创建数据库时迁移的旧JSON文件，默认为数据库同名的 .json 文件；
+        传入空字符串则不迁移。
+        """
+        self.filename = filename
+        if json_filename is None:
+            json_filename = os.path.splitext(filename)[0] + ".json"
+        self.json_filename = json_filename
+        self._ensure_data_dir()
+        is_new = not os.path.exists(self.filename)
+        self._lock = threading.RLock()  # 保护连接和批次状态，见_locked
+        self.conn = sqlite3.connect(self.filename, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._batch_depth = 0
+        self._batch_undo = []   # 批次中各修改的逆操作
+        self._batch_source = None  # 批次由撤销/重做产生时为 "undo" / "redo"
+        self._batch_event = None   # 批次只有一条修改时代替reset的通知 (event, todo)
+        # 历史和重复规则按完整文件名命名，不与JSON后端的 todos.history.jsonl 等共用
+        self.history = History(f"{filename}.history.jsonl", history_limit)
+        self.replay_skipped = 0  # 没有归档，撤销/重做不会跳过（与TodoData接口保持一致）
+        self._listeners = []
+        self._rules_changed = False  # 批次中是否修改过重复任务（不在数据库事务里）
+        self.recurring = RecurrenceStore(f"{filename}.recurring.json")
+        self.backups = BackupManager(os.path.join(os.path.dirname(filename), "backups", "sqlite"))
+        self._migrate_uids()
+        self.load_todos(migrate=is_new)
+        self._data_version = self._read_data_version()
+
+    def _ensure_data_dir(self):
+        """确保数据目录存在"""
+        directory = os.path.dirname(self.filename)
+        if directory:  # 只给出文件名时数据在当前目录
+            os.makedirs(directory, exist_ok=True)
+
+    def _migrate_uids(self):
+        """旧数据库补充uid列，并为缺少ID的行生成ID"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(todos)")]
+        if "uid" not in columns:
+            self.conn.execute("ALTER TABLE todos ADD COLUMN uid TEXT")
+        missing = self.conn.execute("SELECT id FROM todos WHERE uid IS NULL").fetchall()
+        self.conn.executemany(
+            "UPDATE todos SET uid = ? WHERE id = ?",
+            [(uuid.uuid4().hex, row[0]) for row in missing]
+        )
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_todos_uid ON todos(uid)")
+        self.conn.commit()
+
+    @metrics.timed("sqlite.load_todos")
+    @_locked
+    def load_todos(self, migrate=False):
+        """首次创建数据库时从旧的JSON文件迁移数据（迁移不记入撤销历史）"""
+        if migrate and self.json_filename and os.path.exists(self.json_filename):
+            self.import_todos(self.json_filename, undoable=False)
+
+    @_locked
+    def save_todos(self):
+        """提交未保存的修改（批次中推迟到批次结束）"""
+        if self._batch_depth:
+            return
+        try:
+            self.conn.commit()
+        except Exception as e:
+            print(f"保存数据时出错: {e}", file=sys.stderr)
+        self.recurring.flush()
+        self.history.flush()
+
+    def flush(self):
+        """提交未保存的修改（与TodoData接口保持一致）"""
+        self.save_todos()
+
+    @_locked
+    def close(self):
+        """提交修改并关闭数据库连接"""
+        self.save_todos()
+        self.conn.close()
+
+    @property
+    def loaded(self):
+        """数据库按需查询，不需要预先加载"""
+        return True
+
+    def wait_loaded(self, timeout=None):
+        """与TodoData接口保持一致"""
+        return True
+
+    @property
+    def save_state(self):
+        """每次修改都会立即提交，因此总是saved"""
+        return "saved"
+
+    def add_listener(self, callback):
+        """注册变更通知，callback(event, todo)，与TodoData相同"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """取消变更通知"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, event, todo=None):
+        """通知所有监听者（批次中的单条通知由批次结束时的reset代替）"""
+        if self._batch_depth:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(event, todo)
+            except Exception as e:
+                logging.error(f"变更通知处理出错: {e}")
+
+    def _read_data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @metrics.timed("sqlite.check_external_changes")
+    @_locked
+    def check_external_changes(self):
+        """其他进程提交过修改时发出reset通知
+
+        SQLite自己处理多进程的锁；PRAGMA data_version只在其他连接提交后变化，
+        检查一次只是一条很轻的查询。
+        """
+        self.history.refresh()
+        version = self._read_data_version()
+        rules_changed = self.recurring.changed()
+        if rules_changed:
+            self.recurring.reload()
+        if version == self._data_version and not rules_changed:
+            return False
+        self._data_version = version
+        self._notify("reset")
+        return True
+
+    def _query(self, where="", params=(), limit=None):
+        """按条件查询待办事项，保持插入顺序"""
+        sql = f"SELECT {COLUMNS} FROM todos {where} ORDER BY id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [_row_to_todo(row) for row in self.conn.execute(sql, params)]
+
+    @contextmanager
+    def batch(self):
+        """把多次修改放进同一个事务，结束时提交一次，出错时整体回滚
+
+        批次期间持有存储锁，其他线程看不到未提交的中间状态。
+        有修改时发出一次reset通知；只有一条修改并且登记了_batch_event时发出对应的单条通知。
+        """
+        with self._lock:
+            if not self._batch_depth:
+                self._batch_changes = self.conn.total_changes
+                self._rules_changed = False
+            self._batch_depth += 1
+            try:
+                yield self
+            except Exception:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self.conn.rollback()
+                    self._batch_undo = []
+                    self._batch_source = None
+                    self._batch_event = None
+                raise
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                event = ("reset", None)
+                if self._batch_event is not None and len(self._batch_undo) == 1:
+                    event = self._batch_event
+                self.history.record(self._batch_undo[::-1], self._batch_source)
+                self._batch_undo = []
+                self._batch_source = None
+                self._batch_event = None
+                self.save_todos()
+                if self.conn.total_changes != self._batch_changes or self._rules_changed:
+                    self._notify(*event)
+
+    @metrics.timed("sqlite.add_todo")
+    @_locked
+    def add_todo(self, content, due_date=None, priority="normal", category="默认"):
+        """添加新待办事项"""
+        try:
+            todo_id = uuid.uuid4().hex
+            self.conn.execute(
+                f"INSERT INTO todos ({COLUMNS}) VALUES (?, ?, 0, ?, ?, ?, ?)",
+                (todo_id, content, datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                 _date_str(due_date), priority, category)
+            )
+            self._record_undo({"op": "delete", "id": todo_id})
+            self.save_todos()
+            self._notify("add", self.get_todo(todo_id))
+            logging.info(f"添加新待办事项: {content}")
+            return todo_id
+        except Exception as e:
+            logging.error(f"添加待办事项时出错: {e}")
+            raise
+
+    @metrics.timed("sqlite.delete_todo")
+    @_locked
+    def delete_todo(self, todo_id):
+        """删除指定ID的待办事项"""
+        todo = self._delete(todo_id)
+        if todo is None:
+            return
+        self.save_todos()
+        self._notify("delete", todo)
+
+    @metrics.timed("sqlite.toggle_complete")
+    @_locked
+    def toggle_complete(self, todo_id):
+        """切换指定ID任务的完成状态"""
+        todo = self.get_todo(todo_id)
+        if todo is None or not self._update(todo_id, {"completed": not todo["completed"]}):
+            return
+        self.save_todos()
+        self._notify("update", self.get_todo(todo_id))
+
+    @metrics.timed("sqlite.update_todo")
+    @_locked
+    def update_todo(self, todo_id, **fields):
+        """修改指定ID任务的字段"""
+        if not self._update(todo_id, fields):
+            return False
+        self.save_todos()
+        self._notify("update", self.get_todo(todo_id))
+        return True
+
+    # ---- 批量操作：一个事务，一次提交，一次界面刷新，整体撤销 ----
+
+    @metrics.timed("sqlite.delete_many")
+    @_locked
+    def delete_many(self, todo_ids):
+        """删除多个任务，返回删除的数量"""
+        with self.batch():
+            return sum(1 for todo_id in todo_ids if self._delete(todo_id) is not None)
+
+    @metrics.timed("sqlite.set_completed_many")
+    @_locked
+    def set_completed_many(self, todo_ids, completed=True):
+        """把多个任务标记为完成或未完成，返回状态发生变化的数量"""
+        changed = 0
+        with self.batch():
+            for todo_id in todo_ids:
+                todo = self.get_todo(todo_id)
+                if todo is not None and todo["completed"] != bool(completed):
+                    self._update(todo_id, {"completed": completed})
+                    changed += 1
+        return changed
+
+    @metrics.timed("sqlite.update_many")
+    @_locked
+    def update_many(self, todo_ids, **fields):
+        """把多个任务的字段改成相同的值，返回修改的数量"""
+        with self.batch():
+            return sum(1 for todo_id in todo_ids if self._update(todo_id, fields))
+
+    # ---- 撤销 ----
+
+    @property
+    def can_undo(self):
+        """是否有可以撤销的修改"""
+        return self.history.can_undo
+
+    @property
+    def can_redo(self):
+        """是否有可以重做的修改"""
+        return self.history.can_redo
+
+    @_locked
+    def undo(self):
+        """撤销最近一组修改（批量操作、导入整体撤销），返回是否撤销了修改"""
+        return self._replay("undo")
+
+    @_locked
+    def redo(self):
+        """重做最近一次撤销的修改，返回是否重做了修改"""
+        return self._replay("redo")
+
+    def _replay(self, source):
+        """取出撤销栈或重做栈的一组逆操作并执行，执行时产生的逆操作进入另一个栈"""
+        ops = self.history.pop(source)
+        if not ops:
+            return False
+        self.apply_changes(ops, source)
+        return True
+
+    @_locked
+    def apply_changes(self, ops, source=None):
+        """在一个事务中执行一组变更记录，跳过已不存在的任务（操作类型与TodoData一致）"""
+        with self.batch():
+            if source is not None:
+                self._batch_source = source
+            todo = None
+            for op in ops:
+                if op["op"] == "add":
+                    if self.get_todo(op["todo"]["id"]) is None:
+                        self._insert(op["todo"])
+                        todo = self.get_todo(op["todo"]["id"])
+                elif op["op"] == "delete":
+                    todo = self._delete(op["id"])
+                elif op["op"] == "update":
+                    if self._update(op["id"], op["fields"]):
+                        todo = self.get_todo(op["id"])
+                elif op["op"] == "occurrence":
+                    self._set_occurrence(op["id"], completed=op.get("completed"),
+                                         skipped=op.get("skipped"))
+                elif op["op"] == "add_rule":
+                    if self.recurring.get(op["rule"]["id"]) is None:
+                        self._add_rule(RecurrenceRule.from_dict(op["rule"]))
+                elif op["op"] == "delete_rule":
+                    self._delete_rule(op["id"])
+            if len(ops) == 1 and todo is not None:
+                # 撤销单条修改时只通知这一个任务，不必整体刷新
+                self._batch_event = (ops[0]["op"], todo)
+
+    def _insert(self, todo):
+        """按原样插入一条任务（撤销删除时使用）并记录逆操作"""
+        self.conn.execute(
+            f"INSERT INTO todos ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (todo["id"], todo["content"], int(bool(todo.get("completed"))), todo.get("create_time"),
+             todo.get("due_date"), todo.get("priority", "normal"), todo.get("category", "默认"))
+        )
+        self._record_undo({"op": "delete", "id": todo["id"]})
+
+    def _delete(self, todo_id):
+        """删除任务并记录逆操作，返回被删除的任务"""
+        todo = self.get_todo(todo_id)
+        if todo is None:
+            return None
+        if split_occurrence_id(todo_id):
+            return self._set_occurrence(todo_id, skipped=True)
+        self.conn.execute("DELETE FROM todos WHERE uid = ?", (todo_id,))
+        self._record_undo({"op": "add", "todo": todo})
+        return todo
+
+    def _update(self, todo_id, fields):
+        """修改任务字段并记录逆操作，返回是否找到任务"""
+        if split_occurrence_id(todo_id):
+            if set(fields) != {"completed"}:
+                print("重复任务的单次重复只能修改完成状态", file=sys.stderr)
+                return False
+            return self._set_occurrence(todo_id, completed=bool(fields["completed"])) is not None
+        fields = {k: v for k, v in fields.items() if k in UPDATABLE}
+        if "due_date" in fields:
+            fields["due_date"] = _date_str(fields["due_date"])
+        if not fields:
+            return False
+        todo = self.get_todo(todo_id)
+        if todo is None:
+            return False
+        values = [int(bool(v)) if k == "completed" else v for k, v in fields.items()]
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self.conn.execute(f"UPDATE todos SET {assignments} WHERE uid = ?", (*values, todo_id))
+        self._record_undo({"op": "update", "id": todo_id,
+                           "fields": {key: todo[key] for key in fields}})
+        return True
+
+    def _set_occurrence(self, todo_id, completed=None, skipped=None):
+        """修改单次重复的完成/删除状态并记录逆操作，返回修改后的单次重复（删除时为删除前的）"""
+        before = self.recurring.get_occurrence(todo_id)
+        old = self.recurring.set_exception(todo_id, completed=completed, skipped=skipped)
+        if old is None:
+            return None
+        self._rules_changed = True
+        self._record_undo(dict({"op": "occurrence", "id": todo_id}, **old))
+        return self.recurring.get_occurrence(todo_id) or before
+
+    def _add_rule(self, rule):
+        """保存重复规则并记录逆操作"""
+        self.recurring.add(rule)
+        self._rules_changed = True
+        self._record_undo({"op": "delete_rule", "id": rule.id})
+        return rule
+
+    def _delete_rule(self, rule_id):
+        """删除重复规则并记录逆操作，规则不存在时返回None"""
+        rule = self.recurring.remove(rule_id)
+        if rule is not None:
+            self._rules_changed = True
+            self._record_undo({"op": "add_rule", "rule": rule.to_dict()})
+        return rule
+
+    def _record_undo(self, op):
+        """记录一次修改的逆操作；批次中的逆操作在批次结束时合成一组"""
+        if self._batch_depth:
+            self._batch_undo.append(op)
+        else:
+            self.history.record([op])
+
+    @_locked
+    def get_todo(self, todo_id):
+        """按ID获取待办事项（包括 "规则ID@日期" 形式的单次重复）"""
+        if split_occurrence_id(todo_id):
+            return self.recurring.get_occurrence(todo_id)
+        todos = self._query("WHERE uid = ?", (todo_id,))
+        return todos[0] if todos else None
+
+    @_locked
+    def get_todos(self):
+        """获取所有待办事项"""
+        return self._query()
+
+    @_locked
+    def get_todos_by_date(self, due_date):
+        """获取某一天截止的待办事项"""
+        day = parse_date(due_date)
+        todos = self._query("WHERE due_date = ?", (_date_str(due_date),))
+        return todos + self.get_occurrences(day, day) if day is not None else todos
+
+    @_locked
+    def get_todos_in_range(self, start, end):
+        """获取截止日期在[start, end]之间的待办事项，按日期排序"""
+        return [todo for _, todo in self.iter_dated_todos(start, end)]
+
+    @_locked
+    def get_due_date(self, todo_id):
+        """获取任务解析好的截止日期(date)，没有或无效时返回None"""
+        if split_occurrence_id(todo_id):
+            todo = self.recurring.get_occurrence(todo_id)
+            return parse_date(todo["due_date"]) if todo is not None else None
+        row = self.conn.execute("SELECT due_date FROM todos WHERE uid = ?", (todo_id,)).fetchone()
+        return parse_date(row[0]) if row else None
+
+    def iter_dated_todos(self, start=None, end=None):
+        """按日期顺序遍历有截止日期的任务，返回 (date, 任务)
+
+        start和end都给出时，范围内的重复任务也按需生成并按日期合并进来。
+        """
+        todos = self._iter_dated_rows(start, end)
+        if start is None or end is None:
+            return todos
+        return heapq.merge(todos, self.recurring.occurrences(start, end), key=lambda item: item[0])
+
+    def _iter_dated_rows(self, start, end):
+        where = "WHERE due_date BETWEEN ? AND ?"
+        params = (_date_str(start) or "0000-00-00", _date_str(end) or "9999-99-99")
+        sql = f"SELECT {COLUMNS} FROM todos {where} ORDER BY due_date, id"
+        # 先在锁内取出全部行，遍历时不占用连接
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        for row in rows:
+            day = parse_date(row[4])
+            if day is not None:
+                yield day, _row_to_todo(row)
+
+    @metrics.timed("sqlite.search")
+    @_locked
+    def search(self, query="", category=None, priority=None, start=None, end=None,
+               completed=None, limit=None):
+        """搜索并筛选待办事项，条件都交给带索引的列完成"""
+        conditions, params = [], []
+        for term in query.split():
+            conditions.append("content LIKE ? ESCAPE '\\'")
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if start is not None or end is not None:
+            conditions.append("due_date BETWEEN ? AND ?")
+            params += [_date_str(start) or "0000-00-00", _date_str(end) or "9999-99-99"]
+        for column, value in (("category", category), ("priority", priority)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if completed is not None:
+            conditions.append("completed = ?")
+            params.append(int(bool(completed)))
+        where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        results = self._query(where, params, limit)
+        if start is not None and end is not None and (limit is None or len(results) < limit):
+            occurrences = self.get_occurrences(start, end, query, category, priority, completed)
+            results += occurrences[:None if limit is None else limit - len(results)]
+        return results
+
+    @_locked
+    def matches_query(self, todo_id, query):
+        """任务内容是否匹配搜索关键词"""
+        todo = self.get_todo(todo_id)
+        content = todo["content"].casefold() if todo else ""
+        return all(term in content for term in query.casefold().split())
+
+    @_locked
+    def get_todos_by_category(self, category):
+        """获取指定分类的待办事项"""
+        return self._query("WHERE category = ?", (category,))
+
+    @_locked
+    def get_status_counts(self, category=None):
+        """获取未完成和已完成的数量"""
+        sql = "SELECT completed, COUNT(*) FROM todos"
+        params = ()
+        if category is not None:
+            sql += " WHERE category = ?"
+            params = (category,)
+        counts = dict(self.conn.execute(sql + " GROUP BY completed", params).fetchall())
+        return counts.get(0, 0), counts.get(1, 0)
+
+    @metrics.timed("sqlite.get_stats")
+    @_locked
+    def get_stats(self):
+        """获取统计信息"""
+        open_count, completed = self.get_status_counts()
+        return open_count + completed, completed
+
+    @_locked
+    def get_summary(self, today=None):
+        """完整的统计数据，字段与TodoData.get_summary()一致（聚合查询，走索引）"""
+        today = today or date.today()
+        week_end = today + timedelta(days=6 - today.weekday())
+        groups = {}
+        for column in ("category", "priority"):
+            groups[column] = {
+                key: {"total": total, "completed": completed}
+                for key, total, completed in self.conn.execute(
+                    f"SELECT {column}, COUNT(*), SUM(completed) FROM todos GROUP BY {column}"
+                )
+            }
+        overdue, due_today, due_week = self.conn.execute(
+            "SELECT COUNT(CASE WHEN due_date < ? THEN 1 END),"
+            " COUNT(CASE WHEN due_date = ? THEN 1 END),"
+            " COUNT(CASE WHEN due_date BETWEEN ? AND ? THEN 1 END)"
+            " FROM todos WHERE completed = 0 AND due_date IS NOT NULL AND due_date != ''",
+            (today.isoformat(), today.isoformat(), today.isoformat(), week_end.isoformat())
+        ).fetchone()
+        total, completed = self.get_stats()
+        return {
+            "total": total,
+            "completed": completed,
+            "open": total - completed,
+            "overdue": overdue,
+            "due_today": due_today,
+            "due_this_week": due_week,
+            "by_category": groups["category"],
+            "by_priority": groups["priority"],
+            "archived": 0,
+            "archived_by_category": {},
+            "archived_by_priority": {},
+            "recurring": len(self.recurring.rules)
+        }
+
+    # ---- 重复任务 ----
+
+    @_locked
+    def add_recurring(self, content, freq, start=None, interval=1, weekdays=None, until=None,
+                      priority="normal", category="默认"):
+        """添加重复任务，返回规则ID（与TodoData.add_recurring()一致）"""
+        rule = RecurrenceRule(None, content, freq, start or date.today(), interval, weekdays, until,
+                              priority, category)
+        self._add_rule(rule)
+        self.save_todos()
+        self._notify("reset")
+        logging.info(f"添加重复任务: {content} ({freq})")
+        return rule.id
+
+    @_locked
+    def delete_recurring(self, rule_id):
+        """删除重复任务，返回是否删除"""
+        if self._delete_rule(rule_id) is None:
+            return False
+        self.save_todos()
+        self._notify("reset")
+        return True
+
+    def get_recurring(self):
+        """全部重复规则"""
+        return [rule.to_dict() for rule in list(self.recurring.rules.values())]
+
+    @metrics.timed("sqlite.get_occurrences")
+    def get_occurrences(self, start, end, query="", category=None, priority=None, completed=None):
+        """生成[start, end]内符合条件的各次重复，按日期排序"""
+        return [todo for _, todo in self.recurring.occurrences(start, end, query, category,
+                                                                  priority, completed)]
+
+    # 已完成的任务只占索引中的几行，保存时也不会重写整张表，SQLite后端不做归档
+    def archive_completed(self, days=None, now=None, notify=True):
+        """与TodoData.archive_completed()一致，SQLite后端不移动任务"""
+        return 0
+
+    def archived_count(self):
+        """与TodoData.archived_count()一致，SQLite后端没有归档"""
+        return 0
+
+    def get_archived(self, query="", limit=None):
+        """与TodoData.get_archived()一致，SQLite后端没有归档"""
+        return []
+
+    def unarchive(self, todo_ids):
+        """与TodoData.unarchive()一致，SQLite后端没有归档"""
+        return 0
+
+    def backup_data(self, wait=False):
+        """在后台线程创建压缩的增量备份，wait为True时等待完成"""
+        self.save_todos()
+        thread = threading.Thread(target=self._run_backup, name="todo-backup")
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def _run_backup(self):
+        # 后台线程单独打开一个连接读取，不占用存储锁
+        try:
+            conn = sqlite3.connect(self.filename)
+            try:
+                cursor = conn.execute(f"SELECT {COLUMNS} FROM todos ORDER BY id")
+                todos = [_row_to_todo(row) for row in cursor]
+            finally:
+                conn.close()
+            point_id = self.backups.create(todos)
+            if point_id:
+                logging.info(f"创建备份: {point_id}")
+        except Exception as e:
+            print(f"备份数据时出错: {e}", file=sys.stderr)
+
+    def list_backups(self):
+        """列出所有保留的备份点"""
+        return self.backups.list_points()
+
+    @metrics.timed("sqlite.restore_backup")
+    @_locked
+    def restore_backup(self, point_id):
+        """恢复到指定备份点，在一个事务内替换全部数据"""
+        sql = f"INSERT INTO todos ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)"
+        try:
+            todos = self.backups.restore(point_id)
+            self.conn.execute("DELETE FROM todos")
+            self.conn.executemany(sql, [
+                (todo["id"], todo["content"], int(todo.get("completed", False)),
+                 todo.get("create_time"), todo.get("due_date"),
+                 todo.get("priority", "normal"), todo.get("category", "默认"))
+                for todo in todos
+            ])
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"恢复备份时出错: {e}", file=sys.stderr)
+            return False
+        self.history.clear()
+        self.history.flush()
+        self._notify("reset")
+        logging.info(f"恢复到备份: {point_id}")
+        return True
+
+    @metrics.timed("sqlite.export_todos")
+    @_locked
+    def export_todos(self, filename, progress=None):
+        """导出待办事项（.jsonl为JSON Lines，其他为JSON数组），逐行读取逐条写出"""
+        try:
+            cursor = self.conn.execute(f"SELECT {COLUMNS} FROM todos ORDER BY id")
+            write_todo_file(filename, (_row_to_todo(row) for row in cursor), progress)
+            return True
+        except Exception as e:
+            print(f"导出数据时出错: {e}", file=sys.stderr)
+            return False
+
+    @metrics.timed("sqlite.import_todos")
+    @_locked
+    def import_todos(self, filename, batch_size=1000, progress=None, undoable=True):
+        """流式导入待办事项，全部在一个事务内完成，结束时提交一次；整个导入作为一组撤销"""
+        stats = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+        imported = []
+        sql = f"INSERT INTO todos ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)"
+        try:
+            known_ids = set()
+            seen_keys = set()
+            for todo in self._query():
+                known_ids.add(todo["id"])
+                seen_keys.add(content_key(todo))
+            rows = []
+            for data in iter_todo_file(filename):
+                stats["read"] += 1
+                try:
+                    todo = validate_todo(data)
+                except ValueError as e:
+                    stats["invalid"] += 1
+                    logging.warning(f"跳过无效记录 #{stats['read']}: {e}")
+                    continue
+                key = content_key(todo)
+                if key in seen_keys or todo.get("id") in known_ids:
+                    stats["duplicates"] += 1
+                    continue
+                seen_keys.add(key)
+                todo_id = todo.get("id") or uuid.uuid4().hex
+                known_ids.add(todo_id)
+                imported.append(todo_id)
+                rows.append((todo_id, todo["content"], int(todo["completed"]),
+                             todo.get("create_time"), todo["due_date"],
+                             todo["priority"], todo["category"]))
+                if len(rows) >= batch_size:
+                    self.conn.executemany(sql, rows)
+                    stats["imported"] += len(rows)
+                    rows = []
+                    if progress:
+                        progress(dict(stats))
+            self.conn.executemany(sql, rows)
+            stats["imported"] += len(rows)
+            self.save_todos()
+            if progress:
+                progress(dict(stats))
+            if stats["imported"]:
+                if undoable:
+                    self.history.record([{"op": "delete", "id": todo_id} for todo_id in reversed(imported)])
+                    self.history.flush()
+                self._notify("reset")
+            logging.info(f"导入 {filename}: {stats}")
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            print(f"导入数据时出错: {e}", file=sys.stderr)
+            return False
@@ -0,0 +1,100 @@
+from datetime import date
+
+
+class TaskStats:
+    """增量维护的统计数据
+
+    任务加入、移除时分别调用add()和remove()，修改字段前先remove()、改完再add()，
+    总数、完成数和按分类/优先级的数量随之更新，读取都是O(1)。
+    逾期、今天到期、本周到期只统计未完成的任务：按截止日期记录未完成任务数，
+    这三个数按"今天"缓存，跨天后第一次读取时用按日期的计数重算一次
+    （与不同的截止日期数量成正比，与任务总数无关）。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.total = 0
+        self.completed = 0
+        self.by_category = {}   # 分类 -> [总数, 已完成]
+        self.by_priority = {}   # 优先级 -> [总数, 已完成]
+        self._open_by_day = {}  # 截止日期序数 -> 未完成任务数
+        self._today = None      # 下面几个缓存值对应的日期序数
+        self._week_end = None
+        self._overdue = 0
+        self._due_today = 0
+        self._due_week = 0
+
+    def add(self, todo):
+        self._count(todo, 1)
+
+    def remove(self, todo):
+        self._count(todo, -1)
+
+    def _count(self, todo, n):
+        done = 1 if todo.completed else 0
+        self.total += n
+        self.completed += n * done
+        for groups, key in ((self.by_category, todo.category), (self.by_priority, todo.priority)):
+            counts = groups.get(key)
+            if counts is None:
+                counts = groups[key] = [0, 0]
+            counts[0] += n
+            counts[1] += n * done
+            if not counts[0]:
+                del groups[key]
+        if done or todo.due is None:
+            return
+        day = todo.due
+        left = self._open_by_day.get(day, 0) + n
+        if left:
+            self._open_by_day[day] = left
+        else:
+            self._open_by_day.pop(day, None)
+        if self._today is not None:
+            self._overdue += n * (day < self._today)
+            self._due_today += n * (day == self._today)
+            self._due_week += n * (self._today <= day <= self._week_end)
+
+    def _set_today(self, today):
+        """换算到新的日期：按截止日期的计数重算逾期和到期数量"""
+        self._today = today
+        self._week_end = today + 6 - date.fromordinal(today).weekday()
+        self._overdue = self._due_today = self._due_week = 0
+        for day, count in self._open_by_day.items():
+            if day < today:
+                self._overdue += count
+            elif day == today:
+                self._due_today += count
+            if today <= day <= self._week_end:
+                self._due_week += count
+
+    def due_counts(self, today=None):
+        """返回 (逾期, 今天到期, 本周到期) 的未完成任务数，本周到期包括今天"""
+        today = (today or date.today()).toordinal()
+        if today != self._today:
+            self._set_today(today)
+        return self._overdue, self._due_today, self._due_week
+
+    def summary(self, today=None):
+        """全部统计数据（可以直接转成JSON）"""
+        overdue, due_today, due_week = self.due_counts(today)
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "open": self.total - self.completed,
+            "overdue": overdue,
+            "due_today": due_today,
+            "due_this_week": due_week,
+            "by_category": {key: {"total": t, "completed": c} for key, (t, c) in self.by_category.items()},
+            "by_priority": {key: {"total": t, "completed": c} for key, (t, c) in self.by_priority.items()}
+        }
+
+    @classmethod
+    def build(cls, todos):
+        """从头统计一组任务"""
+        stats = cls()
+        for todo in todos:
+            stats.add(todo)
+        return stats
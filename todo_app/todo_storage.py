@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def atomic_write(path, data):
+    """原子写入文件：先写临时文件再重命名，避免写到一半崩溃导致文件被截断"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def digest(data):
+    """计算快照内容的摘要，用于校验日志与快照是否匹配"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def file_signature(path):
+    """文件的 (修改时间, 大小, inode)，用来低成本地判断文件是否被改过；不存在时为None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class FileLock:
+    """跨进程的建议锁（POSIX用flock，Windows用msvcrt.locking）
+
+    同一进程内可重入；不同线程之间先用线程锁互斥，因为flock对同一个
+    文件描述符不区分线程。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                self._acquire()
+            self._depth += 1
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        try:
+            if self._depth == 0:
+                self._release()
+        finally:
+            self._thread_lock.release()
+
+    def _acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass  # LK_LOCK重试约10秒后放弃，继续等待
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _release(self):
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+
+def _header_base(line):
+    """从日志头记录中取出快照摘要"""
+    try:
+        return json.loads(line).get("base")
+    except (ValueError, AttributeError):
+        return None
+
+
+class Journal:
+    """追加式操作日志（JSON Lines）
+
+    第一行是头记录，记录它所基于的快照摘要；之后每行是一条变更记录。
+    压缩时先原子替换快照，再原子重置日志。如果在两步之间崩溃，
+    旧日志的摘要与新快照不匹配，加载时会被忽略，不会重复回放。
+
+    offset是已经读到（或写到）的位置，多个进程共用日志时，
+    read_new()只读取其他进程在这之后追加的记录。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.damaged = False
+        self.base = None
+        self.offset = 0
+
+    def replay(self, base_digest):
+        """读取与快照匹配的日志记录，日志不存在或已过期时返回None"""
+        records = []
+        self.count = 0
+        self.damaged = False
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            if _header_base(header) != base_digest:
+                return None
+            self.base = base_digest
+            self.offset = len(header)
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("不完整的记录")
+                    records.append(json.loads(line))
+                except ValueError:
+                    # 崩溃时可能留下不完整的最后一行，直接丢弃
+                    self.damaged = True
+                    break
+                self.offset += len(line)
+        self.count = len(records)
+        return records
+
+    def read_new(self):
+        """读取offset之后追加的完整记录；日志已被重置（头记录变了）时返回None"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            if _header_base(f.readline()) != self.base:
+                return None
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        records = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        self.offset += end
+        self.count += len(records)
+        return records
+
+    def append(self, lines):
+        """一次性追加多条已序列化的变更记录，返回写入的字节数"""
+        data = "".join(line + "\n" for line in lines).encode('utf-8')
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            self.offset = f.tell()
+        self.count += len(lines)
+        return len(data)
+
+    def reset(self, base_digest):
+        """清空日志，并指向新的快照"""
+        header = (json.dumps({"base": base_digest}) + "\n").encode('utf-8')
+        atomic_write(self.path, header)
+        self.count = 0
+        self.base = base_digest
+        self.offset = len(header)
+
+
+class WriteBehind:
+    """后台保存线程
+
+    修改只会把数据标记为"脏"，后台线程在最后一次修改后等待delay秒
+    （持续修改时最多等待max_delay秒），把这段时间内的所有修改合并成一次保存。
+    state可取 pending / saving / saved / error，供界面显示保存状态。
+    """
+
+    def __init__(self, save, delay=0.5, max_delay=3.0):
+        self._save = save
+        self.delay = delay
+        self.max_delay = max_delay
+        self.state = "saved"
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._first_change = 0.0
+        self._last_change = 0.0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="todo-save", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self):
+        """标记有未保存的修改"""
+        with self._cond:
+            now = time.monotonic()
+            if not self._dirty:
+                self._first_change = now
+            self._dirty = True
+            self._last_change = now
+            self.state = "pending"
+            self._cond.notify()
+
+    def flush(self):
+        """立即在当前线程保存所有未保存的修改"""
+        with self._cond:
+            self._dirty = False
+            self.state = "saving"
+        self._do_save()
+
+    def close(self):
+        """保存剩余修改并停止后台线程"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # 防抖：等到一段时间内没有新的修改再保存
+                while self._dirty and not self._stopped:
+                    now = time.monotonic()
+                    remaining = min(self._last_change + self.delay,
+                                    self._first_change + self.max_delay) - now
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._dirty:
+                    continue
+                self._dirty = False
+                self.state = "saving"
+            self._do_save()
+
+    def _do_save(self):
+        try:
+            self._save()
+            failed = False
+        except Exception as e:
+            print(f"后台保存时出错: {e}", file=sys.stderr)
+            failed = True
+        with self._cond:
+            if failed:
+                self.state = "error"
+            elif not self._dirty:
+                self.state = "saved"
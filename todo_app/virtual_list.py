@@ -0,0 +1,267 @@
+import bisect
+import tkinter as tk
+import tkinter.font as tkfont
+from todo_metrics import metrics
+
+
+class VirtualList(tk.Canvas):
+    """只绘制可见行的虚拟列表
+
+    列表本身不保存任何行数据，只知道总行数；绘制时通过get_text(index)
+    按位置向调用方取可见行的文字。因此滚动和刷新的开销只与窗口能显示的
+    行数有关，与任务总数无关。接口尽量与tk.Listbox保持一致：
+    curselection / selection_set / selection_clear / size / yview，
+    并支持yscrollcommand和<<ListboxSelect>>事件。
+    selectmode为'extended'时可以多选：Ctrl+单击切换一行，Shift+单击或
+    Shift+方向键选择一个范围，Ctrl+A全选。
+    """
+
+    def __init__(self, master, get_text, font=None, bg='white', fg='black',
+                 selectbackground='#ddd', selectforeground='black',
+                 yscrollcommand=None, padding=6, selectmode='browse', **kwargs):
+        super().__init__(master, bg=bg, **kwargs)
+        self.get_text = get_text
+        self.fg = fg
+        self.bg = bg
+        self.selectbackground = selectbackground
+        self.selectforeground = selectforeground
+        self.padding = padding
+        self._font = tkfont.Font(font=font) if font else tkfont.nametofont('TkDefaultFont')
+        self.row_height = self._font.metrics('linespace') + padding
+        self._yscrollcommand = yscrollcommand
+        self._count = 0
+        self._top = 0           # 第一可见行的位置
+        self._selection = set()
+        self._anchor = None     # Shift选择范围的起点
+        self.selectmode = selectmode
+        self._slots = []        # 复用的画布元素：(背景矩形, 文字)
+
+        self.bind('<Configure>', lambda e: self._render())
+        self.bind('<Button-1>', self._on_click)
+        self.bind('<MouseWheel>', self._on_mousewheel)
+        self.bind('<Button-4>', lambda e: self.yview('scroll', -3, 'units'))
+        self.bind('<Button-5>', lambda e: self.yview('scroll', 3, 'units'))
+        self.bind('<Up>', lambda e: self._move_selection(-1))
+        self.bind('<Down>', lambda e: self._move_selection(1))
+        if selectmode == 'extended':
+            self.bind('<Control-Button-1>', self._on_control_click)
+            self.bind('<Shift-Button-1>', self._on_shift_click)
+            self.bind('<Shift-Up>', lambda e: self._move_selection(-1, extend=True))
+            self.bind('<Shift-Down>', lambda e: self._move_selection(1, extend=True))
+            self.bind('<Control-a>', lambda e: self.select_all())
+
+    def configure(self, cnf=None, **kwargs):
+        """拦截yscrollcommand，由列表自己计算滚动位置"""
+        if 'yscrollcommand' in kwargs:
+            self._yscrollcommand = kwargs.pop('yscrollcommand')
+            self._update_scrollbar()
+            if not cnf and not kwargs:
+                return None
+        return super().configure(cnf, **kwargs)
+
+    config = configure
+
+    # ---- 数据模型 ----
+
+    def set_count(self, count):
+        """重置总行数，清空选择并回到顶部"""
+        self._count = count
+        self._top = 0
+        self._selection.clear()
+        self._anchor = None
+        self._render()
+
+    def size(self):
+        """总行数"""
+        return self._count
+
+    def row_inserted(self, index):
+        """在index处插入了一行"""
+        self._count += 1
+        self._selection = {i + 1 if i >= index else i for i in self._selection}
+        if index < self._top:
+            self._top += 1
+        self._render()
+
+    def row_deleted(self, index):
+        """删除了index处的一行"""
+        self.rows_deleted([index])
+
+    def rows_deleted(self, indices):
+        """一次删除了多行（indices为升序的原位置），只重绘一次"""
+        if not indices:
+            return
+        removed = set(indices)
+        self._count -= len(indices)
+        self._selection = {i - bisect.bisect_left(indices, i) for i in self._selection if i not in removed}
+        self._top -= bisect.bisect_left(indices, self._top)
+        self._render()
+
+    def row_changed(self, index):
+        """index处的行内容变化，只有可见时才需要重绘"""
+        if self._top <= index < self._top + self._visible_rows():
+            self._render()
+
+    # ---- 选择 ----
+
+    def curselection(self):
+        """当前选中行的位置"""
+        return tuple(sorted(self._selection))
+
+    def selection_set(self, first, last=None):
+        """选中[first, last]范围内的行"""
+        last = first if last is None else last
+        self._selection.update(range(first, min(last, self._count - 1) + 1))
+        self._render()
+
+    def selection_clear(self, first=0, last=None):
+        """取消选择"""
+        self._selection.clear()
+        self._render()
+
+    def select_all(self):
+        """选中全部行"""
+        self._selection = set(range(self._count))
+        self._render()
+        self.event_generate('<<ListboxSelect>>')
+        return 'break'
+
+    def see(self, index):
+        """滚动到能看到index行"""
+        visible = self._visible_rows()
+        if index < self._top:
+            self._set_top(index)
+        elif index >= self._top + visible:
+            self._set_top(index - visible + 1)
+
+    # ---- 滚动 ----
+
+    def yview(self, *args):
+        """滚动条回调：moveto / scroll"""
+        if not args:
+            return self._fractions()
+        if args[0] == 'moveto':
+            self._set_top(int(float(args[1]) * self._count))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= max(1, self._visible_rows() - 1)
+            self._set_top(self._top + amount)
+
+    def _set_top(self, top):
+        top = max(0, min(top, self._count - self._visible_rows()))
+        if top != self._top:
+            self._top = top
+            self._render()
+
+    def _visible_rows(self):
+        return max(1, self.winfo_height() // self.row_height)
+
+    def _fractions(self):
+        if self._count == 0:
+            return 0.0, 1.0
+        visible = self._visible_rows()
+        return self._top / self._count, min(1.0, (self._top + visible) / self._count)
+
+    def _update_scrollbar(self):
+        if self._yscrollcommand:
+            self._yscrollcommand(*self._fractions())
+
+    # ---- 绘制 ----
+
+    def _render(self):
+        """只重绘可见行，画布元素按槽位复用"""
+        self._top = max(0, min(self._top, self._count - self._visible_rows()))
+        slots_needed = self._visible_rows() + 1
+        width = self.winfo_width()
+        rendered = 0
+        while len(self._slots) < slots_needed:
+            rect = self.create_rectangle(0, 0, 0, 0, width=0)
+            text = self.create_text(0, 0, anchor='nw', font=self._font)
+            self._slots.append((rect, text))
+
+        for slot, (rect, text) in enumerate(self._slots):
+            index = self._top + slot
+            if slot >= slots_needed or index >= self._count:
+                self.itemconfigure(rect, state='hidden')
+                self.itemconfigure(text, state='hidden')
+                continue
+            y = slot * self.row_height
+            selected = index in self._selection
+            self.coords(rect, 0, y, width, y + self.row_height)
+            self.itemconfigure(
+                rect, state='normal',
+                fill=self.selectbackground if selected else self.bg
+            )
+            self.coords(text, self.padding, y + self.padding // 2)
+            self.itemconfigure(
+                text, state='normal', text=self.get_text(index),
+                fill=self.selectforeground if selected else self.fg
+            )
+            rendered += 1
+        metrics.record("gui.rows_rendered", rendered)
+        self._update_scrollbar()
+
+    def nearest(self, y):
+        """纵坐标y处的行位置，下面没有行时返回None"""
+        index = self._top + y // self.row_height
+        return index if index < self._count else None
+
+    # ---- 事件 ----
+
+    def _index_at(self, event):
+        return self.nearest(event.y)
+
+    def _on_click(self, event):
+        self.focus_set()
+        index = self._index_at(event)
+        if index is not None:
+            self._selection = {index}
+            self._anchor = index
+            self._render()
+            self.event_generate('<<ListboxSelect>>')
+
+    def _on_control_click(self, event):
+        """Ctrl+单击：切换一行的选中状态"""
+        self.focus_set()
+        index = self._index_at(event)
+        if index is not None:
+            self._selection ^= {index}
+            self._anchor = index
+            self._render()
+            self.event_generate('<<ListboxSelect>>')
+
+    def _on_shift_click(self, event):
+        """Shift+单击：从起点到单击处的范围"""
+        self.focus_set()
+        index = self._index_at(event)
+        if index is not None:
+            self._select_range(index)
+
+    def _on_mousewheel(self, event):
+        self.yview('scroll', -3 if event.delta > 0 else 3, 'units')
+
+    def _select_range(self, index):
+        anchor = self._anchor if self._anchor is not None else index
+        self._anchor = anchor
+        self._selection = set(range(min(anchor, index), max(anchor, index) + 1))
+        self.see(index)
+        self._render()
+        self.event_generate('<<ListboxSelect>>')
+
+    def _move_selection(self, step, extend=False):
+        if not self._count:
+            return
+        if extend and self._selection:
+            # 以离起点较远的一端为当前位置继续扩展
+            anchor = self._anchor if self._anchor is not None else min(self._selection)
+            current = max(self._selection) if max(self._selection) != anchor else min(self._selection)
+            self._select_range(max(0, min(self._count - 1, current + step)))
+            return
+        current = min(self._selection) if self._selection else self._top - step
+        index = max(0, min(self._count - 1, current + step))
+        self._selection = {index}
+        self._anchor = index
+        self.see(index)
+        self._render()
+        self.event_generate('<<ListboxSelect>>')